@@ -0,0 +1,72 @@
+"""
+One node body for both the sync and the async graph path.
+
+Each agent used to have a sync node and an async copy of it that differed
+only in which calls it made and awaited, and the copies drifted apart. Now
+an agent writes its node once as a generator. At every I/O point it yields
+a `step` naming a sync function, its async counterpart and the arguments.
+`run_steps` makes the sync call, `arun_steps` awaits the async one, and
+either driver sends the result back into the generator. An exception is
+thrown back in at the same point, so the node's own try/except blocks and
+fallbacks apply to both paths.
+
+    def _steps(state):
+        docs = yield step(corpus_results, acorpus_results, state, vector, k=3)
+        ...
+        return state
+
+    def node(state):          return run_steps(_steps(state))
+    async def anode(state):   return await arun_steps(_steps(state))
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Generator, Tuple
+
+
+@dataclass
+class Step:
+    """One I/O call a node body yields, with its sync and async forms."""
+    sync: Callable[..., Any]
+    async_: Callable[..., Awaitable[Any]]
+    args: Tuple[Any, ...] = ()
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+
+
+def step(sync: Callable[..., Any], async_: Callable[..., Awaitable[Any]], *args, **kwargs) -> Step:
+    return Step(sync, async_, args, kwargs)
+
+
+NodeSteps = Generator[Step, Any, dict]
+
+
+def run_steps(steps: NodeSteps) -> dict:
+    """Runs a node body, making each yielded call synchronously; returns the state it returns."""
+    try:
+        current = next(steps)
+        while True:
+            try:
+                result = current.sync(*current.args, **current.kwargs)
+            except Exception as e:
+                current = steps.throw(e)
+            else:
+                current = steps.send(result)
+    except StopIteration as done:
+        return done.value
+
+
+async def arun_steps(steps: NodeSteps) -> dict:
+    """Runs a node body, awaiting each yielded call; returns the state it returns."""
+    try:
+        current = next(steps)
+        while True:
+            try:
+                result = await current.async_(*current.args, **current.kwargs)
+            except Exception as e:
+                current = steps.throw(e)
+            else:
+                current = steps.send(result)
+    except StopIteration as done:
+        return done.value
+
+
+__all__ = ["Step", "arun_steps", "run_steps", "step"]
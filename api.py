@@ -0,0 +1,240 @@
+"""
+Headless HTTP service for the Kotori graph (FastAPI).
+
+app2.py runs inference inside Streamlit's script reruns, so the only way to
+scale it was to run more UIs. This service exposes the same compiled graph
+over HTTP/JSON, so inference can be load-balanced and called from other
+services. The Streamlit UI can use it as a thin client by setting
+KOTORI_API_URL (see api_client.py).
+
+    GET  /healthz          liveness: the process is up (never touches the models)
+    GET  /readyz           readiness: 200 once warm-up has finished, 503 before
+    POST /v1/chat          {"query": ...} -> final response as JSON
+    POST /v1/chat/stream   same turn as Server-Sent Events: "token" events while
+                           the agent generates, then one "final" (or "error") event
+
+Each worker process warms up and holds its own graph, embedding model and
+pooled Groq client through the resource registry (resources.py / warmup.py).
+With RETRIEVAL_BACKEND=mmap the workers share the corpus index pages. Turns
+run on the worker's event loop. KOTORI_API_MAX_CONCURRENCY caps in-flight
+turns per worker, and a request that cannot get a slot within
+KOTORI_API_QUEUE_TIMEOUT seconds gets 503 with Retry-After.
+
+Usage:
+    python api.py --workers 2 --port 8000
+    uvicorn api:app --workers 2
+"""
+
+import os
+import json
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from typing import AsyncIterator, Optional
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+from resources import PROCESS_STARTED, get_graph
+from warmup import is_ready, start_warmup, wait_until_ready, warmup_status
+
+# ─────────────────────────────
+# 1. Settings
+# ─────────────────────────────
+load_dotenv()
+API_HOST = os.getenv("KOTORI_API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("KOTORI_API_PORT", "8000"))
+API_WORKERS = int(os.getenv("KOTORI_API_WORKERS", "1"))
+MAX_CONCURRENCY = int(os.getenv("KOTORI_API_MAX_CONCURRENCY", "8"))  # in-flight turns per worker
+QUEUE_TIMEOUT = float(os.getenv("KOTORI_API_QUEUE_TIMEOUT", "30"))  # seconds to wait for a slot
+MAX_QUERY_CHARS = int(os.getenv("KOTORI_API_MAX_QUERY_CHARS", "2000"))
+
+
+# ─────────────────────────────
+# 2. Concurrency limit
+# ─────────────────────────────
+class TurnLimiter:
+    """Caps the turns a worker runs at once; the rest wait up to QUEUE_TIMEOUT."""
+
+    def __init__(self, limit: int = MAX_CONCURRENCY):
+        self.limit = limit
+        self._slots = asyncio.Semaphore(limit)
+        self.active = 0
+        self.waiting = 0
+        self.served = 0
+        self.rejected = 0
+
+    async def acquire(self, timeout: float = QUEUE_TIMEOUT) -> None:
+        """Takes a slot, or raises 503 (with Retry-After) when none frees up in time."""
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise HTTPException(503, "Kotori is at capacity, try again shortly", headers={"Retry-After": "1"})
+        finally:
+            self.waiting -= 1
+        self.active += 1
+
+    def release(self) -> None:
+        self.active -= 1
+        self.served += 1
+        self._slots.release()
+
+    def report(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": self.waiting,
+            "served": self.served,
+            "rejected": self.rejected,
+        }
+
+
+limiter = TurnLimiter()
+
+
+class SlotStreamingResponse(StreamingResponse):
+    """Streams while holding a limiter slot; the slot is freed however the stream ends."""
+
+    def __init__(self, content, limiter: TurnLimiter, **kwargs):
+        super().__init__(content, **kwargs)
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.limiter.release()
+
+
+# ─────────────────────────────
+# 3. Turns
+# ─────────────────────────────
+class ChatRequest(BaseModel):
+    query: str = Field(..., min_length=1, max_length=MAX_QUERY_CHARS)
+
+
+async def _graph():
+    """The worker's compiled graph, waiting for warm-up first (bounded by QUEUE_TIMEOUT)."""
+    if not is_ready() and not await asyncio.to_thread(wait_until_ready, QUEUE_TIMEOUT):
+        raise HTTPException(503, "Kotori is still warming up", headers={"Retry-After": "5"})
+    return await asyncio.to_thread(get_graph)
+
+
+async def _turn_events(graph, query: str) -> AsyncIterator[dict]:
+    """Token events then one final event, on this worker's event loop."""
+    from async_runtime import ASYNC_GRAPH
+    from kotori_graph import initial_state
+    from streaming import astream_turn, stream_turn
+
+    state = initial_state(query.strip())
+    if ASYNC_GRAPH:
+        async for event in astream_turn(graph, state):
+            yield event
+    else:
+        from starlette.concurrency import iterate_in_threadpool
+        async for event in iterate_in_threadpool(stream_turn(graph, state)):
+            yield event
+
+
+def _final_payload(event: dict) -> dict:
+    """JSON-safe part of the final state (no query vector or prefetched documents)."""
+    state = event["state"]
+    return {
+        "response": state.get("response") or "",
+        "agent": state.get("agent") or "",
+        "intent": state.get("intent") or "",
+        "cache_hit": bool(state.get("cache_hit")),
+        "timings": state.get("timings") or {},
+        "metrics": asdict(event["metrics"]) if event.get("metrics") else None,
+    }
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+# ─────────────────────────────
+# 4. App
+# ─────────────────────────────
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Per worker: models, indexes and the graph load in the background while
+    # /healthz already answers; /readyz flips to 200 when they are done
+    start_warmup()
+    print(f"🚀 Kotori API worker {os.getpid()} up, max {MAX_CONCURRENCY} concurrent turns")
+    yield
+
+
+app = FastAPI(title="Kotori.ai API", lifespan=lifespan)
+
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok", "pid": os.getpid(), "uptime_s": round(time.perf_counter() - PROCESS_STARTED, 1)}
+
+
+@app.get("/readyz")
+async def readyz():
+    body = {**warmup_status(), "pid": os.getpid(), "concurrency": limiter.report()}
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+
+@app.post("/v1/chat")
+async def chat(request: ChatRequest):
+    await limiter.acquire()
+    try:
+        graph = await _graph()
+        final: Optional[dict] = None
+        async for event in _turn_events(graph, request.query):
+            if event["type"] == "final":
+                final = event
+        return _final_payload(final)
+    finally:
+        limiter.release()
+
+
+@app.post("/v1/chat/stream")
+async def chat_stream(request: ChatRequest):
+    await limiter.acquire()
+    try:
+        graph = await _graph()
+    except BaseException:
+        limiter.release()
+        raise
+
+    async def events():
+        try:
+            async for event in _turn_events(graph, request.query):
+                if event["type"] == "token":
+                    yield _sse("token", {"agent": event["agent"], "text": event["text"]})
+                else:
+                    yield _sse("final", _final_payload(event))
+        except Exception as e:
+            print(f"❌ API turn error: {e}")
+            yield _sse("error", {"error": str(e)})
+
+    return SlotStreamingResponse(
+        events(),
+        limiter,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+__all__ = ["ChatRequest", "TurnLimiter", "app", "limiter"]
+
+if __name__ == "__main__":
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the Kotori API service")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--workers", type=int, default=API_WORKERS, help="worker processes, each with its own models")
+    args = parser.parse_args()
+    uvicorn.run("api:app", host=args.host, port=args.port, workers=args.workers)
@@ -0,0 +1,58 @@
+"""
+Client for the Kotori API service (api.py).
+
+With KOTORI_API_URL set, app2.py becomes a thin client. It loads no models,
+and each turn is streamed from the service instead of being run in-process.
+`remote_turn_events` yields the same events as kotori_graph.turn_events
+(token events, then one final event carrying the state and TurnMetrics), so
+the UI code consumes both the same way.
+"""
+
+import os
+import json
+import threading
+from typing import Iterator, Optional
+
+from streaming import TurnMetrics
+
+KOTORI_API_URL = os.getenv("KOTORI_API_URL", "").rstrip("/")
+KOTORI_API_TIMEOUT = float(os.getenv("KOTORI_API_TIMEOUT", "120"))
+
+_client = None
+_lock = threading.Lock()
+
+
+def _http_client():
+    """One keep-alive connection pool to the service per process."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                import httpx
+                _client = httpx.Client(timeout=KOTORI_API_TIMEOUT)
+    return _client
+
+
+def remote_turn_events(query: str, base_url: Optional[str] = None) -> Iterator[dict]:
+    """Streams one turn from POST /v1/chat/stream as turn_events-style events."""
+    url = f"{(base_url or KOTORI_API_URL).rstrip('/')}/v1/chat/stream"
+    with _http_client().stream("POST", url, json={"query": query}) as response:
+        if response.status_code != 200:
+            response.read()
+            raise RuntimeError(f"Kotori API returned {response.status_code}: {response.text[:200]}")
+        event = None
+        for line in response.iter_lines():
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data = json.loads(line[len("data:"):])
+                if event == "token":
+                    yield {"type": "token", "agent": data["agent"], "text": data["text"]}
+                elif event == "final":
+                    metrics = TurnMetrics(**data["metrics"]) if data.get("metrics") else None
+                    yield {"type": "final", "state": data, "metrics": metrics}
+                elif event == "error":
+                    raise RuntimeError(data.get("error", "Kotori API error"))
+
+
+__all__ = ["KOTORI_API_URL", "remote_turn_events"]
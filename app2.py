@@ -1,3 +1,6 @@
+import time
+_script_started = time.perf_counter()  # every rerun re-executes from here
+
 import streamlit as st
 import os
 from pathlib import Path
@@ -6,7 +9,14 @@ import pysqlite3
 sys.modules["sqlite3"] = pysqlite3
 
 from dotenv import load_dotenv
-from kotori_graph import build_kotori_graph
+from api_client import KOTORI_API_URL, remote_turn_events
+from resources import format_resource_report, get_graph, registry
+from warmup import WARMUP_ENABLED, is_ready, start_warmup, wait_until_ready, warmup_status
+
+# Models, indexes and the graph load on a background thread while the page
+# renders; kotori_graph itself is imported only once a question is asked.
+# With KOTORI_API_URL set the app is a thin client of api.py and loads nothing.
+start_warmup(enabled=WARMUP_ENABLED and not KOTORI_API_URL)
 
 # ─────────────────────────────────────────
 # 1. Setup
@@ -24,14 +34,26 @@ if not hf_token:
     st.error("❌ Hugging Face token is missing! Please add HUGGINGFACE_API_TOKEN to your .env file.")
     st.stop()
 
-# Load the LangGraph pipeline with error handling
-try:
-    graph = build_kotori_graph()
-    st.success("✅ Kotori.ai loaded successfully!")
-except Exception as e:
-    st.error(f"❌ Failed to load Kotori.ai: {str(e)}")
-    st.error("Please check your configuration and try again.")
-    st.stop()
+@st.cache_resource(show_spinner="Loading Kotori.ai...")
+def load_graph():
+    # Compiled once per process and shared by every session; reruns reuse it
+    return get_graph()
+
+def render_readiness(placeholder):
+    """Shows warm-up progress until the background warm-up has finished."""
+    if is_ready():
+        placeholder.success("✅ Kotori.ai loaded successfully!")
+        return
+    status = warmup_status()
+    step = f" ({status['current']})" if status["current"] else ""
+    placeholder.info(
+        f"⏳ Kotori is waking up{step}, {status['progress']:.0%} done. "
+        "You can already type your question; it will be answered as soon as Kotori is ready."
+    )
+
+readiness_placeholder = st.empty()
+render_readiness(readiness_placeholder)
+registry.record_script_run(time.perf_counter() - _script_started)
 
 # ─────────────────────────────────────────
 # 2. Enhanced Custom Styling
@@ -448,6 +470,10 @@ with st.sidebar:
         st.session_state["chat_history"] = []
         st.rerun()
 
+    if os.getenv("DEBUG", "False").lower() == "true":
+        with st.expander("Startup & rerun timings", expanded=False):
+            st.code(format_resource_report())
+
 # ─────────────────────────────────────────
 # 5. Enhanced Query Input Section
 # ─────────────────────────────────────────
@@ -484,8 +510,57 @@ with col2:
 if st.session_state.quick_query:
     st.session_state.quick_query = ""
 
+# Agent names without emojis
+AGENT_NAMES = {
+    "qna": "Information Assistant",
+    "emotional": "Emotional Support", 
+    "suggestion": "Suggestion Assistant",
+    "welcome": "Welcome Assistant"
+}
+
+def render_response(placeholder, text, footer):
+    """Renders (or re-renders) the response card into a placeholder."""
+    # Format and display response with readable styling
+    formatted_response = (text
+                        .replace("•", "•")  # Keep simple bullet points
+                        .replace("\n\n", "<br><br>")
+                        .replace("\n", "<br>"))
+    placeholder.markdown(
+        f"""
+        <div class="response-container">
+            <div style="display: flex; align-items: center; margin-bottom: 18px;">
+                <span style="font-size: 22px; font-weight: 500; color: #2c5aa0;">Kotori's Response</span>
+            </div>
+            <div style="font-size: 19px; line-height: 1.8; margin-bottom: 15px; color: #2c3e50;">
+                {formatted_response}
+            </div>
+            <div class="agent-info">
+                {footer}
+            </div>
+        </div>
+        """,
+        unsafe_allow_html=True
+    )
+
 if (query and query.strip()) or search_button:
     if query and query.strip():
+        response_placeholder = st.empty()
+        if not is_ready():
+            # Asked during warm-up: the question is held until the models are loaded
+            with st.spinner("Kotori is still waking up, your question is queued..."):
+                wait_until_ready()
+            render_readiness(readiness_placeholder)
+
+        # Load the LangGraph pipeline with error handling (not needed as a thin client)
+        if not KOTORI_API_URL:
+            try:
+                graph = load_graph()
+                from kotori_graph import turn_events
+            except Exception as e:
+                st.error(f"❌ Failed to load Kotori.ai: {str(e)}")
+                st.error("Please check your configuration and try again.")
+                st.stop()
+
         with st.spinner("Kotori is thinking..."):
             try:
                 # Initialize state with required fields
@@ -493,11 +568,27 @@ if (query and query.strip()) or search_button:
                     "input": query.strip(), 
                     "response": "", 
                     "agent": "", 
-                    "intent": ""
+                    "intent": "",
+                    "query_embedding": None,
+                    "prefetched": None,
+                    "timings": {},
+                    "cache_hit": None,
+                    "cacheable": False
                 }
                 
-                # Invoke the graph
-                result = graph.invoke(initial_state)
+                # Stream the graph: raw tokens render as they arrive, then the
+                # agent's final (format-checked) response replaces them
+                streamed, result, metrics = "", initial_state, None
+                if KOTORI_API_URL:
+                    events = remote_turn_events(initial_state["input"])
+                else:
+                    events = turn_events(graph, initial_state)
+                for event in events:
+                    if event["type"] == "token":
+                        streamed += event["text"]
+                        render_response(response_placeholder, streamed, "Kotori is typing…")
+                    else:
+                        result, metrics = event["state"], event["metrics"]
                 response = result.get("response", "⚠️ No response generated.")
                 agent_used = result.get("agent", "unknown")
                 
@@ -515,37 +606,13 @@ if (query and query.strip()) or search_button:
                 if len(st.session_state["chat_history"]) > 15:
                     st.session_state["chat_history"].pop(0)
 
-                # Format and display response with readable styling
-                formatted_response = (response
-                                    .replace("•", "•")  # Keep simple bullet points
-                                    .replace("\n\n", "<br><br>")
-                                    .replace("\n", "<br>"))
-
-                # Agent names without emojis
-                agent_names = {
-                    "qna": "Information Assistant",
-                    "emotional": "Emotional Support", 
-                    "suggestion": "Suggestion Assistant",
-                    "welcome": "Welcome Assistant"
-                }
-                agent_name = agent_names.get(agent_used, "Assistant")
-
-                st.markdown(
-                    f"""
-                    <div class="response-container">
-                        <div style="display: flex; align-items: center; margin-bottom: 18px;">
-                            <span style="font-size: 22px; font-weight: 500; color: #2c5aa0;">Kotori's Response</span>
-                        </div>
-                        <div style="font-size: 19px; line-height: 1.8; margin-bottom: 15px; color: #2c3e50;">
-                            {formatted_response}
-                        </div>
-                        <div class="agent-info">
-                            {agent_name} • Powered by Kotori.ai
-                        </div>
-                    </div>
-                    """,
-                    unsafe_allow_html=True
-                )
+                agent_name = AGENT_NAMES.get(agent_used, "Assistant")
+                footer = f"{agent_name} • Powered by Kotori.ai"
+                if result.get("cache_hit"):
+                    footer = f"{agent_name} • answered from cache • Powered by Kotori.ai"
+                elif metrics and metrics.ttft_ms is not None:
+                    footer = f"{agent_name} • first token in {metrics.ttft_ms / 1000:.1f}s • Powered by Kotori.ai"
+                render_response(response_placeholder, response, footer)
 
             except Exception as e:
                 # Enhanced error display
@@ -707,3 +774,10 @@ st.markdown('<div style="text-align: center; margin: 30px 0;"><div style="backgr
 
 # Copyright - single line
 st.markdown('<div style="text-align: center; margin: 20px 0; padding-top: 20px; border-top: 1px solid rgba(173, 216, 230, 0.3);"><p style="font-size: 13px; color: #9ca3af; margin: 0;">© 2024 Kotori.ai • All rights reserved • Built with Streamlit & LangGraph</p></div>', unsafe_allow_html=True)
+
+# Keep the readiness banner live while the page sits idle during warm-up,
+# then rerun once so it settles on the ready state
+if not is_ready():
+    while not wait_until_ready(0.5):
+        render_readiness(readiness_placeholder)
+    st.rerun()
@@ -0,0 +1,74 @@
+"""
+One asyncio event loop shared by the whole process.
+
+Streamlit runs every session on its own script thread. If each turn called
+asyncio.run, it would get a fresh loop, and the async Groq/httpx clients
+created on earlier loops could not be reused. Instead, all async graph runs
+are submitted to a single loop running on a daemon thread, and the session
+threads just wait for the result. One loop then multiplexes the I/O of every
+concurrent conversation.
+"""
+
+import os
+import queue
+import asyncio
+import threading
+from typing import AsyncIterator, Iterator, Optional
+
+# Streamlit / CLI use the async graph path unless KOTORI_ASYNC=false
+ASYNC_GRAPH = os.getenv("KOTORI_ASYNC", "true").lower() == "true"
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_lock = threading.Lock()
+_DONE = object()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """Returns the shared loop, starting its thread on first use."""
+    global _loop
+    if _loop is None:
+        with _lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="kotori-event-loop", daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+def run(coro, timeout: Optional[float] = None):
+    """Runs a coroutine on the shared loop and blocks the calling thread for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop()).result(timeout)
+
+
+def iter_async(agen: AsyncIterator) -> Iterator:
+    """
+    Iterates an async generator on the shared loop from synchronous code,
+    yielding items as they are produced (used to stream tokens into Streamlit).
+    """
+    items: "queue.Queue" = queue.Queue()
+
+    async def pump():
+        try:
+            async for item in agen:
+                items.put(item)
+        except BaseException as e:
+            items.put(e)
+        finally:
+            items.put(_DONE)
+
+    future = asyncio.run_coroutine_threadsafe(pump(), get_event_loop())
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # Caller stopped early: cancel the producer instead of leaking it
+        if not future.done():
+            future.cancel()
+
+
+__all__ = ["ASYNC_GRAPH", "get_event_loop", "run", "iter_async"]
@@ -0,0 +1,55 @@
+"""
+Benchmark: exhaustive SequenceMatcher dedup vs MinHash/LSH dedup.
+
+Loads and splits the PDFs in data/ exactly like loader.main, then runs both
+deduplicators on the same chunks and reports wall time and whether they keep
+the same chunk set.
+
+Usage:
+    python bench_dedup.py            # whole corpus
+    python bench_dedup.py --limit 800
+"""
+
+import argparse
+import time
+
+from loader import (
+    deduplicate_chunks_exhaustive,
+    deduplicate_chunks_minhash,
+    load_pdfs,
+    split_docs,
+)
+
+
+def run(limit=None):
+    chunks = split_docs(load_pdfs())
+    if limit:
+        chunks = chunks[:limit]
+    print(f"📦 Benchmarking on {len(chunks)} chunks")
+
+    timings, kept = {}, {}
+    for name, dedup in [("exhaustive", deduplicate_chunks_exhaustive), ("minhash", deduplicate_chunks_minhash)]:
+        start = time.perf_counter()
+        unique = dedup(chunks)
+        timings[name] = time.perf_counter() - start
+        kept[name] = {id(chunk) for chunk in unique}
+
+    print("\n📊 RESULTS:")
+    for name in timings:
+        print(f"   {name:<11} {timings[name]:8.2f}s  kept {len(kept[name])}")
+    print(f"   speed-up    {timings['exhaustive'] / max(timings['minhash'], 1e-9):8.1f}x")
+
+    only_exhaustive = kept["exhaustive"] - kept["minhash"]
+    only_minhash = kept["minhash"] - kept["exhaustive"]
+    if not only_exhaustive and not only_minhash:
+        print("✅ Identical kept-chunk sets")
+    else:
+        print(f"⚠️ Kept sets differ: {len(only_exhaustive)} only in exhaustive, {len(only_minhash)} only in minhash")
+    return timings, kept
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=None, help="only use the first N chunks")
+    args = parser.parse_args()
+    run(args.limit)
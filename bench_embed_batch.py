@@ -0,0 +1,54 @@
+"""
+Benchmark: ingest embedding throughput (chunks/s) at several batch sizes.
+
+Builds the cleaned, deduplicated chunks of data/ the same way the loader does
+and encodes them with an uncached embedding model at each batch size, so the
+embedding cache does not hide the model cost.
+
+Usage:
+    python bench_embed_batch.py
+    python bench_embed_batch.py --sizes 16 64 256 --limit 300
+"""
+
+import argparse
+import time
+
+from embeddings import SharedEmbeddings, adaptive_batch_size
+from loader import clean_text, deduplicate_chunks, load_pdfs, split_docs
+
+DEFAULT_SIZES = [8, 16, 32, 64, 128, 256]
+
+
+def run(sizes, limit=None):
+    chunks = deduplicate_chunks(split_docs(load_pdfs()))
+    texts = [t for t in (clean_text(c.page_content) for c in chunks) if t]
+    if limit:
+        texts = texts[:limit]
+
+    adaptive = adaptive_batch_size()
+    sizes = sorted(set(sizes) | {adaptive})
+    print(f"📦 Benchmarking {len(texts)} chunks, batch sizes {sizes} (adaptive pick: {adaptive})")
+
+    model = SharedEmbeddings(cache=None)
+    model.embed_documents(texts[:8], batch_size=8)  # load + warm up outside the timings
+
+    results = {}
+    for size in sizes:
+        start = time.perf_counter()
+        model.embed_documents(texts, batch_size=size)
+        elapsed = time.perf_counter() - start
+        results[size] = len(texts) / elapsed
+        marker = "  ← adaptive" if size == adaptive else ""
+        print(f"   batch {size:>4}: {elapsed:7.2f}s  {results[size]:7.1f} chunks/s{marker}")
+
+    best = max(results, key=results.get)
+    print(f"🏁 Fastest batch size: {best} ({results[best]:.1f} chunks/s)")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--limit", type=int, default=None, help="only embed the first N chunks")
+    args = parser.parse_args()
+    run(args.sizes, args.limit)
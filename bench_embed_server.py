@@ -0,0 +1,143 @@
+"""
+Benchmark: query embedding throughput at 1, 4 and 16 concurrent clients.
+
+Each client is a thread that embeds its own stream of distinct queries (the
+embedding cache is off, so every query costs a forward pass), one query per
+call, like an agent does. Three setups are compared:
+
+    in-process   clients call one shared in-process model directly
+    server       embedding server with micro-batching disabled (batches of 1)
+    batched      embedding server with micro-batching (EMBED_SERVER_MAX_BATCH /
+                 EMBED_SERVER_MAX_WAIT_MS)
+
+The servers run in this process on a temporary Unix socket and share the
+model with the in-process run, so the model is only loaded once. Every client
+has its own RemoteEmbeddings connection, the way separate workers would.
+Pass --url to measure an already running embedding_server.py instead; only
+its own batching setup is measured then.
+
+Usage:
+    python bench_embed_server.py
+    python bench_embed_server.py --clients 1 4 16 --requests 32
+    python bench_embed_server.py --url unix:///tmp/kotori-embed.sock
+"""
+
+import os
+import argparse
+import tempfile
+import threading
+import time
+from statistics import median
+
+from embedding_server import EMBED_SERVER_MAX_BATCH, EMBED_SERVER_MAX_WAIT_MS, RemoteEmbeddings, make_server
+from embeddings import SharedEmbeddings
+
+QUERIES = [
+    "What is empty nest syndrome?",
+    "I feel so lonely since my kids left",
+    "Can you suggest some activities for me?",
+    "How long does empty nest sadness last?",
+    "My youngest just moved out and the house is quiet",
+    "What hobbies help parents after the children leave?",
+    "Is it normal to cry when your child goes to college?",
+    "How can couples reconnect after the kids move out?",
+]
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _load(clients: int, requests: int, make_client, on_start=None):
+    """Runs `clients` threads of `requests` single-query calls; returns (queries/s, latencies)."""
+    latencies = []
+    lock = threading.Lock()
+    ready = threading.Barrier(clients + 1)
+    go = threading.Event()
+
+    def client(n: int):
+        embeddings = make_client()
+        embeddings.embed_query(f"connect {n}")  # open the connection outside the timings
+        ready.wait()
+        go.wait()
+        mine = []
+        for i in range(requests):
+            # Distinct texts, so no layer can answer from a cache
+            text = f"{QUERIES[(n + i) % len(QUERIES)]} (client {n}, query {i})"
+            started = time.perf_counter()
+            embeddings.embed_query(text)
+            mine.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(mine)
+        if isinstance(embeddings, RemoteEmbeddings):
+            embeddings.close()  # an idle open connection would hold every batch open for the full window
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    if on_start:
+        on_start()
+    started = time.perf_counter()
+    go.set()
+    for thread in threads:
+        thread.join()
+    return clients * requests / (time.perf_counter() - started), latencies
+
+
+def _serve(url: str, model: SharedEmbeddings, max_batch: int, max_wait_ms: float):
+    server = make_server(url, embeddings=model, max_batch=max_batch, max_wait_ms=max_wait_ms)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(client_counts, requests, url=None):
+    setups = []
+    servers = []
+    if url:
+        setups.append(("server", lambda: RemoteEmbeddings(url)))
+    else:
+        model = SharedEmbeddings(cache=None)
+        model.embed_query("warm up")  # load the model outside the timings
+        socket_dir = tempfile.mkdtemp(prefix="kotori-embed-")
+        plain = _serve(f"unix://{socket_dir}/plain.sock", model, max_batch=1, max_wait_ms=0)
+        batched = _serve(f"unix://{socket_dir}/batched.sock", model, EMBED_SERVER_MAX_BATCH, EMBED_SERVER_MAX_WAIT_MS)
+        servers = [("server", plain), ("batched", batched)]
+        setups = [
+            ("in-process", lambda: model),
+            ("server", lambda: RemoteEmbeddings(f"unix://{socket_dir}/plain.sock")),
+            ("batched", lambda: RemoteEmbeddings(f"unix://{socket_dir}/batched.sock")),
+        ]
+        print(f"📦 Micro-batching: up to {EMBED_SERVER_MAX_BATCH} texts, {EMBED_SERVER_MAX_WAIT_MS:g} ms window")
+
+    print(f"🧪 {requests} single-query calls per client\n")
+    print(f"   {'setup':<11} {'clients':>7} {'queries/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'texts/batch':>12}")
+    for clients in client_counts:
+        for name, make_client in setups:
+            server = dict(servers).get(name)
+            before = {}
+            on_start = (lambda: before.update(server.batcher.report())) if server else None
+            throughput, latencies = _load(clients, requests, make_client, on_start)
+            batch = "-"
+            if server:
+                after = server.batcher.report()
+                batches = after["batches"] - before["batches"]
+                batch = f"{(after['texts'] - before['texts']) / batches:.1f}" if batches else "-"
+            print(f"   {name:<11} {clients:>7} {throughput:10.1f} {median(latencies) * 1000:8.1f} "
+                  f"{_percentile(latencies, 95) * 1000:8.1f} {batch:>12}")
+        print()
+
+    for _, server in servers:
+        server.shutdown()
+        server.server_close()
+        os.unlink(server.server_address)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=32, help="queries per client")
+    parser.add_argument("--url", default=None, help="measure a running embedding server instead")
+    args = parser.parse_args()
+    run(args.clients, args.requests, args.url)
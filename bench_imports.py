@@ -0,0 +1,107 @@
+"""
+Benchmark: process startup cost of importing each Kotori module.
+
+Every target is imported in a fresh interpreter with `-X importtime`. The
+script reports the median total import time over a few runs, how many
+modules were loaded, which heavy dependencies came in with it, and the
+packages that took the most time. That time is the "self" column of the
+-X importtime output, summed per top-level package.
+Importing an agent or the router should not load langchain_groq,
+transformers, torch or Chroma. Those are loaded on the first query.
+
+Usage:
+    python bench_imports.py
+    python bench_imports.py --modules router kotori_graph --runs 5 --top 8
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+from statistics import median
+
+DEFAULT_MODULES = [
+    "resources",  # what a health check needs
+    "embeddings",
+    "router",
+    "memory_utils",
+    "retrieval",
+    "qna_agent",
+    "emotional_agent",
+    "suggestion_agent",
+    "welcome_agent",
+    "kotori_graph",
+]
+
+HEAVY = [
+    "langchain_core",
+    "langsmith",
+    "langgraph.graph",
+    "langchain_groq",
+    "transformers",
+    "torch",
+    "sentence_transformers",
+    "langchain_huggingface",
+    "langchain_chroma",
+    "chromadb",
+]
+
+_PROBE = (
+    "import sys, time; started = time.perf_counter(); import {module}; "
+    "elapsed = time.perf_counter() - started; "
+    "print('@@', elapsed, len(sys.modules), ','.join(m for m in {heavy!r} if m in sys.modules))"
+)
+
+
+def profile(module: str):
+    """(seconds, module count, heavy deps loaded, {top-level package: self µs}) for one import."""
+    env = dict(os.environ)
+    env.setdefault("GROQ_API_KEY", "bench-placeholder")  # the agents refuse to import without one
+    env.setdefault("HF_HUB_OFFLINE", "1")
+    proc = subprocess.run(
+        [sys.executable, "-W", "ignore", "-X", "importtime", "-c", _PROBE.format(module=module, heavy=HEAVY)],
+        capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    result = next((line.split(" ", 3) for line in proc.stdout.splitlines() if line.startswith("@@")), None)
+    if proc.returncode != 0 or result is None:
+        raise RuntimeError(f"importing {module} failed:\n{proc.stderr[-2000:]}")
+
+    packages = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_time, _, name = line.split("|")
+        try:
+            micros = int(self_time.split(":")[1])
+        except ValueError:
+            continue  # the header row
+        name = name.strip().split(".")[0]
+        packages[name] = packages.get(name, 0) + micros
+    heavy = [dep for dep in result[3].strip().split(",") if dep]
+    return float(result[1]), int(result[2]), heavy, packages
+
+
+def run(modules, runs, top):
+    print(f"🐢 Import cost per module (median of {runs} fresh interpreters)")
+    print(f"   {'module':<18} {'ms':>8} {'modules':>8}  heavy dependencies loaded")
+    slowest = {}
+    for module in modules:
+        samples = [profile(module) for _ in range(runs)]
+        seconds = median(sample[0] for sample in samples)
+        count, heavy, packages = samples[-1][1], samples[-1][2], samples[-1][3]
+        slowest[module] = sorted(packages.items(), key=lambda item: -item[1])[:top]
+        print(f"   {module:<18} {seconds * 1000:8.0f} {count:8d}  {', '.join(heavy) or '-'}")
+
+    print(f"\n📊 Slowest packages (self ms, last run):")
+    for module, packages in slowest.items():
+        cells = ", ".join(f"{name} {micros / 1000:.0f}" for name, micros in packages)
+        print(f"   {module:<18} {cells}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=5, help="slowest packages listed per module")
+    args = parser.parse_args()
+    run(args.modules, args.runs, args.top)
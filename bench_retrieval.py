@@ -0,0 +1,158 @@
+"""
+Benchmark: dense vs BM25 vs hybrid (RRF) corpus retrieval.
+
+Loads, splits and deduplicates the PDFs in data/ exactly like loader.main
+and cleans the chunks as they are stored in Chroma. It then embeds them with
+the shared embedding model, builds the BM25 index in memory and runs a
+labelled query set. Reports recall@k and per-query search latency. Query
+embedding time is reported separately, since dense and hybrid both pay it.
+
+Relevance is labelled by hand per query as (source PDF, pages): the pages
+that actually discuss the topic, picked by reading them (reference lists,
+tables and site menus that only mention a word are left out). Every chunk
+from a labelled page counts as relevant, whatever words it contains, so no
+retriever defines its own ground truth. The labels are page-level, which is
+coarser than chunk-level: a chunk from a labelled page that covers
+something else still counts. Candidate pages were found with a text search
+before being read, so a page that discusses a topic without using the
+query's words may be missing from its labels. Re-check the labels when the
+PDFs in data/ change.
+
+Usage:
+    python bench_retrieval.py
+    python bench_retrieval.py --k 1 3 5 10
+"""
+
+import os
+import argparse
+import time
+from statistics import mean
+
+import numpy as np
+
+from bm25_index import BM25Index
+from embeddings import get_embeddings
+from loader import assign_chunk_ids, clean_text, deduplicate_chunks, load_pdfs, split_docs
+from retrieval import HYBRID_CANDIDATES, reciprocal_rank_fusion
+
+CADABAMS = "6-www-cadabamshospitals-com-empty-nest-syndrome-helpful-tips-to-overcome-.pdf"
+
+# (query, {source PDF: relevant pages, or None for the whole document})
+EVAL_QUERIES = [
+    ("What does the Cleveland Clinic say about empty nest syndrome?", {"9-health_clevelandclinic.pdf": None}),
+    ("Can foster carers feel empty nest when a placement ends?", {"11-merthyrtydfil_fosterwales.gov.pdf": [0]}),
+    ("What is the economic effect of children leaving home on household consumption?",
+     {"0-economic effect.pdf": [2, 3, 4, 5, 7, 8, 9, 15, 16, 20]}),
+    ("Boomerang children moving back in with parents", {"3-.pdf": [14], "5-Review_Article_2.pdf": [4]}),
+    ("How does the empty nest affect marital satisfaction?",
+     {"1-Empty-Nest-PDF.pdf": [3], "3-.pdf": [4, 15], "4-mtnest-indian form.pdf": [5],
+      "5-Review_Article_2.pdf": [3], CADABAMS: [1], "9-health_clevelandclinic.pdf": [0]}),
+    ("Helpful tips from Cadabams hospitals to overcome empty nest", {CADABAMS: [2, 3]}),
+    ("Does menopause make the empty nest harder?",
+     {"1-Empty-Nest-PDF.pdf": [2], "2-.pdf": [2, 5], "4-mtnest-indian form.pdf": [1],
+      "5-Review_Article_2.pdf": [1, 2], "7-www.cbetterhealth.vic.gov.pdf": [0], "9-health_clevelandclinic.pdf": [0]}),
+    ("Empty nest and retirement happening at the same time",
+     {"1-Empty-Nest-PDF.pdf": [2], "2-.pdf": [2, 5], "3-.pdf": [14, 18], "4-mtnest-indian form.pdf": [0],
+      "7-www.cbetterhealth.vic.gov.pdf": [0], "8-.pdf": [0]}),
+    ("Do parents drink more alcohol after the kids leave?",
+     {"1-Empty-Nest-PDF.pdf": [2], "10-www_unitegroup.pdf": [0], "2-.pdf": [2], "3-.pdf": [2, 18],
+      "4-mtnest-indian form.pdf": [2, 7], CADABAMS: [0, 1]}),
+    ("Volunteering as a way to cope with an empty nest",
+     {"1-Empty-Nest-PDF.pdf": [3], "7-www.cbetterhealth.vic.gov.pdf": [0], "8-.pdf": [0]}),
+    ("Taking up a new hobby after children leave home",
+     {"2-.pdf": [2, 3], "5-Review_Article_2.pdf": [1], CADABAMS: [2],
+      "7-www.cbetterhealth.vic.gov.pdf": [0], "8-.pdf": [0]}),
+    ("Better Health Channel advice on empty nest", {"7-www.cbetterhealth.vic.gov.pdf": None}),
+    ("Is empty nest syndrome linked to depression?",
+     {"0-economic effect.pdf": [3, 5], "1-Empty-Nest-PDF.pdf": [1, 2], "2-.pdf": [1, 4], "3-.pdf": [1, 17, 18],
+      "4-mtnest-indian form.pdf": [1, 3, 5], "5-Review_Article_2.pdf": [0, 1, 2, 3, 4, 5], CADABAMS: [0, 3],
+      "8-.pdf": [0], "9-health_clevelandclinic.pdf": [0]}),
+    ("Loss of identity as a parent when children move out",
+     {"3-.pdf": [13], "4-mtnest-indian form.pdf": [1, 3, 5, 6], "5-Review_Article_2.pdf": [2, 3], CADABAMS: [2, 3],
+      "7-www.cbetterhealth.vic.gov.pdf": [0], "8-.pdf": [0], "9-health_clevelandclinic.pdf": [0]}),
+    ("Grief and sadness when the last child leaves",
+     {"1-Empty-Nest-PDF.pdf": [1, 2], "10-www_unitegroup.pdf": [0], "2-.pdf": [1, 3], "4-mtnest-indian form.pdf": [0, 3],
+      CADABAMS: [0, 1, 2, 3], "7-www.cbetterhealth.vic.gov.pdf": [0], "9-health_clevelandclinic.pdf": [0]}),
+]
+
+
+def _is_relevant(metadata: dict, labels: dict) -> bool:
+    source = os.path.basename(metadata.get("source", ""))
+    if source not in labels:
+        return False
+    pages = labels[source]
+    return pages is None or metadata.get("page") in pages
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(ks):
+    chunks = assign_chunk_ids(deduplicate_chunks(split_docs(load_pdfs())))
+    ids = [chunk.metadata["id"] for chunk in chunks]
+    texts = [clean_text(chunk.page_content) for chunk in chunks]  # as stored in Chroma
+    print(f"📦 Benchmarking on {len(chunks)} chunks, {len(EVAL_QUERIES)} queries")
+
+    embeddings = get_embeddings()
+    matrix = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+
+    start = time.perf_counter()
+    bm25 = BM25Index.build(ids, texts)
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"🔤 BM25 index: {len(bm25.vocab)} terms, {len(bm25.rows)} postings, built in {build_ms:.0f} ms")
+
+    depth = max(max(ks), HYBRID_CANDIDATES)
+
+    def dense(query_vector):
+        scores = matrix @ query_vector
+        top = np.argsort(-scores)[:depth]
+        return [ids[row] for row in top]
+
+    def sparse(query):
+        return [chunk_id for chunk_id, _ in bm25.search(query, depth)]
+
+    def hybrid(query, query_vector):
+        fused = reciprocal_rank_fusion([dense(query_vector)[:HYBRID_CANDIDATES], sparse(query)[:HYBRID_CANDIDATES]])
+        return [chunk_id for chunk_id, _ in fused]
+
+    recall = {name: {k: [] for k in ks} for name in ("dense", "bm25", "hybrid")}
+    latency = {name: [] for name in ("embed", "dense", "bm25", "hybrid")}
+    for query, labels in EVAL_QUERIES:
+        relevant = {chunk.metadata["id"] for chunk in chunks if _is_relevant(chunk.metadata, labels)}
+        if not relevant:
+            print(f"   ⚠️ no relevant chunks for: {query}")
+            continue
+
+        start = time.perf_counter()
+        query_vector = np.asarray(embeddings.embed_query(query), dtype=np.float32)
+        latency["embed"].append(time.perf_counter() - start)
+
+        rankings = {}
+        for name, search in [("dense", lambda: dense(query_vector)), ("bm25", lambda: sparse(query)),
+                             ("hybrid", lambda: hybrid(query, query_vector))]:
+            start = time.perf_counter()
+            rankings[name] = search()
+            latency[name].append(time.perf_counter() - start)
+
+        for name, ranking in rankings.items():
+            for k in ks:
+                hits = len(relevant & set(ranking[:k]))
+                recall[name][k].append(hits / min(len(relevant), k))
+
+    print("\n📊 RESULTS:")
+    header = "".join(f"  recall@{k:<3}" for k in ks)
+    print(f"   {'method':<8}{header}   mean ms    p95 ms")
+    for name in ("dense", "bm25", "hybrid"):
+        cells = "".join(f"  {mean(recall[name][k]):9.3f}" for k in ks)
+        times = latency[name]
+        print(f"   {name:<8}{cells}  {mean(times) * 1000:8.3f}  {_percentile(times, 95) * 1000:8.3f}")
+    print(f"   query embedding: mean {mean(latency['embed']) * 1000:.1f} ms (dense and hybrid only)")
+    print("   relevance: hand-labelled source pages per query (page-level, not chunk-level; see the docstring)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 10])
+    run(parser.parse_args().k)
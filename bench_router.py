@@ -0,0 +1,125 @@
+"""
+Benchmark: local embedding router vs the Groq LLM router.
+
+Runs the test_router cases plus a larger held-out labelled set (none of these
+utterances are in intent_classifier.LABELLED_EXAMPLES) and reports accuracy,
+how many queries would still fall back to the LLM, and per-query latency.
+With --llm and a GROQ_API_KEY it also times the LLM classifier on the same set.
+
+Usage:
+    python bench_router.py
+    python bench_router.py --llm
+"""
+
+import argparse
+import time
+from statistics import mean, median
+
+from embeddings import SharedEmbeddings
+from intent_classifier import ROUTER_CONFIDENCE_THRESHOLD, get_intent_classifier
+from router import ROUTER_TEST_CASES
+
+EVAL_SET = [
+    ("What exactly happens to parents in an empty nest?", "qna"),
+    ("Are there studies on empty nest syndrome?", "qna"),
+    ("What age do parents usually go through this?", "qna"),
+    ("Can empty nest syndrome affect a marriage?", "qna"),
+    ("What are the warning signs I should watch for?", "qna"),
+    ("Is it normal to have trouble sleeping when kids leave?", "qna"),
+    ("What does the Cleveland Clinic say about empty nest?", "qna"),
+    ("How common is empty nest syndrome?", "qna"),
+    ("Does empty nest syndrome happen in every culture?", "qna"),
+    ("What is the difference between grief and empty nest syndrome?", "qna"),
+    ("Can foster parents feel empty nest syndrome?", "qna"),
+    ("Why do some parents feel relief instead of sadness?", "qna"),
+    ("I can't stop crying since she left for college", "emotional"),
+    ("My heart aches when I see his empty bedroom", "emotional"),
+    ("I feel useless now", "emotional"),
+    ("Everything feels pointless without my kids around", "emotional"),
+    ("I'm scared I'll be lonely forever", "emotional"),
+    ("I feel abandoned by my children", "emotional"),
+    ("Dinner time is the hardest, I feel so empty", "emotional"),
+    ("I'm worried sick about my son in another city", "emotional"),
+    ("I feel guilty for being sad when they're happy", "emotional"),
+    ("Some days I don't want to get out of bed", "emotional"),
+    ("I'm grieving the life we had as a family", "emotional"),
+    ("I feel invisible now that nobody needs me", "emotional"),
+    ("What hobbies could I pick up?", "suggestion"),
+    ("Any advice on making new friends at my age?", "suggestion"),
+    ("How should I spend my evenings now?", "suggestion"),
+    ("Could you recommend a class I could take?", "suggestion"),
+    ("Give me ideas for trips I can take alone", "suggestion"),
+    ("What are fun things to do with my spouse again?", "suggestion"),
+    ("How can I keep in touch with my kids without smothering them?", "suggestion"),
+    ("Suggest an exercise routine for beginners", "suggestion"),
+    ("What could I volunteer for on weekends?", "suggestion"),
+    ("Tips for redecorating my child's old room?", "suggestion"),
+    ("How do I build a new routine?", "suggestion"),
+    ("Recommend some books to read", "suggestion"),
+]
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def evaluate_local(cases, embeddings):
+    classifier = get_intent_classifier()
+    classifier.centroids  # build outside the timings
+    correct, fallbacks, embed_ms, classify_ms = 0, 0, [], []
+    for query, expected in cases:
+        start = time.perf_counter()
+        vector = embeddings.embed_query(query)
+        embedded = time.perf_counter()
+        intent, confidence, _ = classifier.classify(vector)
+        done = time.perf_counter()
+        embed_ms.append((embedded - start) * 1000)
+        classify_ms.append((done - embedded) * 1000)
+        correct += intent == expected
+        fallbacks += confidence < ROUTER_CONFIDENCE_THRESHOLD
+        if intent != expected:
+            print(f"   ⚠️ '{query}' → {intent} ({confidence:.2f}), expected {expected}")
+    return correct, fallbacks, embed_ms, classify_ms
+
+
+def evaluate_llm(cases):
+    import router
+    if router.router_llm is None:
+        print("⚠️ GROQ_API_KEY not set, skipping the LLM comparison")
+        return None
+    correct, latencies = 0, []
+    for query, expected in cases:
+        start = time.perf_counter()
+        result = router.router_llm.invoke(router.ROUTING_PROMPT_TEMPLATE.format(query=query))
+        latencies.append((time.perf_counter() - start) * 1000)
+        correct += expected in result.content.strip().lower()
+    return correct, latencies
+
+
+def run(with_llm=False):
+    # Uncached model so latencies reflect a first-time query
+    embeddings = SharedEmbeddings(cache=None)
+    embeddings.embed_query("warm up")
+
+    for name, cases in [("test_router cases", ROUTER_TEST_CASES), ("held-out set", EVAL_SET)]:
+        print(f"\n📊 Local router on {name} ({len(cases)} queries)")
+        correct, fallbacks, embed_ms, classify_ms = evaluate_local(cases, embeddings)
+        print(f"   accuracy        {correct}/{len(cases)} ({correct / len(cases):.0%})")
+        print(f"   LLM fallbacks   {fallbacks} below confidence {ROUTER_CONFIDENCE_THRESHOLD}")
+        print(f"   embed latency   median {median(embed_ms):.1f} ms, p95 {_percentile(embed_ms, 95):.1f} ms")
+        print(f"   classify        mean {mean(classify_ms) * 1000:.0f} µs")
+
+        if with_llm:
+            llm = evaluate_llm(cases)
+            if llm:
+                llm_correct, latencies = llm
+                print(f"   Groq accuracy   {llm_correct}/{len(cases)} ({llm_correct / len(cases):.0%})")
+                print(f"   Groq latency    median {median(latencies):.0f} ms, p95 {_percentile(latencies, 95):.0f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm", action="store_true", help="also time the Groq classifier")
+    args = parser.parse_args()
+    run(args.llm)
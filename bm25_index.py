@@ -0,0 +1,187 @@
+"""
+BM25 inverted index over the corpus chunks.
+
+Dense retrieval is hit-or-miss for queries that hinge on specific terms
+("economic effect", "foster", "Cleveland Clinic"). This index is built at
+ingest time from the chunks loader.py writes to Chroma and answers lexical
+lookups in well under a millisecond:
+
+* Postings are stored as two flat arrays (chunk row int32, BM25 impact
+  float32), with each term owning one contiguous slice. The whole BM25 term
+  weight, idf · tf·(k1+1) / (tf + k1·(1-b+b·len/avglen)), is computed at
+  build time, so a query only sums a few array slices.
+* The index is one .npz file plus a JSON vocabulary, written as a
+  snapshot next to the vector_index one (index/bm25-<ns>/, published
+  atomically; see index_snapshots.py). Each process loads it once and
+  reloads it when a rebuild publishes a new snapshot, so the lexical side
+  never searches an older corpus than the dense side.
+
+retrieval.py fuses it with dense results (RETRIEVAL_MODE=hybrid).
+"""
+
+import os
+import re
+import json
+import math
+import time
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from index_snapshots import current_snapshot, new_snapshot_dir, publish_snapshot, snapshot_version
+
+# ─────────────────────────────
+# 1. Settings
+# ─────────────────────────────
+BM25_INDEX_DIR = Path(os.getenv("BM25_INDEX_DIR", os.getenv("VECTOR_INDEX_DIR", Path(__file__).parent / "index")))
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_ARRAYS = "bm25.npz"
+_VOCAB = "bm25_vocab.json"
+SNAPSHOT_KIND = "bm25"
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a about after all also am an and any are as at be because been being but by can could did do does for from "
+    "had has have he her him his how i if in into is it its me more my no not of on or our she so some such than "
+    "that the their them then there these they this those to too was we were what when where which who why will "
+    "with would you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased alphanumeric terms without stopwords."""
+    return [token for token in _TOKEN.findall(text.lower()) if token not in _STOPWORDS]
+
+
+# ─────────────────────────────
+# 2. Index
+# ─────────────────────────────
+class BM25Index:
+    """BM25 postings with precomputed term impacts; rows refer to positions in `ids`."""
+
+    def __init__(self, ids: List[str], vocab: Dict[str, Tuple[int, int]], rows: np.ndarray, impacts: np.ndarray):
+        self.ids = ids
+        self.vocab = vocab  # term -> (start, length) into rows / impacts
+        self.rows = rows
+        self.impacts = impacts
+
+    @classmethod
+    def build(cls, ids: Sequence[str], texts: Sequence[str], k1: float = BM25_K1, b: float = BM25_B) -> "BM25Index":
+        term_counts = [Counter(tokenize(text)) for text in texts]
+        lengths = np.array([sum(counts.values()) for counts in term_counts], dtype=np.float32)
+        average_length = float(lengths.mean()) if len(lengths) and lengths.mean() > 0 else 1.0
+
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for row, counts in enumerate(term_counts):
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((row, tf))
+
+        total = len(texts)
+        vocab: Dict[str, Tuple[int, int]] = {}
+        rows: List[int] = []
+        impacts: List[float] = []
+        for term in sorted(postings):
+            entries = postings[term]
+            idf = math.log(1 + (total - len(entries) + 0.5) / (len(entries) + 0.5))
+            vocab[term] = (len(rows), len(entries))
+            for row, tf in entries:
+                norm = k1 * (1 - b + b * lengths[row] / average_length)
+                rows.append(row)
+                impacts.append(idf * tf * (k1 + 1) / (tf + norm))
+        return cls(list(ids), vocab, np.asarray(rows, dtype=np.int32), np.asarray(impacts, dtype=np.float32))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """(chunk id, BM25 score) of the k best lexical matches, best first."""
+        scores = None
+        for term in set(tokenize(query)):
+            span = self.vocab.get(term)
+            if span is None:
+                continue
+            start, length = span
+            if scores is None:
+                scores = np.zeros(len(self.ids), dtype=np.float32)
+            # A chunk appears at most once per term, so plain fancy-index addition is safe
+            scores[self.rows[start:start + length]] += self.impacts[start:start + length]
+        if scores is None:
+            return []
+        matched = np.flatnonzero(scores)
+        k = min(k, len(matched))
+        if k == 0:
+            return []
+        top = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[row], float(scores[row])) for row in top]
+
+    def save(self, index_dir: Path = BM25_INDEX_DIR) -> None:
+        """Writes a new snapshot under index_dir and publishes it."""
+        snapshot = new_snapshot_dir(index_dir, SNAPSHOT_KIND)
+        np.savez(snapshot / _ARRAYS, rows=self.rows, impacts=self.impacts)
+        with open(snapshot / _VOCAB, "w", encoding="utf-8") as handle:
+            json.dump({"ids": self.ids, "vocab": self.vocab}, handle)
+        publish_snapshot(index_dir, SNAPSHOT_KIND, snapshot)
+
+    @classmethod
+    def load(cls, index_dir: Path = BM25_INDEX_DIR) -> "BM25Index":
+        """Loads the published snapshot under index_dir."""
+        snapshot = current_snapshot(index_dir, SNAPSHOT_KIND)
+        with open(snapshot / _VOCAB, encoding="utf-8") as handle:
+            data = json.load(handle)
+        arrays = np.load(snapshot / _ARRAYS)
+        vocab = {term: tuple(span) for term, span in data["vocab"].items()}
+        return cls(data["ids"], vocab, arrays["rows"], arrays["impacts"])
+
+
+# ─────────────────────────────
+# 3. Ingest-time build + shared instance
+# ─────────────────────────────
+def build_bm25_index(index_dir: Path = BM25_INDEX_DIR) -> int:
+    """Rebuilds the index from the corpus collection; returns the chunk count."""
+    from vectorstores import CORPUS_COLLECTION, get_corpus_store
+    from retrieval_cache import bump_generation
+
+    started = time.perf_counter()
+    page = get_corpus_store()._collection.get(include=["documents"])
+    ids = page.get("ids") or []
+    index = BM25Index.build(ids, [text or "" for text in page.get("documents") or []])
+    index.save(index_dir)
+    # Bumped after the publish, so cached hybrid results are never refilled from the old postings
+    bump_generation(CORPUS_COLLECTION)
+    print(f"🔤 Built BM25 index over {len(ids)} chunks ({len(index.vocab)} terms) "
+          f"in {time.perf_counter() - started:.2f}s")
+    return len(ids)
+
+
+_index: Optional[BM25Index] = None
+_index_version = None
+_lock = threading.Lock()
+
+
+def get_bm25_index() -> BM25Index:
+    """The process-wide index, loaded on first use and after each rebuild (FileNotFoundError if not built)."""
+    global _index, _index_version
+    version = snapshot_version(BM25_INDEX_DIR, SNAPSHOT_KIND)
+    if _index is None or version != _index_version:
+        with _lock:
+            if _index is None or version != _index_version:
+                _index = BM25Index.load()
+                _index_version = version
+    return _index
+
+
+__all__ = [
+    "BM25Index",
+    "build_bm25_index",
+    "get_bm25_index",
+    "tokenize",
+]
+
+if __name__ == "__main__":
+    build_bm25_index()
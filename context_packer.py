@@ -0,0 +1,179 @@
+"""
+Token-budgeted context packing for the agent prompts.
+
+The agents used to cut the joined context at a fixed number of characters,
+which split chunks and sentences and had no relation to the tokens the model
+actually bills. `pack_context` counts tokens with the Groq model's
+tokenizer, takes whole chunks in rank order while they fit the agent's
+budget, and trims the first chunk that does not fit at a sentence boundary.
+
+The tokenizer is downloaded by warm-up (warmup.py), never inside a request:
+until it is loaded, token counts are estimated from the text length and a
+load is started in the background, retried with a growing back-off after a
+failure.
+"""
+
+import os
+import re
+import math
+import time
+import threading
+from typing import Dict, List, Optional, Sequence
+
+# ─────────────────────────────
+# 1. Settings
+# ─────────────────────────────
+# Hugging Face repo with the tokenizer of the Groq model (llama-3.3-70b-versatile)
+CONTEXT_TOKENIZER = os.getenv("CONTEXT_TOKENIZER", "unsloth/Llama-3.3-70B-Instruct")
+CONTEXT_BUDGETS: Dict[str, int] = {
+    "qna": int(os.getenv("CONTEXT_BUDGET_QNA", "800")),
+    "emotional": int(os.getenv("CONTEXT_BUDGET_EMOTIONAL", "500")),
+    "suggestion": int(os.getenv("CONTEXT_BUDGET_SUGGESTION", "650")),
+}
+CONTEXT_SEPARATOR = "\n\n---\n\n"
+# Seconds before a failed tokenizer load is retried; doubles per failure up to the max
+TOKENIZER_RETRY_SECONDS = float(os.getenv("TOKENIZER_RETRY_SECONDS", "30"))
+TOKENIZER_RETRY_MAX_SECONDS = float(os.getenv("TOKENIZER_RETRY_MAX_SECONDS", "900"))
+# Characters per token for the fallback estimate when the tokenizer is not loaded
+_CHARS_PER_TOKEN = 4
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+# ─────────────────────────────
+# 2. Token counting
+# ─────────────────────────────
+_tokenizer = None
+_failures = 0
+_retry_at = 0.0  # time.monotonic() before which no new load is attempted
+_load_lock = threading.Lock()
+
+
+def load_tokenizer():
+    """
+    Loads the tokenizer (downloading it on first use) and returns it, or None
+    if the load failed or a previous failure is still backing off. A caller
+    arriving during another load waits for its result.
+    """
+    global _tokenizer, _failures, _retry_at
+    with _load_lock:
+        if _tokenizer is not None or time.monotonic() < _retry_at:
+            return _tokenizer
+        try:
+            from transformers import AutoTokenizer
+            _tokenizer = AutoTokenizer.from_pretrained(CONTEXT_TOKENIZER)
+            _failures = 0
+        except Exception as e:
+            _failures += 1
+            delay = min(TOKENIZER_RETRY_SECONDS * 2 ** (_failures - 1), TOKENIZER_RETRY_MAX_SECONDS)
+            _retry_at = time.monotonic() + delay
+            print(f"⚠️ Could not load tokenizer {CONTEXT_TOKENIZER} ({e.__class__.__name__}), "
+                  f"estimating {_CHARS_PER_TOKEN} chars/token and retrying in {delay:.0f}s")
+        return _tokenizer
+
+
+def _get_tokenizer():
+    """The loaded tokenizer, or None while it is not (a load is started in the background)."""
+    if _tokenizer is None and not _load_lock.locked() and time.monotonic() >= _retry_at:
+        threading.Thread(target=load_tokenizer, name="kotori-tokenizer", daemon=True).start()
+    return _tokenizer
+
+
+def count_tokens(text: str) -> int:
+    """Tokens of text under the model's tokenizer (estimated if it is unavailable)."""
+    if not text:
+        return 0
+    tokenizer = _get_tokenizer()
+    if tokenizer is None:
+        return math.ceil(len(text) / _CHARS_PER_TOKEN)
+    return len(tokenizer.encode(text, add_special_tokens=False))
+
+
+# ─────────────────────────────
+# 3. Packing
+# ─────────────────────────────
+def trim_to_sentences(text: str, budget: int) -> str:
+    """Longest prefix of whole sentences that fits in budget tokens ("" if not even one)."""
+    kept = []
+    used = 0
+    for sentence in _SENTENCE_END.split(text.strip()):
+        cost = count_tokens(sentence) + (1 if kept else 0)
+        if used + cost > budget:
+            break
+        kept.append(sentence)
+        used += cost
+    return " ".join(kept)
+
+
+def _trim_to_words(text: str, budget: int) -> str:
+    """Last resort for a single over-long first sentence: whole words up to the budget."""
+    text = " ".join(text.split())
+    tokenizer = _get_tokenizer()
+    if tokenizer is None:
+        cut = budget * _CHARS_PER_TOKEN
+    else:
+        # One encode; the character offset where token `budget` ends is the cut
+        offsets = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+        cut = offsets[budget - 1][1] if budget < len(offsets) else len(text)
+    if cut >= len(text):
+        return text
+    # Drop the word the cut falls into
+    prefix = text[:cut] if text[cut] == " " else text[:cut].rpartition(" ")[0]
+    # Merges across the cut can rarely add a token; shed words until it fits
+    while prefix and count_tokens(prefix) > budget:
+        prefix = prefix.rpartition(" ")[0]
+    return prefix.rstrip()
+
+
+def pack_context(
+    texts: Sequence[str],
+    budget: int,
+    separator: str = CONTEXT_SEPARATOR,
+    agent: Optional[str] = None,
+) -> str:
+    """
+    Joins ranked texts (best first) into at most `budget` tokens. Whole chunks
+    are taken in order; the first chunk that does not fit is trimmed at a
+    sentence boundary and packing stops there, so lower-ranked content never
+    displaces higher-ranked content.
+    """
+    separator_cost = count_tokens(separator)
+    packed: List[str] = []
+    used = 0
+    for text in texts:
+        text = (text or "").strip()
+        if not text:
+            continue
+        gap = separator_cost if packed else 0
+        cost = count_tokens(text)
+        if used + gap + cost <= budget:
+            packed.append(text)
+            used += gap + cost
+            continue
+        remaining = budget - used - gap
+        if remaining > 0:
+            trimmed = trim_to_sentences(text, remaining) or (_trim_to_words(text, remaining) if not packed else "")
+            if trimmed:
+                packed.append(trimmed)
+                used += gap + count_tokens(trimmed)
+        break
+
+    if agent:
+        print(f"📦 Packed {len(packed)}/{len([t for t in texts if t and t.strip()])} chunks into "
+              f"{used}/{budget} tokens for {agent}")
+    return separator.join(packed)
+
+
+def pack_for_agent(agent: str, texts: Sequence[str]) -> str:
+    return pack_context(texts, CONTEXT_BUDGETS[agent], agent=agent)
+
+
+__all__ = [
+    "CONTEXT_BUDGETS",
+    "CONTEXT_SEPARATOR",
+    "count_tokens",
+    "load_tokenizer",
+    "pack_context",
+    "pack_for_agent",
+    "trim_to_sentences",
+]
@@ -2,7 +2,7 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
+from embeddings import get_embeddings
 
 # Load environment
 load_dotenv()
@@ -36,11 +36,7 @@ def debug_vectorstore():
             continue
             
         try:
-            embedding_model = HuggingFaceEmbeddings(
-                model_name="BAAI/bge-base-en-v1.5",
-                model_kwargs={"device": "cpu"},
-                encode_kwargs={"normalize_embeddings": True}
-            )
+            embedding_model = get_embeddings()
             
             vectorstore = Chroma(
                 persist_directory=str(chroma_path), 
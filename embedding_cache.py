@@ -0,0 +1,208 @@
+"""
+Persistent embedding cache for Kotori.ai.
+
+Vectors are keyed by model name plus a hash of the normalised text and kept in
+a bounded in-memory LRU backed by a SQLite file, so repeated prompts and
+unchanged ingest chunks are never re-encoded, even across restarts.
+"""
+
+import os
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# ─────────────────────────────
+# 1. Cache settings
+# ─────────────────────────────
+EMBEDDING_CACHE_PATH = Path(os.getenv(
+    "EMBEDDING_CACHE_PATH", Path(__file__).parent / "cache" / "embeddings.sqlite3"
+))
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+
+
+# Models whose tokenizer lower-cases its input; only their keys are case-folded
+UNCASED_EMBEDDING_MODELS = {
+    model.strip() for model in os.getenv(
+        "UNCASED_EMBEDDING_MODELS",
+        "BAAI/bge-small-en-v1.5,BAAI/bge-base-en-v1.5,BAAI/bge-large-en-v1.5",
+    ).split(",") if model.strip()
+}
+
+
+def is_uncased_model(model_name: str) -> bool:
+    return model_name in UNCASED_EMBEDDING_MODELS or "uncased" in model_name.lower()
+
+
+def normalise_text(text: str, casefold: bool = False) -> str:
+    """
+    Normalises text for cache keys: NFKC and collapsed whitespace, plus
+    case-folding when the model is uncased (a cased model gives "Empty" and
+    "empty" different vectors, so they must not share a key).
+    """
+    text = " ".join(unicodedata.normalize("NFKC", text or "").split())
+    return text.casefold() if casefold else text
+
+
+def cache_key(model_name: str, text: str, kind: str = "document") -> str:
+    """Key for one vector: model name, embed kind and normalised text hash."""
+    payload = f"{model_name}\x00{kind}\x00{normalise_text(text, casefold=is_uncased_model(model_name))}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ─────────────────────────────
+# 2. LRU over SQLite
+# ─────────────────────────────
+class EmbeddingCache:
+    """Bounded in-memory LRU in front of a SQLite vector store."""
+
+    def __init__(self, path: Path = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_SIZE):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self._lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+            # WAL lets the app and a loader run share the file
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, model TEXT NOT NULL, dim INTEGER NOT NULL, vector BLOB NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Looks keys up in memory first, then on disk. Missing keys are omitted."""
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            pending = []
+            for key in keys:
+                vector = self._lru.get(key)
+                if vector is not None:
+                    self._lru.move_to_end(key)
+                    found[key] = vector
+                    self.memory_hits += 1
+                else:
+                    pending.append(key)
+
+            unique_pending = list(dict.fromkeys(pending))
+            conn = self._connection()
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(unique_pending), 500):
+                batch = unique_pending[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    found[key] = vector
+                    self._remember(key, vector)
+
+            for key in pending:
+                if key in found:
+                    self.disk_hits += 1
+                else:
+                    self.misses += 1
+        return found
+
+    def put_many(self, model_name: str, items: Dict[str, Sequence[float]]) -> None:
+        """Stores vectors in memory and on disk."""
+        if not items:
+            return
+        rows = []
+        with self._lock:
+            for key, values in items.items():
+                vector = np.asarray(values, dtype=np.float32)
+                self._remember(key, vector)
+                rows.append((key, model_name, int(vector.shape[0]), vector.tobytes()))
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, model, dim, vector) VALUES (?, ?, ?, ?)",
+                    rows
+                )
+
+    def stats(self) -> dict:
+        """Hit/miss counters and sizes."""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        with self._lock:
+            try:
+                disk_entries = self._connection().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            except sqlite3.Error:
+                disk_entries = None
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self._lru),
+                "disk_entries": disk_entries,
+                "path": str(self.path),
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def cached_embed(
+    cache: EmbeddingCache,
+    model_name: str,
+    texts: List[str],
+    embed_fn,
+    kind: str = "document",
+) -> List[List[float]]:
+    """
+    Embeds texts through the cache: hits are served from the LRU or disk and
+    only the distinct missing texts are passed to embed_fn in one call.
+    """
+    keys = [cache_key(model_name, text, kind) for text in texts]
+    found = cache.get_many(keys)
+
+    missing: Dict[str, str] = {}
+    for key, text in zip(keys, texts):
+        if key not in found and key not in missing:
+            missing[key] = text
+
+    if missing:
+        vectors = embed_fn(list(missing.values()))
+        computed = dict(zip(missing.keys(), vectors))
+        cache.put_many(model_name, computed)
+        found.update({key: np.asarray(vector, dtype=np.float32) for key, vector in computed.items()})
+
+    return [found[key].tolist() for key in keys]
+
+
+__all__ = [
+    "EMBEDDING_CACHE_ENABLED",
+    "EmbeddingCache",
+    "UNCASED_EMBEDDING_MODELS",
+    "cache_key",
+    "cached_embed",
+    "is_uncased_model",
+    "normalise_text",
+]
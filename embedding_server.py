@@ -0,0 +1,361 @@
+"""
+Shared embedding server: one process owns the BGE model for every worker on the box.
+
+Each Streamlit session host, api.py worker or loader run otherwise loads its
+own copy of the model, which costs hundreds of MB and several seconds each.
+In server mode, one process holds the model (and the embedding cache) and
+answers embedding requests over a Unix socket or localhost HTTP:
+
+    POST /embed    {"texts": [...], "kind": "query" | "document"}
+                   -> {"shape": [n, dim], "vectors": base64 float32, row-major}
+    GET  /health   model, batching and cache figures
+
+Requests from all callers go through one `MicroBatcher`. The first waiting
+request opens a batch, and the batcher keeps collecting requests until it
+has EMBED_SERVER_MAX_BATCH texts or EMBED_SERVER_MAX_WAIT_MS has passed.
+It then encodes the whole batch in one model call, so concurrent workers
+share forward passes instead of queueing single-text encodes. A batch also
+closes as soon as every connected client has a request in it, so a lone
+caller does not wait out the window.
+
+Clients set EMBEDDING_SERVER_URL (unix:///path/to.sock or
+http://127.0.0.1:8766). embeddings.get_embeddings() then returns a
+`RemoteEmbeddings`, so the agents, memory_utils and the router all use the
+server without code changes.
+
+Usage:
+    python embedding_server.py --socket /tmp/kotori-embed.sock
+    python embedding_server.py --port 8766
+"""
+
+import os
+import json
+import time
+import queue
+import base64
+import threading
+import socketserver
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler
+from typing import List, Optional
+
+import numpy as np
+
+from embeddings import EMBEDDING_MODEL_NAME, EMBEDDING_SERVER_URL, SharedEmbeddings, create_local_embeddings
+
+# ─────────────────────────────
+# 1. Settings
+# ─────────────────────────────
+EMBED_SERVER_MAX_BATCH = int(os.getenv("EMBED_SERVER_MAX_BATCH", "64"))  # texts per model call
+EMBED_SERVER_MAX_WAIT_MS = float(os.getenv("EMBED_SERVER_MAX_WAIT_MS", "5"))  # how long a batch stays open
+EMBED_SERVER_TIMEOUT = float(os.getenv("EMBED_SERVER_TIMEOUT", "60"))
+
+
+def _encode_vectors(vectors) -> dict:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    return {"shape": list(matrix.shape), "vectors": base64.b64encode(matrix.tobytes()).decode("ascii")}
+
+
+def _decode_vectors(payload: dict) -> List[List[float]]:
+    matrix = np.frombuffer(base64.b64decode(payload["vectors"]), dtype=np.float32)
+    return matrix.reshape(payload["shape"]).tolist()
+
+
+# ─────────────────────────────
+# 2. Micro-batching
+# ─────────────────────────────
+@dataclass
+class _Request:
+    texts: List[str]
+    kind: str
+    future: Future = field(default_factory=Future)
+
+
+class MicroBatcher:
+    """Merges concurrent embed requests into batched model calls on one thread."""
+
+    def __init__(self, embeddings: SharedEmbeddings, max_batch: int = EMBED_SERVER_MAX_BATCH,
+                 max_wait_ms: float = EMBED_SERVER_MAX_WAIT_MS):
+        self.embeddings = embeddings
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._requests: "queue.Queue[_Request]" = queue.Queue()
+        self.connections = 0  # open client connections; 0 = unknown, always wait out the window
+        self._connections_lock = threading.Lock()
+        self.batches = 0
+        self.texts = 0
+        self.requests = 0
+        self.encode_seconds = 0.0
+        threading.Thread(target=self._run, name="kotori-embed-batcher", daemon=True).start()
+
+    def connection_opened(self) -> None:
+        with self._connections_lock:
+            self.connections += 1
+
+    def connection_closed(self) -> None:
+        with self._connections_lock:
+            self.connections -= 1
+
+    def submit(self, texts: List[str], kind: str = "document") -> Future:
+        request = _Request(list(texts), kind)
+        self._requests.put(request)
+        return request.future
+
+    def embed(self, texts: List[str], kind: str = "document", timeout: Optional[float] = EMBED_SERVER_TIMEOUT):
+        return self.submit(texts, kind).result(timeout)
+
+    def _collect(self) -> List[_Request]:
+        batch = [self._requests.get()]
+        size = len(batch[0].texts)
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch:
+            if self.connections and len(batch) >= self.connections:
+                break  # every connected client is already in this batch
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self._requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.texts)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            for kind in ("query", "document"):
+                requests = [request for request in batch if request.kind == kind]
+                if not requests:
+                    continue
+                texts = [text for request in requests for text in request.texts]
+                try:
+                    if kind == "query":
+                        vectors = self.embeddings.embed_queries(texts)
+                    else:
+                        vectors = self.embeddings.embed_documents(texts)
+                except Exception as e:
+                    for request in requests:
+                        request.future.set_exception(e)
+                    continue
+                offset = 0
+                for request in requests:
+                    request.future.set_result(vectors[offset:offset + len(request.texts)])
+                    offset += len(request.texts)
+                self.texts += len(texts)
+            self.batches += 1
+            self.requests += len(batch)
+            self.encode_seconds += time.perf_counter() - started
+
+    def report(self) -> dict:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "texts": self.texts,
+            "mean_batch_texts": round(self.texts / self.batches, 2) if self.batches else 0.0,
+            "mean_requests_per_batch": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "encode_seconds": round(self.encode_seconds, 3),
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+
+# ─────────────────────────────
+# 3. Server
+# ─────────────────────────────
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so clients reuse one connection
+    batcher: MicroBatcher
+
+    def setup(self):
+        super().setup()
+        self.batcher.connection_opened()
+
+    def finish(self):
+        self.batcher.connection_closed()
+        super().finish()
+
+    def log_message(self, format, *args):
+        pass  # one line per embed call would drown the worker logs
+
+    def _reply(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path != "/health":
+            return self._reply(404, {"error": "not found"})
+        embeddings = self.batcher.embeddings
+        self._reply(200, {
+            "status": "ok",
+            "model_name": embeddings.model_name,
+            "loaded": embeddings.is_loaded,
+            "batching": self.batcher.report(),
+            "cache": embeddings.cache.stats() if embeddings.cache is not None else None,
+        })
+
+    def do_POST(self):
+        if self.path != "/embed":
+            return self._reply(404, {"error": "not found"})
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            texts, kind = body["texts"], body.get("kind", "document")
+            if kind not in ("query", "document") or not isinstance(texts, list):
+                return self._reply(400, {"error": "expected texts: list and kind: query | document"})
+        except (ValueError, KeyError) as e:
+            return self._reply(400, {"error": f"bad request: {e}"})
+        try:
+            vectors = self.batcher.embed(texts, kind) if texts else []
+        except Exception as e:
+            print(f"❌ Embedding server error: {e}")
+            return self._reply(500, {"error": str(e)})
+        self._reply(200, _encode_vectors(vectors))
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128  # listen backlog; the default of 5 refuses bursts of new workers
+
+
+class _TCPHTTPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+
+def make_server(url: str, embeddings: Optional[SharedEmbeddings] = None, **batching):
+    """A threaded server for url (unix:///path or http://host:port) in front of one MicroBatcher."""
+    # Always a local model: get_embeddings() would be a client of this very server
+    batcher = MicroBatcher(embeddings or create_local_embeddings(), **batching)
+    handler = type("EmbeddingHandler", (_Handler,), {"batcher": batcher})
+    if url.startswith("unix://"):
+        path = url[len("unix://"):]
+        if os.path.exists(path):
+            os.unlink(path)  # stale socket from a previous run
+        server = _UnixHTTPServer(path, handler)
+    else:
+        from urllib.parse import urlparse
+        parsed = urlparse(url)
+        server = _TCPHTTPServer((parsed.hostname or "127.0.0.1", parsed.port or 8766), handler)
+    server.batcher = batcher
+    return server
+
+
+# ─────────────────────────────
+# 4. Client
+# ─────────────────────────────
+class RemoteEmbeddings(SharedEmbeddings):
+    """
+    SharedEmbeddings that delegate to the embedding server instead of
+    loading the model; returned by get_embeddings() when
+    EMBEDDING_SERVER_URL is set. Caching happens on the server.
+    """
+
+    def __init__(self, url: str = EMBEDDING_SERVER_URL, model_name: str = EMBEDDING_MODEL_NAME):
+        super().__init__(model_name=model_name, cache=None)
+        self.url = url
+        self.requests = 0
+        self.request_seconds = 0.0
+        self._client = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return False  # never in this process
+
+    @property
+    def model(self):
+        raise RuntimeError("RemoteEmbeddings has no local model; embeddings come from the server")
+
+    def _http_client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import httpx
+                    if self.url.startswith("unix://"):
+                        transport = httpx.HTTPTransport(uds=self.url[len("unix://"):])
+                        self._client = httpx.Client(transport=transport, base_url="http://embedding-server",
+                                                    timeout=EMBED_SERVER_TIMEOUT)
+                    else:
+                        self._client = httpx.Client(base_url=self.url, timeout=EMBED_SERVER_TIMEOUT)
+        return self._client
+
+    def _post(self, texts: List[str], kind: str) -> List[List[float]]:
+        if not texts:
+            return []
+        started = time.perf_counter()
+        response = self._http_client().post("/embed", json={"texts": texts, "kind": kind})
+        if response.status_code != 200:
+            raise RuntimeError(f"Embedding server returned {response.status_code}: {response.text[:200]}")
+        vectors = _decode_vectors(response.json())
+        self.requests += 1
+        self.request_seconds += time.perf_counter() - started
+        return vectors
+
+    def embed_documents(self, texts: List[str], batch_size: Optional[int] = None) -> List[List[float]]:
+        # batch_size is the server's business; it batches across every caller
+        return self._post(list(texts), "document")
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._post([text], "query")[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self._post(list(texts), "query")
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    def load_report(self) -> dict:
+        report = {
+            "model_name": self.model_name,
+            "loaded": False,
+            "server": self.url,
+            "requests": self.requests,
+            "mean_request_ms": round(self.request_seconds / self.requests * 1000, 2) if self.requests else None,
+        }
+        try:
+            report["server_health"] = self._http_client().get("/health").json()
+        except Exception as e:
+            report["server_health"] = f"unreachable: {e}"
+        return report
+
+
+__all__ = [
+    "MicroBatcher",
+    "RemoteEmbeddings",
+    "make_server",
+]
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve the shared embedding model to local workers")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--socket", help="Unix socket path")
+    target.add_argument("--port", type=int, help="localhost HTTP port")
+    parser.add_argument("--max-batch", type=int, default=EMBED_SERVER_MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=EMBED_SERVER_MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    if args.socket:
+        url = f"unix://{args.socket}"
+    elif args.port:
+        url = f"http://127.0.0.1:{args.port}"
+    else:
+        url = EMBEDDING_SERVER_URL or "unix:///tmp/kotori-embed.sock"
+    server = make_server(url, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+    server.batcher.embeddings.embed_query("warm up")  # load the model before taking requests
+    print(f"🧬 Embedding server for {EMBEDDING_MODEL_NAME} listening on {url} "
+          f"(batches of up to {args.max_batch} texts, {args.max_wait_ms:g} ms window)")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
@@ -0,0 +1,272 @@
+"""
+Shared embedding provider for Kotori.ai.
+
+Every agent, memory_utils and loader used to build its own copy of the BGE
+model at import time. This module holds a single, lazily initialised instance
+per process so the model is loaded once, on the first embed call.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+from functools import partial
+from typing import List, Optional
+
+from embedding_cache import EMBEDDING_CACHE_ENABLED, EmbeddingCache, cached_embed
+
+# ─────────────────────────────
+# 1. Model settings
+# ─────────────────────────────
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "BAAI/bge-base-en-v1.5")
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE", "cpu")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "0"))  # 0 = size from RAM and CPU threads
+# unix:///path or http://host:port of embedding_server.py; empty = load the model in-process
+EMBEDDING_SERVER_URL = os.getenv("EMBEDDING_SERVER_URL", "")
+# Rough activation footprint of one ~200-token chunk through BGE-base on CPU
+_BYTES_PER_TEXT = 8 * 1024 * 1024
+
+
+def _resident_memory_mb() -> float:
+    """Current resident set size of this process in MB (0.0 if unknown)."""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is reported in bytes on macOS and in KB elsewhere
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except Exception:
+        return 0.0
+
+
+def _available_memory_bytes() -> int:
+    """MemAvailable from /proc/meminfo, falling back to free physical pages."""
+    try:
+        with open("/proc/meminfo") as meminfo:
+            for line in meminfo:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return 2 * 1024 ** 3
+
+
+def adaptive_batch_size(memory_fraction: float = 0.25) -> int:
+    """
+    Encode batch size for ingestion: enough texts to keep every CPU thread
+    busy, capped so activations stay within a fraction of available RAM.
+    EMBED_BATCH_SIZE overrides it.
+    """
+    if EMBED_BATCH_SIZE > 0:
+        return EMBED_BATCH_SIZE
+    threads = os.cpu_count() or 1
+    by_threads = threads * 32
+    by_memory = int(_available_memory_bytes() * memory_fraction / _BYTES_PER_TEXT)
+    return max(16, min(by_threads, by_memory, 512))
+
+
+# ─────────────────────────────
+# 2. Lazy shared embeddings
+# ─────────────────────────────
+class SharedEmbeddings:
+    """
+    LangChain embeddings that load the HuggingFace model on first use.
+    Lookups go through the persistent embedding cache when one is set, so
+    cached texts never touch (or even load) the model. The Embeddings
+    interface is implemented rather than inherited: subclassing it imports
+    langchain_core and langsmith, which a router-only process never needs.
+    """
+
+    def __init__(
+        self,
+        model_name: str = EMBEDDING_MODEL_NAME,
+        device: str = EMBEDDING_DEVICE,
+        cache: Optional[EmbeddingCache] = None,
+    ):
+        self.model_name = model_name
+        self.device = device
+        self.cache = cache
+        self._model = None
+        self._lock = threading.Lock()
+        self.load_seconds: Optional[float] = None
+        self.rss_before_mb: Optional[float] = None
+        self.rss_after_mb: Optional[float] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def model(self):
+        """The underlying HuggingFaceEmbeddings, loaded once per process."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._load()
+        return self._model
+
+    def _load(self):
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        self.rss_before_mb = _resident_memory_mb()
+        start = time.perf_counter()
+        model = HuggingFaceEmbeddings(
+            model_name=self.model_name,
+            model_kwargs={"device": self.device},
+            encode_kwargs={"normalize_embeddings": True}
+        )
+        self.load_seconds = time.perf_counter() - start
+        self.rss_after_mb = _resident_memory_mb()
+        print(
+            f"🧬 Loaded embedding model {self.model_name} in {self.load_seconds:.2f}s "
+            f"(RSS {self.rss_before_mb:.0f} MB → {self.rss_after_mb:.0f} MB)"
+        )
+        return model
+
+    def _encode(self, texts: List[str], batch_size: Optional[int]) -> List[List[float]]:
+        """Encodes with an explicit sentence-transformers batch size when one is given."""
+        client = getattr(self.model, "_client", None)
+        if batch_size is None or client is None:
+            return self.model.embed_documents(texts)
+        vectors = client.encode(
+            [text.replace("\n", " ") for text in texts],
+            batch_size=batch_size,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+        return vectors.tolist()
+
+    def embed_documents(self, texts: List[str], batch_size: Optional[int] = None) -> List[List[float]]:
+        if self.cache is None:
+            return self._encode(texts, batch_size)
+        return cached_embed(
+            self.cache, self.model_name, texts,
+            lambda missing: self._encode(missing, batch_size)
+        )
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.cache is None:
+            return self.model.embed_query(text)
+        return cached_embed(
+            self.cache, self.model_name, [text],
+            lambda missing: [self.model.embed_query(missing[0])],
+            kind="query"
+        )[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Batched embed_query, for the embedding server. HuggingFaceEmbeddings
+        encodes queries and documents with the same kwargs, so the vectors
+        match one embed_query per text; cache entries are kept as queries.
+        """
+        if self.cache is None:
+            return self._encode(texts, None)
+        return cached_embed(
+            self.cache, self.model_name, texts,
+            lambda missing: self._encode(missing, None),
+            kind="query"
+        )
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.get_running_loop().run_in_executor(None, partial(self.embed_documents, texts))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await asyncio.get_running_loop().run_in_executor(None, partial(self.embed_query, text))
+
+    def load_report(self) -> dict:
+        """Load time and resident memory figures for this worker."""
+        report = {
+            "model_name": self.model_name,
+            "loaded": self.is_loaded,
+            "load_seconds": self.load_seconds,
+            "rss_before_mb": self.rss_before_mb,
+            "rss_after_mb": self.rss_after_mb,
+            "rss_now_mb": _resident_memory_mb(),
+        }
+        if self.rss_before_mb is not None and self.rss_after_mb is not None:
+            report["model_rss_mb"] = self.rss_after_mb - self.rss_before_mb
+        if self.cache is not None:
+            report["cache"] = self.cache.stats()
+        return report
+
+
+_shared_embeddings: Optional[SharedEmbeddings] = None
+_shared_lock = threading.Lock()
+
+
+def create_local_embeddings() -> SharedEmbeddings:
+    """A provider that loads the model in this process, with the persistent cache when enabled."""
+    cache = EmbeddingCache() if EMBEDDING_CACHE_ENABLED else None
+    return SharedEmbeddings(cache=cache)
+
+
+def get_embeddings() -> SharedEmbeddings:
+    """
+    Returns the process-wide embedding provider (model loads on first embed).
+    With EMBEDDING_SERVER_URL set it is a client of the shared embedding
+    server, and this process never loads the model.
+    """
+    global _shared_embeddings
+    if _shared_embeddings is None:
+        with _shared_lock:
+            if _shared_embeddings is None:
+                if EMBEDDING_SERVER_URL:
+                    from embedding_server import RemoteEmbeddings
+                    _shared_embeddings = RemoteEmbeddings(EMBEDDING_SERVER_URL)
+                else:
+                    _shared_embeddings = create_local_embeddings()
+    return _shared_embeddings
+
+
+def query_embedding_for(state: dict) -> List[float]:
+    """
+    Returns the turn's query embedding from the graph state, embedding the
+    input once (and storing it back) when the caller did not provide one.
+    """
+    embedding = state.get("query_embedding")
+    if not embedding:
+        embedding = get_embeddings().embed_query(state.get("input", ""))
+        state["query_embedding"] = embedding
+    return embedding
+
+
+async def aquery_embedding_for(state: dict) -> List[float]:
+    """Async query_embedding_for."""
+    embedding = state.get("query_embedding")
+    if not embedding:
+        embedding = await get_embeddings().aembed_query(state.get("input", ""))
+        state["query_embedding"] = embedding
+    return embedding
+
+
+def embedding_report() -> dict:
+    """Convenience wrapper around get_embeddings().load_report()."""
+    return get_embeddings().load_report()
+
+
+__all__ = [
+    "EMBEDDING_MODEL_NAME",
+    "SharedEmbeddings",
+    "adaptive_batch_size",
+    "create_local_embeddings",
+    "get_embeddings",
+    "query_embedding_for",
+    "aquery_embedding_for",
+    "embedding_report",
+]
+
+if __name__ == "__main__":
+    embeddings = get_embeddings()
+    embeddings.embed_query("warm up")
+    for key, value in embeddings.load_report().items():
+        print(f"{key}: {value}")
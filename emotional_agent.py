@@ -2,14 +2,15 @@ import warnings
 warnings.filterwarnings("ignore", message=".*encoder_attention_mask.*", category=FutureWarning)
 
 import os
-from pathlib import Path
+from typing import List
 from dotenv import load_dotenv
-from langchain.schema import Document
-from memory_utils import save_memory
-from langchain.prompts import PromptTemplate
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_groq import ChatGroq
+from memory_utils import asave_memory, save_memory
+from retrieval import acorpus_results, corpus_results
+from streaming import astream_llm, stream_llm
+from context_packer import pack_for_agent
+from embeddings import aquery_embedding_for, get_embeddings, query_embedding_for
+from agent_steps import arun_steps, run_steps, step
+from llm_client import lazy_chain
 
 # Load .env
 load_dotenv()
@@ -17,27 +18,13 @@ groq_api_key = os.getenv("GROQ_API_KEY")
 if not groq_api_key:
     raise EnvironmentError("❌ GROQ_API_KEY missing.")
 
-# Initialize embedding model
-embedding_model = HuggingFaceEmbeddings(
-    model_name="BAAI/bge-base-en-v1.5",
-    model_kwargs={"device": "cpu"},
-    encode_kwargs={"normalize_embeddings": True}
-)
-
-# Load Chroma vectorstore
-# Use relative path for deployment compatibility
-CHROMA_DIR = Path(os.getenv("CHROMA_DB_PATH", Path(__file__).parent / "chroma"))
-CHROMA_DIR.mkdir(parents=True, exist_ok=True)
-
-vectorstore = Chroma(persist_directory=str(CHROMA_DIR), embedding_function=embedding_model)
+# Shared, lazily loaded embedding model (one copy per process)
+embedding_model = get_embeddings()
 
 # GROQ LLM for emotional support
-llm = ChatGroq(
-    groq_api_key=groq_api_key,
-    model_name="llama-3.3-70b-versatile",
-    temperature=0.4,  # Slightly higher for more natural emotional responses
-    max_tokens=200  # Reduced for concise responses
-)
+# Shared pooled client (llm_client.py); only the call options are per agent
+# Built on first call, so importing the agent does not load langchain_groq
+EMOTIONAL_LLM_OPTIONS = dict(temperature=0.4, max_tokens=200)  # Slightly warmer for natural emotional responses, short replies
 
 # Concise Prompt Template for Emotional Support
 EMOTION_PROMPT_TEMPLATE = """You are Kotori, a compassionate assistant helping with Empty Nest Syndrome.
@@ -60,137 +47,167 @@ What would you like to do next? Do you want to know more about empty nest? Do yo
 
 **Supportive Response:**"""
 
-EMOTION_PROMPT = PromptTemplate(
-    input_variables=["context", "question"],
-    template=EMOTION_PROMPT_TEMPLATE
-)
+emotional_chain = lazy_chain(EMOTION_PROMPT_TEMPLATE, **EMOTIONAL_LLM_OPTIONS)
 
-emotional_chain = EMOTION_PROMPT | llm
-
-# LangGraph-compatible node function
-def emotional_checkin_node(state: dict) -> dict:
-    query = state.get("input", "")
-    print(f"💝 Emotional support processing: {query}")
-    
-    # Retrieve context from Chroma
-    try:
-        docs = vectorstore.similarity_search_with_score(query, k=2)  # Reduced for focus
-        context = "\n\n---\n\n".join([doc.page_content for doc, _ in docs])
-        print(f"✅ Retrieved context for emotional support: {len(context)} chars")
-    except Exception as e:
-        print(f"⚠️ Vectorstore search error: {e}")
-        context = ""
+# ───────────────────────
+# LangGraph-compatible node functions
+# ───────────────────────
+# General emotional support context when retrieval finds nothing
+DEFAULT_CONTEXT = "Empty Nest Syndrome is a common experience where parents feel sadness, loneliness, or loss of purpose when their children leave home. These feelings are completely normal and temporary."
 
+def _chain_inputs(query: str, texts: List[str]) -> dict:
     # If no context, provide general emotional support context
-    if not context.strip():
-        context = "Empty Nest Syndrome is a common experience where parents feel sadness, loneliness, or loss of purpose when their children leave home. These feelings are completely normal and temporary."
-
-    # Invoke chain with GROQ
-    try:
-        print(f"🚀 Calling GROQ for emotional support...")
-        
-        result = emotional_chain.invoke({
-            "context": context[:3000],  # Increased context for better emotional support
-            "question": query
-        })
-        
-        # Extract response from ChatGroq
-        if hasattr(result, 'content'):
-            response = result.content.strip()
-        else:
-            response = str(result).strip()
-            
-        print(f"✅ Generated emotional response: {response[:100]}...")
+    if not any(text.strip() for text in texts):
+        texts = [DEFAULT_CONTEXT]
+    print(f"🚀 Calling GROQ for emotional support...")
+    return {
+        "context": pack_for_agent("emotional", texts),  # Whole chunks in rank order up to the emotional token budget
+        "question": query
+    }
+
+def _is_llm_answer(response: str) -> bool:
+    """True when the LLM text is long enough to keep instead of a keyword fallback."""
+    return bool(response) and len(response) >= 20
+
+def _checked_response(query: str, response: str) -> str:
+    """Validates the full LLM text, swapping in keyword fallbacks when it is unusable."""
+    print(f"✅ Generated emotional response: {response[:100]}...")
+    
+    # Validate response and format
+    if not _is_llm_answer(response):
+        # Create a more query-specific fallback based on keywords in the query
+        query_lower = query.lower()
         
-        # Validate response and format
-        if not response or len(response) < 20:
-            # Create a more query-specific fallback based on keywords in the query
-            query_lower = query.lower()
-            
-            if "sad" in query_lower or "depress" in query_lower or "down" in query_lower or "blue" in query_lower:
-                response = """• It's normal to feel sad when your children leave home.
+        if "sad" in query_lower or "depress" in query_lower or "down" in query_lower or "blue" in query_lower:
+            response = """• It's normal to feel sad when your children leave home.
 
 • Many parents feel down during this time.
 
 • Talk to a professional if your sadness feels too heavy.
 
 What would you like to do next? Do you want to know more about empty nest? Do you want to tell me how you are feeling today? Shall I suggest activities to help you cope with this?"""
-            elif "lonely" in query_lower or "alone" in query_lower or "empty" in query_lower:
-                response = """• Feeling empty is normal when your home changes.
+        elif "lonely" in query_lower or "alone" in query_lower or "empty" in query_lower:
+            response = """• Feeling empty is normal when your home changes.
 
 • Many parents struggle with this big change in their life.
 
 • This is a chance to rediscover yourself.
 
 What would you like to do next? Do you want to know more about empty nest? Do you want to tell me how you are feeling today? Shall I suggest activities to help you cope with this?"""
-            elif "purpose" in query_lower or "meaning" in query_lower or "identity" in query_lower:
-                response = """• It's normal to question your purpose after being a parent for so long.
+        elif "purpose" in query_lower or "meaning" in query_lower or "identity" in query_lower:
+            response = """• It's normal to question your purpose after being a parent for so long.
 
 • This time can help you grow in new ways.
 
 • Give yourself time to adjust to this change.
 
 What would you like to do next? Do you want to know more about empty nest? Do you want to tell me how you are feeling today? Shall I suggest activities to help you cope with this?"""
-            else:
-                response = """• Your feelings are valid.
+        else:
+            response = """• Your feelings are valid.
 
 • Many parents find this time hard.
 
 • Be kind to yourself during this change.
 
 What would you like to do next? Do you want to know more about empty nest? Do you want to tell me how you are feeling today? Shall I suggest activities to help you cope with this?"""
-        
-        # Ensure proper format if missing
-        if "•" not in response:
-            # Make the formatting more query-specific
-            query_lower = query.lower()
-            intro = "I understand you're going through a difficult time."
-            follow_up = "What would you like to do next? Do you want to know more about empty nest? Or do you want to tell me how you are feeling today? Or shall I suggest activities to help you cope with this?"
-            
-            response = f"• {intro} {response}\n\n{follow_up}"
-            
-    except Exception as e:
-        print(f"❌ GROQ error in emotional agent: {e}")
-        
-        # Create a more query-specific error fallback based on keywords in the query
+    
+    # Ensure proper format if missing
+    if "•" not in response:
+        # Make the formatting more query-specific
         query_lower = query.lower()
+        intro = "I understand you're going through a difficult time."
+        follow_up = "What would you like to do next? Do you want to know more about empty nest? Or do you want to tell me how you are feeling today? Or shall I suggest activities to help you cope with this?"
         
-        if "sad" in query_lower or "depress" in query_lower or "down" in query_lower or "blue" in query_lower:
-            response = """• The sadness you're feeling is a natural response to this significant life change.
+        response = f"• {intro} {response}\n\n{follow_up}"
+        
+    return response
+
+def _error_response(query: str) -> str:
+    """Keyword fallback when the GROQ call fails."""
+    # Create a more query-specific error fallback based on keywords in the query
+    query_lower = query.lower()
+    
+    if "sad" in query_lower or "depress" in query_lower or "down" in query_lower or "blue" in query_lower:
+        response = """• The sadness you're feeling is a natural response to this significant life change.
 • Many parents experience similar feelings of loss and grief when children leave home.
 • These emotions, while difficult, often become less intense as you adjust to your new normal.
 
 What would you like to do next? Do you want to know more about empty nest? Do you want to tell me how you are feeling today? Shall I suggest activities to help you cope with this?"""
-        elif "lonely" in query_lower or "alone" in query_lower or "empty" in query_lower:
-            response = """• The emptiness of your home can be one of the most challenging aspects of this transition.
+    elif "lonely" in query_lower or "alone" in query_lower or "empty" in query_lower:
+        response = """• The emptiness of your home can be one of the most challenging aspects of this transition.
 • This feeling of loneliness is shared by many parents adjusting to children's departure.
 • Creating new routines and connections can gradually help fill the space that feels empty now.
 
 What would you like to do next? Do you want to know more about empty nest? Do you want to tell me how you are feeling today? Shall I suggest activities to help you cope with this?"""
-        elif "purpose" in query_lower or "meaning" in query_lower or "identity" in query_lower or "lost" in query_lower:
-            response = """• Many parents feel a sense of lost purpose when their primary caregiving role changes.
+    elif "purpose" in query_lower or "meaning" in query_lower or "identity" in query_lower or "lost" in query_lower:
+        response = """• Many parents feel a sense of lost purpose when their primary caregiving role changes.
 • This transition is an opportunity to rediscover aspects of yourself beyond parenting.
 • Finding new meaning often comes through exploring interests and connections you couldn't fully pursue before.
 
 What would you like to do next? Do you want to know more about empty nest? Do you want to tell me how you are feeling today? Shall I suggest activities to help you cope with this?"""
-        else:
-            response = """• I hear you, and your feelings are completely valid and normal.
+    else:
+        response = """• I hear you, and your feelings are completely valid and normal.
 • Empty Nest Syndrome is challenging, but these emotions will ease with time.
 • You're not alone in this - many parents successfully navigate this transition.
 
 What would you like to do next? Do you want to know more about empty nest? Do you want to tell me how you are feeling today? Shall I suggest activities to help you cope with this?"""
+    return response
 
+def _finish(state: dict, response: str) -> dict:
     # Clean response
-    response = response.replace("**Supportive Response:**", "").strip()
+    state["response"] = response.replace("**Supportive Response:**", "").strip()
+    state["agent"] = "emotional"
+    return state
+
+def _emotional_steps(state: dict):
+    """Emotional node body; run_steps / arun_steps make (or await) each yielded call."""
+    query = state.get("input", "")
+    print(f"💝 Emotional support processing: {query}")
+
+    # Embed the query once per turn; retrieval and memory reuse the vector
+    try:
+        query_embedding = yield step(query_embedding_for, aquery_embedding_for, state)
+    except Exception as e:
+        print(f"⚠️ Query embedding error: {e}")
+        query_embedding = None
+    
+    # Retrieve context from Chroma
+    try:
+        # Reduced for focus; prefetched in speculative mode
+        docs = yield step(corpus_results, acorpus_results, state, query_embedding, k=2)
+        context_texts = [doc.page_content for doc, _ in docs]
+        print(f"✅ Retrieved context for emotional support: {sum(len(t) for t in context_texts)} chars")
+    except Exception as e:
+        print(f"⚠️ Vectorstore search error: {e}")
+        context_texts = []
+
+    # Invoke chain with GROQ
+    try:
+        # Tokens stream to the UI as they arrive; the checks below run on the full text
+        inputs = _chain_inputs(query, context_texts)
+        response = (yield step(stream_llm, astream_llm, emotional_chain, inputs, agent="emotional")).strip()
+        # Keyword fallbacks must never reach the semantic cache
+        state["cacheable"] = _is_llm_answer(response)
+        response = _checked_response(query, response)
+    except Exception as e:
+        print(f"❌ GROQ error in emotional agent: {e}")
+        response = _error_response(query)
+        state["cacheable"] = False
+
+    state = _finish(state, response)
 
     # Save memory using utility
     try:
-        save_memory(query, response, memory_type="emotional")
+        yield step(save_memory, asave_memory, query, state["response"], memory_type="emotional", query_embedding=query_embedding)
         print(f"✅ Saved emotional interaction to memory")
     except Exception as e:
         print(f"⚠️ Memory save error: {e}")
 
-    # Return new state
-    state["response"] = response
-    state["agent"] = "emotional"
-    return state
\ No newline at end of file
+    return state
+
+def emotional_checkin_node(state: dict) -> dict:
+    return run_steps(_emotional_steps(state))
+
+async def aemotional_checkin_node(state: dict) -> dict:
+    """Async emotional_checkin_node: awaits retrieval, the Groq stream and the memory write."""
+    return await arun_steps(_emotional_steps(state))
@@ -0,0 +1,80 @@
+"""
+Versioned on-disk index snapshots with an atomic publish.
+
+The mmap corpus index and the BM25 index are each made of several files.
+Replacing those files one by one lets a reader that opens mid-export pair
+new vectors with old ids. Instead, every export writes a complete snapshot
+into a fresh directory and then publishes it by atomically replacing a small
+pointer file that names it:
+
+    index/current-vectors     -> "vectors-<ns>"
+    index/vectors-<ns>/       vectors.npy, texts.bin, ...
+    index/current-bm25        -> "bm25-<ns>"
+    index/bm25-<ns>/          bm25.npz, bm25_vocab.json
+
+Readers resolve the pointer once and open everything from that directory.
+`snapshot_version` identifies the published snapshot, so long-lived
+processes can reopen their index when an export publishes a new one. Old
+snapshots are pruned after a publish. A reader that already mapped their
+files keeps them until it closes them.
+"""
+
+import os
+import time
+import shutil
+import threading
+from pathlib import Path
+from typing import Optional, Tuple
+
+SNAPSHOTS_KEPT = 2  # the current one and its predecessor, for readers still opening it
+
+
+def _pointer(root: Path, kind: str) -> Path:
+    return Path(root) / f"current-{kind}"
+
+
+def new_snapshot_dir(root: Path, kind: str) -> Path:
+    """A fresh, unpublished directory for one snapshot."""
+    path = Path(root) / f"{kind}-{time.time_ns()}-{os.getpid()}"
+    path.mkdir(parents=True)
+    return path
+
+
+def publish_snapshot(root: Path, kind: str, snapshot_dir: Path) -> None:
+    """Makes snapshot_dir the current snapshot in one rename, then prunes old ones."""
+    pointer = _pointer(root, kind)
+    tmp = pointer.with_name(f"{pointer.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(Path(snapshot_dir).name)
+    os.replace(tmp, pointer)
+
+    # Names start with the creation time in ns, so they sort oldest first
+    snapshots = sorted(path for path in Path(root).glob(f"{kind}-*") if path.is_dir())
+    for stale in snapshots[:-SNAPSHOTS_KEPT]:
+        if stale.name != Path(snapshot_dir).name:
+            shutil.rmtree(stale, ignore_errors=True)
+
+
+def current_snapshot(root: Path, kind: str) -> Path:
+    """Directory of the published snapshot (root itself for an unversioned, older layout)."""
+    try:
+        name = _pointer(root, kind).read_text().strip()
+    except FileNotFoundError:
+        return Path(root)
+    return Path(root) / name
+
+
+def snapshot_version(root: Path, kind: str) -> Tuple[int, int]:
+    """Identity of the pointer file ((0, 0) before the first publish); changes on every publish."""
+    try:
+        stat = os.stat(_pointer(root, kind))
+    except FileNotFoundError:
+        return (0, 0)
+    return (stat.st_ino, stat.st_mtime_ns)
+
+
+__all__ = [
+    "current_snapshot",
+    "new_snapshot_dir",
+    "publish_snapshot",
+    "snapshot_version",
+]
@@ -0,0 +1,129 @@
+"""
+Ingest manifest for incremental loading.
+
+Records, per source PDF, its content hash, size, mtime and the chunk IDs it
+produced in Chroma. loader.main uses it to re-process only new or changed
+files and to delete the chunks of changed or removed ones.
+"""
+
+import os
+import json
+import hashlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+CHROMA_DIR = Path(os.getenv("CHROMA_DB_PATH", Path(__file__).parent / "chroma"))
+MANIFEST_PATH = Path(os.getenv("INGEST_MANIFEST_PATH", CHROMA_DIR / "ingest_manifest.json"))  # lives with the store it describes
+MANIFEST_VERSION = 1
+
+
+def file_sha256(path: Path, block_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@dataclass
+class IngestPlan:
+    """Which source files need work on this run."""
+    new: List[Path] = field(default_factory=list)
+    changed: List[Path] = field(default_factory=list)
+    unchanged: List[Path] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+    @property
+    def to_process(self) -> List[Path]:
+        return sorted(self.new + self.changed, key=lambda p: p.name)
+
+    @property
+    def has_work(self) -> bool:
+        return bool(self.new or self.changed or self.removed)
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.new)} new, {len(self.changed)} changed, "
+            f"{len(self.unchanged)} unchanged, {len(self.removed)} removed"
+        )
+
+
+class IngestManifest:
+    """JSON manifest of ingested files, keyed by the source path stored in chunk metadata."""
+
+    def __init__(self, path: Path = MANIFEST_PATH, files: Dict[str, dict] = None):
+        self.path = Path(path)
+        self.files: Dict[str, dict] = files or {}
+        self._dirty = False
+
+    @classmethod
+    def load(cls, path: Path = MANIFEST_PATH) -> "IngestManifest":
+        path = Path(path)
+        if not path.exists():
+            return cls(path)
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            # A corrupt manifest only costs a full re-ingest
+            return cls(path)
+        if data.get("version") != MANIFEST_VERSION:
+            return cls(path)
+        return cls(path, data.get("files", {}))
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps({"version": MANIFEST_VERSION, "files": self.files}, indent=2))
+        os.replace(tmp, self.path)
+        self._dirty = False
+
+    def plan(self, pdf_files: Iterable[Path]) -> IngestPlan:
+        """
+        Classifies files. Size + mtime matching the manifest is trusted
+        without hashing; otherwise the content hash decides.
+        """
+        plan = IngestPlan()
+        present = set()
+        for pdf in sorted(pdf_files, key=lambda p: p.name):
+            source = str(pdf)
+            present.add(source)
+            entry = self.files.get(source)
+            stat = pdf.stat()
+            if entry is None:
+                plan.new.append(pdf)
+            elif entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                plan.unchanged.append(pdf)
+            elif entry["size"] == stat.st_size and entry["sha256"] == file_sha256(pdf):
+                # Touched but identical: just refresh the mtime
+                entry["mtime_ns"] = stat.st_mtime_ns
+                self._dirty = True
+                plan.unchanged.append(pdf)
+            else:
+                plan.changed.append(pdf)
+        plan.removed = sorted(source for source in self.files if source not in present)
+        return plan
+
+    def chunk_ids(self, source: str) -> List[str]:
+        return list(self.files.get(source, {}).get("chunk_ids", []))
+
+    def record(self, pdf: Path, chunk_ids: List[str]) -> None:
+        stat = pdf.stat()
+        self.files[str(pdf)] = {
+            "sha256": file_sha256(pdf),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "chunk_ids": sorted(chunk_ids),
+        }
+        self._dirty = True
+
+    def forget(self, source: str) -> None:
+        if self.files.pop(source, None) is not None:
+            self._dirty = True
+
+    @property
+    def dirty(self) -> bool:
+        return self._dirty
+
+
+__all__ = ["IngestManifest", "IngestPlan", "MANIFEST_PATH", "file_sha256"]
@@ -0,0 +1,249 @@
+"""
+Streaming ingest pipeline: load → split → dedup → clean → embed → upsert.
+
+Instead of materialising every document, chunk and vector as full lists, the
+corpus flows through generators and bounded queues. A producer thread parses
+and splits the next pages while the main thread embeds the current window
+and a writer thread upserts the previous one, so peak memory is bounded by
+the window and queue sizes rather than by the corpus.
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Set
+
+from langchain_core.documents import Document
+
+from embeddings import adaptive_batch_size
+from loader import SIMILARITY_THRESHOLD, CHUNK_SIZE, CHUNK_OVERLAP, clean_text, get_embeddings, upsert_with_retry
+from minhash_dedup import MinHashLSHDeduplicator
+from parallel_pdf import iter_pdf_documents
+
+logger = logging.getLogger(__name__)
+
+# ─────────────────────────────
+# 1. Settings
+# ─────────────────────────────
+PIPELINE_WINDOW = int(os.getenv("PIPELINE_WINDOW", "0"))            # chunks embedded per window; 0 = adaptive
+PIPELINE_QUEUE_WINDOWS = int(os.getenv("PIPELINE_QUEUE_WINDOWS", "2"))  # windows buffered ahead
+
+_DONE = object()
+
+
+@dataclass
+class StageStats:
+    """Items processed and busy time for one stage."""
+    items: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        return self.items / self.seconds if self.seconds else 0.0
+
+
+@dataclass
+class PipelineResult:
+    ids_by_source: Dict[str, List[str]] = field(default_factory=dict)
+    parsed_sources: Set[str] = field(default_factory=set)
+    failed_sources: Set[str] = field(default_factory=set)  # a page range failed to parse or a chunk to upsert
+    stages: Dict[str, StageStats] = field(default_factory=dict)
+    wall_seconds: float = 0.0
+
+    def report(self) -> str:
+        lines = [f"⏱️ Pipeline finished in {self.wall_seconds:.2f}s wall time"]
+        for name, stats in self.stages.items():
+            lines.append(
+                f"   {name:<7} {stats.items:>6} items  {stats.seconds:7.2f}s busy  {stats.rate:8.1f} items/s"
+            )
+        return "\n".join(lines)
+
+
+class _Timed:
+    """Context manager adding elapsed time to a StageStats."""
+
+    def __init__(self, stats: StageStats):
+        self.stats = stats
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stats.seconds += time.perf_counter() - self._start
+        return False
+
+
+# ─────────────────────────────
+# 2. Producer: load → split → dedup → ids → clean
+# ─────────────────────────────
+def iter_clean_chunks(
+    pdf_files: Sequence[Path],
+    stages: Dict[str, StageStats],
+    parsed_sources: Set[str],
+    workers: Optional[int] = None,
+    seen_texts: Sequence[str] = (),
+    failed_sources: Optional[Set[str]] = None,
+) -> Iterator[Document]:
+    """
+    Yields cleaned, ID-tagged chunks one page at a time. Splitting is per
+    page, IDs follow loader.assign_chunk_ids and dedup keeps the MinHash
+    semantics of loader.deduplicate_chunks_minhash, including chunks
+    similar to seen_texts (already stored) being dropped.
+    """
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    dedup = MinHashLSHDeduplicator(threshold=SIMILARITY_THRESHOLD)
+    for text in seen_texts:
+        dedup.add_if_unique(text)
+    last_page_id, chunk_index = None, 0
+
+    pages = iter_pdf_documents(pdf_files, workers=workers, failed_sources=failed_sources)
+    while True:
+        with _Timed(stages["parse"]):
+            page = next(pages, None)
+        if page is None:
+            return
+        stages["parse"].items += 1
+        parsed_sources.add(page.metadata.get("source"))
+
+        with _Timed(stages["split"]):
+            chunks = splitter.split_documents([page])
+        stages["split"].items += len(chunks)
+
+        for chunk in chunks:
+            with _Timed(stages["dedup"]):
+                unique = dedup.add_if_unique(clean_text(chunk.page_content))
+            stages["dedup"].items += 1
+            if not unique:
+                continue
+
+            source = chunk.metadata.get("source", "unknown")
+            page_id = f"{source}:{chunk.metadata.get('page', 0)}"
+            chunk_index = chunk_index + 1 if page_id == last_page_id else 0
+            chunk.metadata["id"] = f"{page_id}:{chunk_index}"
+            last_page_id = page_id
+
+            with _Timed(stages["clean"]):
+                chunk.page_content = clean_text(chunk.page_content)
+            stages["clean"].items += 1
+            if not chunk.page_content:
+                logger.warning(f"Skipping empty chunk: {chunk.metadata['id']}")
+                continue
+            yield chunk
+
+
+def _windows(chunks: Iterator[Document], size: int) -> Iterator[List[Document]]:
+    window = []
+    for chunk in chunks:
+        window.append(chunk)
+        if len(window) >= size:
+            yield window
+            window = []
+    if window:
+        yield window
+
+
+def _run_in_thread(target, *args) -> threading.Thread:
+    thread = threading.Thread(target=target, args=args, daemon=True)
+    thread.start()
+    return thread
+
+
+# ─────────────────────────────
+# 3. Pipeline
+# ─────────────────────────────
+def run_ingest_pipeline(
+    pdf_files: Sequence[Path],
+    chroma,
+    window_size: int = PIPELINE_WINDOW,
+    workers: Optional[int] = None,
+    seen_texts: Sequence[str] = (),
+) -> PipelineResult:
+    """
+    Streams pdf_files into chroma, upserting each embedded window as it
+    completes. seen_texts are chunks already stored from other files, so
+    new near-duplicates of them are dropped as in a full ingest.
+    """
+    result = PipelineResult(stages={
+        name: StageStats() for name in ("parse", "split", "dedup", "clean", "embed", "upsert")
+    })
+    stages = result.stages
+    embeddings = get_embeddings()
+    batch_size = adaptive_batch_size()
+    window_size = window_size or batch_size
+    started = time.perf_counter()
+
+    # Producer thread fills a bounded queue of windows
+    windows: "queue.Queue" = queue.Queue(maxsize=PIPELINE_QUEUE_WINDOWS)
+    # Writer thread drains embedded windows into Chroma
+    writes: "queue.Queue" = queue.Queue(maxsize=PIPELINE_QUEUE_WINDOWS)
+    errors: List[BaseException] = []
+
+    def produce():
+        try:
+            chunks = iter_clean_chunks(
+                pdf_files, stages, result.parsed_sources, workers=workers,
+                seen_texts=seen_texts, failed_sources=result.failed_sources,
+            )
+            for window in _windows(chunks, window_size):
+                windows.put(window)
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            windows.put(_DONE)
+
+    def write():
+        while True:
+            item = writes.get()
+            if item is _DONE:
+                return
+            window, vectors = item
+            try:
+                with _Timed(stages["upsert"]):
+                    failed = set(upsert_with_retry(chroma._collection, window, vectors))
+                stages["upsert"].items += len(window) - len(failed)
+                for chunk in window:
+                    if chunk.metadata["id"] in failed:
+                        result.failed_sources.add(chunk.metadata["source"])
+                    else:
+                        result.ids_by_source.setdefault(chunk.metadata["source"], []).append(chunk.metadata["id"])
+            except BaseException as e:
+                errors.append(e)
+
+    producer = _run_in_thread(produce)
+    writer = _run_in_thread(write)
+    try:
+        while True:
+            window = windows.get()
+            if window is _DONE:
+                break
+            if errors:
+                continue  # keep draining so the producer can finish
+            try:
+                with _Timed(stages["embed"]):
+                    vectors = embeddings.embed_documents([c.page_content for c in window], batch_size=batch_size)
+            except Exception as e:
+                errors.append(e)
+                continue
+            stages["embed"].items += len(window)
+            writes.put((window, vectors))
+            logger.info(f"🔗 Embedded window of {len(window)} chunks ({stages['embed'].items} total)")
+    finally:
+        writes.put(_DONE)
+        producer.join()
+        writer.join()
+
+    result.wall_seconds = time.perf_counter() - started
+    if errors:
+        raise errors[0]
+    logger.info(result.report())
+    return result
+
+
+__all__ = ["PipelineResult", "StageStats", "iter_clean_chunks", "run_ingest_pipeline"]
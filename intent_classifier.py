@@ -0,0 +1,137 @@
+"""
+Local intent classifier for the router.
+
+Scores the BGE query embedding against per-intent centroids built from
+labelled example utterances. The router trusts it when its confidence clears
+ROUTER_CONFIDENCE_THRESHOLD and only falls back to the Groq LLM otherwise.
+"""
+
+import os
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from embeddings import get_embeddings
+
+# ─────────────────────────────
+# 1. Settings + labelled examples
+# ─────────────────────────────
+ROUTER_CONFIDENCE_THRESHOLD = float(os.getenv("ROUTER_CONFIDENCE_THRESHOLD", "0.6"))
+# Softmax temperature over cosine similarities; BGE similarities sit in a narrow band
+SOFTMAX_TEMPERATURE = 0.02
+
+LABELLED_EXAMPLES: Dict[str, List[str]] = {
+    "qna": [
+        "What is Empty Nest Syndrome?",
+        "Tell me about empty nest syndrome",
+        "What are the symptoms of empty nest syndrome?",
+        "What causes empty nest syndrome?",
+        "Is empty nest syndrome a medical diagnosis?",
+        "How long does empty nest syndrome last?",
+        "Who is most affected by empty nest syndrome?",
+        "Do fathers experience empty nest syndrome too?",
+        "What does research say about parents when children leave home?",
+        "Explain the stages of empty nest syndrome",
+        "Is empty nest syndrome more common in mothers?",
+        "What is the economic effect of children leaving home?",
+        "Define empty nest syndrome",
+        "How is empty nest syndrome different from depression?",
+    ],
+    "emotional": [
+        "I feel sad today",
+        "I'm lonely and depressed",
+        "I miss my children",
+        "The house feels so empty since my son left",
+        "I cry every time I walk past my daughter's room",
+        "I feel like I've lost my purpose",
+        "Nobody needs me anymore",
+        "I'm heartbroken that my kids moved away",
+        "I feel anxious about my children living on their own",
+        "I don't know who I am without my kids at home",
+        "I've been feeling really down lately",
+        "It hurts that my children rarely call",
+        "I feel so alone in this quiet house",
+        "I'm overwhelmed by how much I miss them",
+    ],
+    "suggestion": [
+        "Can you suggest activities?",
+        "Give me ways to feel better",
+        "What should I do now?",
+        "Suggest some hobbies I could start",
+        "How can I fill my free time?",
+        "Recommend ways to meet new people",
+        "What activities help with loneliness?",
+        "Give me tips to adjust to an empty house",
+        "Any ideas for reconnecting with my partner?",
+        "What are healthy ways to cope with this change?",
+        "What can I do to stay busy?",
+        "Suggest a daily routine for me",
+        "Help me plan my weekends now that the kids are gone",
+        "What are some good volunteering ideas?",
+    ],
+}
+
+
+# ─────────────────────────────
+# 2. Nearest-centroid classifier
+# ─────────────────────────────
+class CentroidIntentClassifier:
+    """Cosine similarity to normalised per-intent centroids, softmax for confidence."""
+
+    def __init__(self, examples: Dict[str, Sequence[str]] = None, temperature: float = SOFTMAX_TEMPERATURE):
+        self.examples = examples or LABELLED_EXAMPLES
+        self.temperature = temperature
+        self.labels: List[str] = list(self.examples)
+        self._centroids: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    @property
+    def centroids(self) -> np.ndarray:
+        """Built on first use; example vectors come from the embedding cache after the first run."""
+        if self._centroids is None:
+            with self._lock:
+                if self._centroids is None:
+                    self._centroids = self._build()
+        return self._centroids
+
+    def _build(self) -> np.ndarray:
+        embeddings = get_embeddings()
+        rows = []
+        for label in self.labels:
+            vectors = np.asarray(embeddings.embed_documents(list(self.examples[label])), dtype=np.float32)
+            centroid = vectors.mean(axis=0)
+            rows.append(centroid / np.linalg.norm(centroid))
+        return np.vstack(rows)
+
+    def scores(self, query_embedding: Sequence[float]) -> Dict[str, float]:
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        return dict(zip(self.labels, (self.centroids @ query).tolist()))
+
+    def classify(self, query_embedding: Sequence[float]) -> Tuple[str, float, Dict[str, float]]:
+        """Returns (intent, confidence, cosine scores)."""
+        scores = self.scores(query_embedding)
+        values = np.array([scores[label] for label in self.labels])
+        logits = (values - values.max()) / self.temperature
+        probs = np.exp(logits) / np.exp(logits).sum()
+        best = int(probs.argmax())
+        return self.labels[best], float(probs[best]), scores
+
+
+_classifier: Optional[CentroidIntentClassifier] = None
+
+
+def get_intent_classifier() -> CentroidIntentClassifier:
+    global _classifier
+    if _classifier is None:
+        _classifier = CentroidIntentClassifier()
+    return _classifier
+
+
+__all__ = [
+    "LABELLED_EXAMPLES",
+    "ROUTER_CONFIDENCE_THRESHOLD",
+    "CentroidIntentClassifier",
+    "get_intent_classifier",
+]
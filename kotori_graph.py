@@ -1,14 +1,31 @@
-from langgraph.graph import StateGraph, START, END
-from typing import TypedDict, Literal
+import os
+import time
+import inspect
+from functools import wraps
+from typing import TypedDict, Literal, List, Optional, Dict, Tuple
 from typing_extensions import Annotated
-from langgraph.graph import StateGraph, END, START
+# Only the constants at import time; StateGraph and langchain_core load when the graph is built
+from langgraph.constants import END, START
 
 # Import router + agents
-from router import router_node
-from qna_agent import qna_node as qna_agent_node
-from emotional_agent import emotional_checkin_node as emotional_agent_node
-from suggestion_agent import suggestion_node as suggestion_agent_node
-from welcome_agent import welcome_agent_node
+from router import router_node, arouter_node
+from qna_agent import qna_node as qna_agent_node, aqna_node as aqna_agent_node
+from emotional_agent import emotional_checkin_node as emotional_agent_node, aemotional_checkin_node as aemotional_agent_node
+from suggestion_agent import suggestion_node as suggestion_agent_node, asuggestion_node as asuggestion_agent_node
+from welcome_agent import welcome_agent_node, awelcome_agent_node
+from embeddings import get_embeddings
+from retrieval import prefetch_context, aprefetch_context
+from streaming import stream_turn, astream_turn
+from async_runtime import ASYNC_GRAPH, iter_async
+from semantic_cache import SEMANTIC_CACHE_ENABLED, response_cache
+
+# "speculative" runs corpus/memory retrieval in parallel with routing;
+# "sequential" routes first and lets the chosen agent search
+GRAPH_MODE = os.getenv("KOTORI_GRAPH_MODE", "speculative").lower()
+
+def merge_timings(left: Optional[Dict], right: Optional[Dict]) -> Dict:
+    """Reducer so parallel nodes can each record their own timing."""
+    return {**(left or {}), **(right or {})}
 
 # ─────────────────────────────
 # 1. Define State Schema
@@ -18,10 +35,64 @@ class KotoriState(TypedDict):
     response: str
     agent: str
     intent: str  # ✅ Added for compatibility with router_node
+    query_embedding: Optional[List[float]]  # Computed once per turn by embed_query_node
+    prefetched: Optional[dict]  # Speculative corpus/memory results, see retrieval.py
+    timings: Annotated[Dict[str, Tuple[float, float]], merge_timings]  # node -> (start, end)
+    cache_hit: Optional[dict]  # Set when the response came from the semantic cache
+    cacheable: bool  # Set by agents when the response is a full LLM answer
+
+# ─────────────────────────────
+# 1b. Per-node timing
+# ─────────────────────────────
+def timed(name: str):
+    """Records the node's start/end (perf_counter) under state["timings"][name]."""
+    def decorator(node):
+        if inspect.iscoroutinefunction(node):
+            @wraps(node)
+            async def async_wrapper(state):
+                start = time.perf_counter()
+                update = dict(await node(state))
+                update["timings"] = {name: (start, time.perf_counter())}
+                return update
+            return async_wrapper
+
+        @wraps(node)
+        def wrapper(state):
+            start = time.perf_counter()
+            update = dict(node(state))
+            update["timings"] = {name: (start, time.perf_counter())}
+            return update
+        return wrapper
+    return decorator
+
+def graph_node(name: str, func, afunc):
+    """A timed node with both a sync and an async body, so one compiled graph serves invoke and ainvoke."""
+    from langchain_core.runnables import RunnableLambda
+    return RunnableLambda(timed(name)(func), afunc=timed(name)(afunc), name=name)
+
+def timing_report(state: dict) -> str:
+    """Timeline of the turn's nodes in ms from the first node start; overlapping bars ran in parallel."""
+    timings = state.get("timings") or {}
+    if not timings:
+        return "⏱️ No node timings recorded"
+    origin = min(start for start, _ in timings.values())
+    lines = ["⏱️ Node timings (ms from turn start)"]
+    for name, (start, end) in sorted(timings.items(), key=lambda item: item[1][0]):
+        lines.append(f"   {name:<12} {(start - origin) * 1000:8.1f} → {(end - origin) * 1000:8.1f}  ({(end - start) * 1000:7.1f} ms)")
+    return "\n".join(lines)
 
 # ─────────────────────────────
 # 2. Agent Nodes (Fixed to properly handle state)
 # ─────────────────────────────
+def embed_query_node(state: KotoriState) -> dict:
+    """Embeds the user input once; agents and memory reuse the vector."""
+    try:
+        return {"query_embedding": get_embeddings().embed_query(state["input"])}
+    except Exception as e:
+        print(f"⚠️ Query embedding error: {e}")
+        # Agents embed on demand when the vector is missing
+        return {"query_embedding": None}
+
 def qna_node(state: KotoriState) -> KotoriState:
     try:
         result = qna_agent_node(state)
@@ -53,6 +124,8 @@ def suggestion_node(state: KotoriState) -> KotoriState:
         return state
 
 def welcome_node(state: KotoriState) -> KotoriState:
+    # Greetings need no retrieval, so any speculative results are dropped
+    state["prefetched"] = None
     try:
         result = welcome_agent_node(state["input"])
         state["response"] = result
@@ -64,6 +137,50 @@ def welcome_node(state: KotoriState) -> KotoriState:
         state["agent"] = "welcome"
         return state
 
+# ─────────────────────────────
+# 2b. Async Agent Nodes (used by graph.ainvoke / astream)
+# ─────────────────────────────
+async def aembed_query_node(state: KotoriState) -> dict:
+    try:
+        return {"query_embedding": await get_embeddings().aembed_query(state["input"])}
+    except Exception as e:
+        print(f"⚠️ Query embedding error: {e}")
+        return {"query_embedding": None}
+
+async def aqna_node(state: KotoriState) -> KotoriState:
+    try:
+        return await aqna_agent_node(state)
+    except Exception as e:
+        print(f"❌ Error in QnA node: {e}")
+        state["response"] = f"Sorry, I encountered an error while processing your question: {str(e)}"
+        state["agent"] = "qna"
+        return state
+
+async def aemotional_node(state: KotoriState) -> KotoriState:
+    try:
+        return await aemotional_agent_node(state)
+    except Exception as e:
+        print(f"❌ Error in emotional node: {e}")
+        state["response"] = f"I understand you're reaching out for emotional support. I'm here to help, but I encountered a technical issue: {str(e)}"
+        state["agent"] = "emotional"
+        return state
+
+async def asuggestion_node(state: KotoriState) -> KotoriState:
+    try:
+        return await asuggestion_agent_node(state)
+    except Exception as e:
+        print(f"❌ Error in suggestion node: {e}")
+        state["response"] = f"I'd love to provide some suggestions, but I encountered an error: {str(e)}"
+        state["agent"] = "suggestion"
+        return state
+
+async def awelcome_node(state: KotoriState) -> KotoriState:
+    # awelcome_agent_node never raises; it returns the fallback greeting instead
+    state["prefetched"] = None
+    state["response"] = await awelcome_agent_node(state["input"])
+    state["agent"] = "welcome"
+    return state
+
 # ─────────────────────────────
 # 3. Router function (FIXED)
 # ─────────────────────────────
@@ -71,7 +188,7 @@ def route_user_input(state: KotoriState) -> Literal["qna", "emotional", "suggest
     """Uses router_node to classify intent"""
     try:
         # Extract just the input string and pass to router
-        intent = router_node(state["input"])
+        intent = router_node(state["input"], state.get("query_embedding"))
         
         # Update state with the determined intent
         state["intent"] = intent
@@ -84,38 +201,145 @@ def route_user_input(state: KotoriState) -> Literal["qna", "emotional", "suggest
         state["intent"] = "qna"
         return "qna"
 
+async def aroute_user_input(state: KotoriState) -> str:
+    try:
+        intent = await arouter_node(state["input"], state.get("query_embedding"))
+        print(f"🔀 Routing to: {intent}")
+        return intent
+    except Exception as e:
+        print(f"❌ Router error: {e}")
+        return "qna"
+
+def route_node(state: KotoriState) -> dict:
+    """Speculative mode: routing as a node, so it can run next to prefetch_node."""
+    return {"intent": route_user_input(state)}
+
+async def aroute_node(state: KotoriState) -> dict:
+    return {"intent": await aroute_user_input(state)}
+
+def prefetch_node(state: KotoriState) -> dict:
+    """Speculative mode: corpus + memory search before the route is known."""
+    return {"prefetched": prefetch_context(state["input"], state.get("query_embedding"))}
+
+async def aprefetch_node(state: KotoriState) -> dict:
+    return {"prefetched": await aprefetch_context(state["input"], state.get("query_embedding"))}
+
+def dispatch_intent(state: KotoriState) -> str:
+    return state.get("intent") or "qna"
+
+# ─────────────────────────────
+# 3b. Semantic response cache (see semantic_cache.py)
+# ─────────────────────────────
+def cache_lookup_node(state: KotoriState) -> dict:
+    """Answers near-duplicate questions from the cache, skipping routing and the agent."""
+    if not SEMANTIC_CACHE_ENABLED:
+        return {"cache_hit": None}
+    hit = response_cache.lookup(state.get("query_embedding"))
+    if not hit:
+        return {"cache_hit": None}
+    print(f"🗃️ Semantic cache hit ({hit['agent']}, similarity {hit['similarity']:.3f}) for: {hit['query']}")
+    return {
+        "cache_hit": {"query": hit["query"], "similarity": hit["similarity"]},
+        "response": hit["response"],
+        "agent": hit["agent"],
+        "intent": hit["agent"],
+    }
+
+async def acache_lookup_node(state: KotoriState) -> dict:
+    # In-memory lookup; nothing to await
+    return cache_lookup_node(state)
+
+def cache_store_node(state: KotoriState) -> dict:
+    if SEMANTIC_CACHE_ENABLED and state.get("cacheable") and not state.get("cache_hit"):
+        response_cache.store(state["input"], state.get("query_embedding"), state.get("agent", ""), state.get("response", ""))
+    return {}
+
+async def acache_store_node(state: KotoriState) -> dict:
+    return cache_store_node(state)
+
+def after_cache_lookup(state: KotoriState):
+    """Speculative mode: stop on a hit, otherwise route and prefetch in parallel."""
+    return END if state.get("cache_hit") else ["route", "prefetch"]
+
+def route_after_cache_lookup(state: KotoriState) -> str:
+    """Sequential mode: stop on a hit, otherwise route."""
+    return END if state.get("cache_hit") else route_user_input(state)
+
+async def aroute_after_cache_lookup(state: KotoriState) -> str:
+    return END if state.get("cache_hit") else await aroute_user_input(state)
+
 # ─────────────────────────────
 # 4. Build LangGraph (IMPROVED)
 # ─────────────────────────────
-def build_kotori_graph():
+AGENT_ROUTES = {
+    "qna": "qna",
+    "emotional": "emotional",
+    "suggestion": "suggestion",
+    "welcome": "welcome"
+}
+
+def build_kotori_graph(mode: str = GRAPH_MODE):
+    from langchain_core.runnables import RunnableLambda
+    from langgraph.graph import StateGraph
+
     workflow = StateGraph(KotoriState)
 
-    # Add nodes
-    workflow.add_node("qna", qna_node)
-    workflow.add_node("emotional", emotional_node)
-    workflow.add_node("suggestion", suggestion_node)
-    workflow.add_node("welcome", welcome_node)
-
-    # Add conditional routing from START
-    workflow.add_conditional_edges(
-        START,
-        route_user_input,
-        {
-            "qna": "qna",
-            "emotional": "emotional",
-            "suggestion": "suggestion",
-            "welcome": "welcome"
-        }
-    )
-
-    # All nodes end at END
-    workflow.add_edge("qna", END)
-    workflow.add_edge("emotional", END)
-    workflow.add_edge("suggestion", END)
-    workflow.add_edge("welcome", END)
+    # Add nodes (each has a sync and an async body)
+    workflow.add_node("embed_query", graph_node("embed_query", embed_query_node, aembed_query_node))
+    workflow.add_node("qna", graph_node("qna", qna_node, aqna_node))
+    workflow.add_node("emotional", graph_node("emotional", emotional_node, aemotional_node))
+    workflow.add_node("suggestion", graph_node("suggestion", suggestion_node, asuggestion_node))
+    workflow.add_node("welcome", graph_node("welcome", welcome_node, awelcome_node))
+    workflow.add_node("cache_lookup", graph_node("cache_lookup", cache_lookup_node, acache_lookup_node))
+    workflow.add_node("cache_store", graph_node("cache_store", cache_store_node, acache_store_node))
+
+    # Embed the input once, then check the semantic cache before routing
+    workflow.add_edge(START, "embed_query")
+    workflow.add_edge("embed_query", "cache_lookup")
+    if mode == "speculative":
+        # On a miss, route and retrieve in the same step; the dispatch
+        # node waits for both before handing over to the agent
+        workflow.add_node("route", graph_node("route", route_node, aroute_node))
+        workflow.add_node("prefetch", graph_node("prefetch", prefetch_node, aprefetch_node))
+        workflow.add_node("dispatch", lambda state: {})
+        workflow.add_conditional_edges("cache_lookup", after_cache_lookup, ["route", "prefetch", END])
+        workflow.add_edge(["route", "prefetch"], "dispatch")
+        workflow.add_conditional_edges("dispatch", dispatch_intent, AGENT_ROUTES)
+    else:
+        workflow.add_conditional_edges(
+            "cache_lookup",
+            RunnableLambda(route_after_cache_lookup, afunc=aroute_after_cache_lookup),
+            {**AGENT_ROUTES, END: END},
+        )
+
+    # All agents store their answer (if cacheable) and end
+    workflow.add_edge("qna", "cache_store")
+    workflow.add_edge("emotional", "cache_store")
+    workflow.add_edge("suggestion", "cache_store")
+    workflow.add_edge("welcome", "cache_store")
+    workflow.add_edge("cache_store", END)
 
     return workflow.compile()
 
+# ─────────────────────────────
+# 4b. Entry points
+# ─────────────────────────────
+def initial_state(user_input: str) -> dict:
+    return {"input": user_input, "response": "", "agent": "", "intent": "", "query_embedding": None, "prefetched": None, "timings": {}, "cache_hit": None, "cacheable": False}
+
+async def arun_turn(graph, user_input: str) -> dict:
+    """Runs one turn with graph.ainvoke; many turns can share one event loop."""
+    return await graph.ainvoke(initial_state(user_input))
+
+def turn_events(graph, state: dict):
+    """
+    Streams a turn for synchronous callers (Streamlit, CLI). With KOTORI_ASYNC
+    the graph runs on the shared event loop, otherwise on the caller's thread.
+    """
+    if ASYNC_GRAPH:
+        return iter_async(astream_turn(graph, state))
+    return stream_turn(graph, state)
+
 # ─────────────────────────────
 # 5. Test function for debugging
 # ─────────────────────────────
@@ -133,10 +357,11 @@ def test_graph():
         for query in test_queries:
             print(f"\n🧪 Testing: '{query}'")
             try:
-                state = {"input": query, "response": "", "agent": "", "intent": ""}
+                state = initial_state(query)
                 result = graph.invoke(state)
                 print(f"✅ Response: {result['response'][:100]}...")
                 print(f"📍 Agent used: {result['agent']}")
+                print(timing_report(result))
             except Exception as e:
                 print(f"❌ Test failed: {e}")
                 
@@ -161,8 +386,15 @@ if __name__ == "__main__":
             break
 
         try:
-            state = {"input": user_input, "response": "", "agent": "", "intent": ""}
-            final_state = graph.invoke(state)
-            print(f"\nKotori: {final_state['response']}\n")
+            state = initial_state(user_input)
+            # Tokens print as they stream; the final (format-checked) response follows
+            print("\nKotori (streaming): ", end="", flush=True)
+            for event in turn_events(graph, state):
+                if event["type"] == "token":
+                    print(event["text"], end="", flush=True)
+                else:
+                    final_state = event["state"]
+            print(f"\n\nKotori: {final_state['response']}\n")
+            print(timing_report(final_state))
         except Exception as e:
             print(f"❌ Error: {e}")
\ No newline at end of file
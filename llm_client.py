@@ -0,0 +1,234 @@
+"""
+Shared Groq chat model for every agent and the router.
+
+Each module used to build its own ChatGroq, and so its own Groq SDK client
+and HTTP connection pool, paying a TCP + TLS handshake per pool. All agents
+now share one ChatGroq backed by one keep-alive httpx client (and one async
+client for the async graph path). Per-agent settings such as temperature and
+max_tokens are bound per call with `get_llm(...)`. An httpcore trace hook
+counts requests against newly opened connections, so connection reuse can
+be checked from `connection_report()`.
+"""
+
+import os
+import threading
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional
+
+from dotenv import load_dotenv
+
+if TYPE_CHECKING:
+    import httpx  # imported on first client build; its CLI extras pull in rich and click
+
+# ─────────────────────────────
+# 1. Settings
+# ─────────────────────────────
+load_dotenv()
+GROQ_MODEL_NAME = os.getenv("GROQ_MODEL_NAME", "llama-3.3-70b-versatile")
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "20"))
+GROQ_KEEPALIVE_SECONDS = float(os.getenv("GROQ_KEEPALIVE_SECONDS", "120"))
+GROQ_TIMEOUT_SECONDS = float(os.getenv("GROQ_TIMEOUT_SECONDS", "60"))
+
+
+# ─────────────────────────────
+# 2. Connection reuse stats
+# ─────────────────────────────
+@dataclass
+class ConnectionStats:
+    requests: int = 0
+    connections_opened: int = 0
+    tls_handshakes: int = 0
+
+    @property
+    def reused(self) -> int:
+        return max(self.requests - self.connections_opened, 0)
+
+    @property
+    def reuse_ratio(self) -> float:
+        return self.reused / self.requests if self.requests else 0.0
+
+    def snapshot(self) -> "ConnectionStats":
+        return ConnectionStats(self.requests, self.connections_opened, self.tls_handshakes)
+
+    def since(self, earlier: "ConnectionStats") -> "ConnectionStats":
+        return ConnectionStats(
+            self.requests - earlier.requests,
+            self.connections_opened - earlier.connections_opened,
+            self.tls_handshakes - earlier.tls_handshakes,
+        )
+
+
+connection_stats = ConnectionStats()
+_stats_lock = threading.Lock()
+
+
+def _record(event_name: str) -> None:
+    with _stats_lock:
+        if event_name == "connection.connect_tcp.complete":
+            connection_stats.connections_opened += 1
+        elif event_name == "connection.start_tls.complete":
+            connection_stats.tls_handshakes += 1
+
+
+def _trace(event_name, info):
+    _record(event_name)
+
+
+async def _atrace(event_name, info):
+    _record(event_name)
+
+
+def _on_request(request: "httpx.Request") -> None:
+    with _stats_lock:
+        connection_stats.requests += 1
+    request.extensions["trace"] = _trace
+
+
+async def _aon_request(request: "httpx.Request") -> None:
+    with _stats_lock:
+        connection_stats.requests += 1
+    request.extensions["trace"] = _atrace
+
+
+# ─────────────────────────────
+# 3. Pooled clients + shared model
+# ─────────────────────────────
+def _limits() -> "httpx.Limits":
+    import httpx
+    return httpx.Limits(
+        max_connections=GROQ_MAX_CONNECTIONS,
+        max_keepalive_connections=GROQ_MAX_CONNECTIONS,
+        keepalive_expiry=GROQ_KEEPALIVE_SECONDS,
+    )
+
+
+_lock = threading.RLock()  # get_chat_model builds the clients while holding it
+_http_client: Optional["httpx.Client"] = None
+_http_async_client: Optional["httpx.AsyncClient"] = None
+_chat_model = None
+
+
+def get_http_client() -> "httpx.Client":
+    global _http_client
+    if _http_client is None:
+        with _lock:
+            if _http_client is None:
+                import httpx
+                _http_client = httpx.Client(
+                    limits=_limits(), timeout=GROQ_TIMEOUT_SECONDS, event_hooks={"request": [_on_request]}
+                )
+    return _http_client
+
+
+def get_async_http_client() -> "httpx.AsyncClient":
+    """Async pool; use it from async_runtime's shared loop so connections stay on one loop."""
+    global _http_async_client
+    if _http_async_client is None:
+        with _lock:
+            if _http_async_client is None:
+                import httpx
+                _http_async_client = httpx.AsyncClient(
+                    limits=_limits(), timeout=GROQ_TIMEOUT_SECONDS, event_hooks={"request": [_aon_request]}
+                )
+    return _http_async_client
+
+
+def get_chat_model():
+    """The process-wide ChatGroq, or None when GROQ_API_KEY is not set."""
+    global _chat_model
+    if _chat_model is None:
+        api_key = os.getenv("GROQ_API_KEY")
+        if not api_key:
+            return None
+        with _lock:
+            if _chat_model is None:
+                from langchain_groq import ChatGroq
+                _chat_model = ChatGroq(
+                    groq_api_key=api_key,
+                    model_name=GROQ_MODEL_NAME,
+                    request_timeout=GROQ_TIMEOUT_SECONDS,
+                    http_client=get_http_client(),
+                    http_async_client=get_async_http_client(),
+                )
+    return _chat_model
+
+
+def get_llm(temperature: float, max_tokens: int):
+    """The shared model with per-agent options bound at call level."""
+    model = get_chat_model()
+    if model is None:
+        raise EnvironmentError("❌ GROQ_API_KEY is missing.")
+    return model.bind(temperature=temperature, max_tokens=max_tokens)
+
+
+class LazyChain:
+    """
+    `PromptTemplate | get_llm(...)`, assembled on first use. Agents create
+    theirs at import time; langchain_core.prompts and langchain_groq (which
+    pulls in transformers) are imported only when a chain first runs.
+    Without a template it is just the bound model.
+    """
+
+    def __init__(self, template: Optional[str], temperature: float, max_tokens: int):
+        self.template = template
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self._runnable = None
+
+    def get(self):
+        if self._runnable is None:
+            with _lock:
+                if self._runnable is None:
+                    runnable = get_llm(self.temperature, self.max_tokens)
+                    if self.template is not None:
+                        from langchain_core.prompts import PromptTemplate
+                        runnable = PromptTemplate.from_template(self.template) | runnable
+                    self._runnable = runnable
+        return self._runnable
+
+    def invoke(self, inputs, *args, **kwargs):
+        return self.get().invoke(inputs, *args, **kwargs)
+
+    async def ainvoke(self, inputs, *args, **kwargs):
+        return await self.get().ainvoke(inputs, *args, **kwargs)
+
+    def stream(self, inputs, *args, **kwargs):
+        return self.get().stream(inputs, *args, **kwargs)
+
+    def astream(self, inputs, *args, **kwargs):
+        return self.get().astream(inputs, *args, **kwargs)
+
+
+def lazy_chain(template: Optional[str] = None, *, temperature: float, max_tokens: int) -> LazyChain:
+    return LazyChain(template, temperature, max_tokens)
+
+
+def connection_report() -> dict:
+    stats = connection_stats.snapshot()
+    return {
+        "llm_requests": stats.requests,
+        "connections_opened": stats.connections_opened,
+        "tls_handshakes": stats.tls_handshakes,
+        "reused_connections": stats.reused,
+        "reuse_ratio": round(stats.reuse_ratio, 3),
+    }
+
+
+__all__ = [
+    "GROQ_MODEL_NAME",
+    "ConnectionStats",
+    "LazyChain",
+    "connection_stats",
+    "connection_report",
+    "get_chat_model",
+    "get_llm",
+    "lazy_chain",
+]
+
+if __name__ == "__main__":
+    # Three calls through the shared model: expect one new connection, then reuse
+    llm = get_llm(temperature=0.1, max_tokens=5)
+    for _ in range(3):
+        llm.invoke("Reply with OK")
+    for key, value in connection_report().items():
+        print(f"{key}: {value}")
@@ -0,0 +1,361 @@
+"""
+Latency budgets, hedged requests and a circuit breaker around Groq calls.
+
+Every agent and router LLM call goes through `guarded_stream` /
+`aguarded_stream`:
+
+* Budget: each agent has a total latency budget (LLM_BUDGET_<AGENT>). When
+  it runs out the call raises LLMTimeoutError, and the agent answers with its
+  existing keyword fallback instead of waiting for the client's own timeout.
+* Hedging (LLM_HEDGING=true): if no token has arrived after the agent's
+  observed p95 time-to-first-token, a duplicate request is started. The
+  first one to produce a token wins and the other is ignored (and cancelled
+  on the async path).
+* Circuit breaker: after LLM_BREAKER_FAILURES consecutive failures or
+  timeouts the breaker opens. For LLM_BREAKER_COOLDOWN_SECONDS every call
+  fails fast with CircuitOpenError, sending agents straight to their
+  fallbacks. After that one probe call is let through (half-open).
+
+`guard_report()` exposes breaker state and per-agent latency/hedge metrics.
+"""
+
+import os
+import time
+import queue
+import asyncio
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, Optional
+
+# ─────────────────────────────
+# 1. Settings
+# ─────────────────────────────
+_DEFAULT_BUDGETS = {"qna": 12.0, "emotional": 12.0, "suggestion": 12.0, "welcome": 6.0, "router": 3.0}
+LLM_BUDGETS: Dict[str, float] = {
+    agent: float(os.getenv(f"LLM_BUDGET_{agent.upper()}", default)) for agent, default in _DEFAULT_BUDGETS.items()
+}
+LLM_DEFAULT_BUDGET = float(os.getenv("LLM_BUDGET_DEFAULT", "12"))
+
+LLM_HEDGING = os.getenv("LLM_HEDGING", "false").lower() == "true"
+LLM_HEDGE_AFTER_SECONDS = float(os.getenv("LLM_HEDGE_AFTER_SECONDS", "2.0"))  # until enough samples for a p95
+HEDGE_MIN_SAMPLES = 20
+
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+
+
+class LLMTimeoutError(TimeoutError):
+    """The call did not finish within its agent's latency budget."""
+
+
+class CircuitOpenError(RuntimeError):
+    """The breaker is open; the call was not attempted."""
+
+
+# ─────────────────────────────
+# 2. Circuit breaker
+# ─────────────────────────────
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed → open (cool-down) → half-open (one probe) → closed."""
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES, cooldown: float = LLM_BREAKER_COOLDOWN_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.short_circuits = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = "half_open"
+            if self.state == "open" or (self.state == "half_open" and self._probe_in_flight):
+                self.short_circuits += 1
+                raise CircuitOpenError("LLM circuit breaker is open")
+            if self.state == "half_open":
+                self._probe_in_flight = True
+
+    def release_probe(self) -> None:
+        """Frees a half-open probe that ended without a verdict (cancelled, or failed outside the LLM call)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != "closed":
+                print("🟢 LLM circuit breaker closed")
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.times_opened += 1
+                    print(f"🔴 LLM circuit breaker open for {self.cooldown:.0f}s "
+                          f"after {self.consecutive_failures} consecutive failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def report(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "short_circuits": self.short_circuits,
+        }
+
+
+breaker = CircuitBreaker()
+
+
+# ─────────────────────────────
+# 3. Per-agent metrics
+# ─────────────────────────────
+def _percentile(values, pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+@dataclass
+class AgentStats:
+    calls: int = 0
+    successes: int = 0
+    failures: int = 0
+    timeouts: int = 0
+    hedges: int = 0
+    hedge_wins: int = 0
+    ttft: Deque[float] = field(default_factory=lambda: deque(maxlen=200))
+    latency: Deque[float] = field(default_factory=lambda: deque(maxlen=200))
+
+    def hedge_delay(self) -> float:
+        """p95 time-to-first-token once there are enough samples, else the configured default."""
+        if len(self.ttft) >= HEDGE_MIN_SAMPLES:
+            return _percentile(self.ttft, 95)
+        return LLM_HEDGE_AFTER_SECONDS
+
+    def report(self) -> dict:
+        def ms(value):
+            return round(value * 1000) if value is not None else None
+        return {
+            "calls": self.calls,
+            "successes": self.successes,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "ttft_p50_ms": ms(_percentile(self.ttft, 50)),
+            "ttft_p95_ms": ms(_percentile(self.ttft, 95)),
+            "latency_p50_ms": ms(_percentile(self.latency, 50)),
+            "latency_p95_ms": ms(_percentile(self.latency, 95)),
+        }
+
+
+_stats: Dict[str, AgentStats] = {}
+_stats_lock = threading.Lock()
+
+
+def _agent_stats(agent: str) -> AgentStats:
+    with _stats_lock:
+        return _stats.setdefault(agent, AgentStats())
+
+
+def guard_report() -> dict:
+    return {"breaker": breaker.report(), "agents": {agent: s.report() for agent, s in _stats.items()}}
+
+
+# ─────────────────────────────
+# 4. Race bookkeeping shared by the sync and async paths
+# ─────────────────────────────
+class _Race:
+    """
+    Tracks one guarded call: up to two attempts, the deadline, when to hedge
+    and which attempt won. Events are (attempt, kind, payload) with kind in
+    chunk / done / error.
+    """
+
+    def __init__(self, agent: str, on_chunk: Callable):
+        self.agent = agent
+        self.stats = _agent_stats(agent)
+        self.on_chunk = on_chunk
+        self.started = time.perf_counter()
+        self.deadline = self.started + LLM_BUDGETS.get(agent, LLM_DEFAULT_BUDGET)
+        self.hedge_at = self.started + self.stats.hedge_delay() if LLM_HEDGING else None
+        self.attempts = 1
+        self.live = {0}
+        self.winner: Optional[int] = None
+        self.settled = False  # the breaker has been told how the call went
+        self.stats.calls += 1
+
+    def wait_timeout(self) -> float:
+        until = self.deadline
+        if self.hedge_at is not None and self.winner is None:
+            until = min(until, self.hedge_at)
+        return until - time.perf_counter()
+
+    def on_wait_expired(self) -> bool:
+        """Returns True when a hedge attempt should start; raises once the budget is spent."""
+        if time.perf_counter() >= self.deadline:
+            self.stats.timeouts += 1
+            self._fail()
+            raise LLMTimeoutError(f"{self.agent} LLM call exceeded its "
+                                  f"{LLM_BUDGETS.get(self.agent, LLM_DEFAULT_BUDGET):.1f}s budget")
+        self.hedge_at = None
+        self.attempts += 1
+        self.live.add(1)
+        self.stats.hedges += 1
+        print(f"🪞 {self.agent}: no token after {(time.perf_counter() - self.started) * 1000:.0f} ms, hedging")
+        return True
+
+    def on_event(self, attempt: int, kind: str, payload) -> bool:
+        """Returns True when the call is complete."""
+        if self.winner is not None and attempt != self.winner:
+            return False  # the losing attempt's output is ignored
+        if kind == "chunk":
+            if self.winner is None:
+                self.winner = attempt
+                self.stats.ttft.append(time.perf_counter() - self.started)
+                if attempt == 1:
+                    self.stats.hedge_wins += 1
+            self.on_chunk(payload)
+            return False
+        if kind == "done":
+            self.winner = attempt if self.winner is None else self.winner
+            self.stats.successes += 1
+            self.stats.latency.append(time.perf_counter() - self.started)
+            self.settled = True
+            breaker.record_success()
+            return True
+        # error
+        self.live.discard(attempt)
+        if self.winner is None and self.live:
+            return False  # the other attempt may still succeed
+        self._fail()
+        raise payload
+
+    def _fail(self) -> None:
+        self.settled = True
+        self.stats.failures += 1
+        breaker.record_failure()
+
+    def close(self) -> None:
+        """Called however the call ends, so a cancelled probe cannot hold the breaker half-open."""
+        if not self.settled:
+            breaker.release_probe()
+
+
+# ─────────────────────────────
+# 5. Guarded calls
+# ─────────────────────────────
+def guarded_stream(chain, inputs, agent: str, on_chunk: Callable) -> None:
+    """
+    Streams chain(inputs) into on_chunk under the agent's budget, hedging and
+    the circuit breaker. Attempts run on daemon threads; one abandoned after a
+    timeout finishes in the background, bounded by the HTTP client timeout.
+    """
+    breaker.before_call()
+    race = _Race(agent, on_chunk)
+    events: "queue.Queue" = queue.Queue()
+
+    def attempt(n: int):
+        try:
+            for chunk in chain.stream(inputs):
+                events.put((n, "chunk", chunk))
+            events.put((n, "done", None))
+        except BaseException as e:
+            events.put((n, "error", e))
+
+    threading.Thread(target=attempt, args=(0,), daemon=True).start()
+    try:
+        while True:
+            timeout = race.wait_timeout()
+            if timeout <= 0:
+                if race.on_wait_expired():
+                    threading.Thread(target=attempt, args=(1,), daemon=True).start()
+                continue
+            try:
+                event = events.get(timeout=timeout)
+            except queue.Empty:
+                continue
+            if race.on_event(*event):
+                return
+    finally:
+        race.close()
+
+
+async def aguarded_stream(chain, inputs, agent: str, on_chunk: Callable) -> None:
+    """Async guarded_stream; losing or timed-out attempts are cancelled."""
+    breaker.before_call()
+    race = _Race(agent, on_chunk)
+    events: "asyncio.Queue" = asyncio.Queue()
+
+    async def attempt(n: int):
+        try:
+            async for chunk in chain.astream(inputs):
+                await events.put((n, "chunk", chunk))
+            await events.put((n, "done", None))
+        except asyncio.CancelledError:
+            raise
+        except BaseException as e:
+            await events.put((n, "error", e))
+
+    tasks = [asyncio.ensure_future(attempt(0))]
+    try:
+        while True:
+            timeout = race.wait_timeout()
+            if timeout <= 0:
+                if race.on_wait_expired():
+                    tasks.append(asyncio.ensure_future(attempt(1)))
+                continue
+            try:
+                event = await asyncio.wait_for(events.get(), timeout)
+            except asyncio.TimeoutError:
+                continue
+            if race.on_event(*event):
+                return
+    finally:
+        for task in tasks:
+            task.cancel()
+        race.close()
+
+
+def _text(chunk) -> str:
+    return chunk.content if hasattr(chunk, "content") else str(chunk)
+
+
+def guarded_invoke(llm, prompt, agent: str) -> str:
+    """Non-UI call (e.g. routing): streamed under the guard and returned as one string."""
+    parts = []
+    guarded_stream(llm, prompt, agent, lambda chunk: parts.append(_text(chunk)))
+    return "".join(parts)
+
+
+async def aguarded_invoke(llm, prompt, agent: str) -> str:
+    parts = []
+    await aguarded_stream(llm, prompt, agent, lambda chunk: parts.append(_text(chunk)))
+    return "".join(parts)
+
+
+__all__ = [
+    "LLM_BUDGETS",
+    "LLM_HEDGING",
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "LLMTimeoutError",
+    "aguarded_invoke",
+    "aguarded_stream",
+    "breaker",
+    "guard_report",
+    "guarded_invoke",
+    "guarded_stream",
+]
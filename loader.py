@@ -1,15 +1,19 @@
 import os
+import time
 import logging
 from pathlib import Path
-from typing import List
+from typing import List, Optional, Sequence, Set
 from difflib import SequenceMatcher
 from tqdm import tqdm
 from dotenv import load_dotenv
-from langchain_community.document_loaders import PyPDFDirectoryLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import Chroma
-from langchain.schema.document import Document
-from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_core.documents import Document
+from minhash_dedup import MinHashLSHDeduplicator
+from parallel_pdf import iter_pdf_documents
+from ingest_manifest import IngestManifest, IngestPlan
+from retrieval_cache import bump_generation
+
+# langchain_community, the text splitter and the embedding stack are imported
+# inside the functions that use them, so a no-op incremental run never pays for them.
 
 # Console-only logging
 logging.basicConfig(
@@ -23,6 +27,11 @@ logger = logging.getLogger(__name__)
 CHUNK_SIZE = 800
 CHUNK_OVERLAP = 200
 SIMILARITY_THRESHOLD = 0.95
+DEDUP_METHOD = os.getenv("DEDUP_METHOD", "minhash")  # minhash | exhaustive
+PARALLEL_LOAD = os.getenv("LOADER_PARALLEL", "true").lower() == "true"
+STREAMING_INGEST = os.getenv("LOADER_STREAMING", "true").lower() == "true"
+WRITE_ATTEMPTS = int(os.getenv("CHROMA_WRITE_ATTEMPTS", "3"))
+WRITE_BACKOFF_SECONDS = 0.5
 
 # Paths - use relative paths for deployment compatibility
 DATA_DIR = os.getenv("DATA_DIR_PATH", str(Path(__file__).parent / "data"))
@@ -42,28 +51,54 @@ def load_environment() -> bool:
         logger.warning("⚠️ HUGGINGFACE_API_TOKEN not found in .env")
         return False
 
-# Embedding function
-def get_embeddings() -> HuggingFaceEmbeddings:
-    return HuggingFaceEmbeddings(
-        model_name="BAAI/bge-base-en-v1.5",
-        model_kwargs={"device": "cpu"},
-        encode_kwargs={"normalize_embeddings": True}
-    )
+# Embedding function (shared with the agents, loaded once per process)
+def get_embeddings() -> "SharedEmbeddings":
+    from embeddings import get_embeddings as get_shared_embeddings
+    return get_shared_embeddings()
 
 # Load PDFs
-def load_pdfs() -> List[Document]:
+def load_pdfs(
+    parallel: bool = PARALLEL_LOAD,
+    workers: Optional[int] = None,
+    pdf_files: Optional[List[Path]] = None,
+    failed_sources: Optional[Set[str]] = None,
+) -> List[Document]:
+    """
+    Loads every PDF in DATA_DIR (or only pdf_files) as page Documents. The
+    parallel mode parses files (and page ranges of large files) in a process
+    pool; LOADER_WORKERS sets the pool size. Files that fail to parse, fully
+    or partly, are added to failed_sources.
+    """
     try:
-        logger.info(f"🔍 Looking for PDFs in: {DATA_DIR}")
-        # Check what files are in the directory
-        pdf_files = list(Path(DATA_DIR).glob("*.pdf"))
+        if pdf_files is None:
+            logger.info(f"🔍 Looking for PDFs in: {DATA_DIR}")
+            # Check what files are in the directory
+            pdf_files = list(Path(DATA_DIR).glob("*.pdf"))
+            load_whole_dir = True
+        else:
+            load_whole_dir = False
         logger.info(f"📂 Found {len(pdf_files)} PDF files in directory")
         if pdf_files:
             logger.info("📑 PDF files found:")
             for pdf in pdf_files:
                 logger.info(f"   - {pdf.name} (Size: {pdf.stat().st_size} bytes)")
         
-        loader = PyPDFDirectoryLoader(str(DATA_DIR))
-        documents = loader.load()
+        if parallel:
+            documents = list(iter_pdf_documents(pdf_files, workers=workers, failed_sources=failed_sources))
+        elif load_whole_dir:
+            from langchain_community.document_loaders import PyPDFDirectoryLoader
+            loader = PyPDFDirectoryLoader(str(DATA_DIR))
+            documents = loader.load()
+        else:
+            from langchain_community.document_loaders import PyPDFLoader
+            documents = []
+            for pdf in sorted(pdf_files, key=lambda p: p.name):
+                try:
+                    documents.extend(PyPDFLoader(str(pdf)).load())
+                except Exception as e:
+                    logger.error(f"❌ Failed to parse {pdf.name}: {e}")
+                    if failed_sources is not None:
+                        failed_sources.add(str(pdf))
         logger.info(f"📄 Successfully loaded {len(documents)} documents")
         if documents:
             logger.info(f"📝 First document metadata: {documents[0].metadata}")
@@ -74,6 +109,7 @@ def load_pdfs() -> List[Document]:
 
 # Split docs
 def split_docs(docs: List[Document]) -> List[Document]:
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
     splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
     chunks = splitter.split_documents(docs)
     logger.info(f"🔪 Split into {len(chunks)} chunks")
@@ -83,16 +119,50 @@ def split_docs(docs: List[Document]) -> List[Document]:
 def is_similar(a: str, b: str, threshold: float = SIMILARITY_THRESHOLD) -> bool:
     return SequenceMatcher(None, a, b).ratio() > threshold
 
-def deduplicate_chunks(chunks: List[Document]) -> List[Document]:
-    seen, unique = [], []
+def deduplicate_chunks_exhaustive(chunks: List[Document], seen_texts: Sequence[str] = ()) -> List[Document]:
+    """Original O(n²) scan: compares each chunk with every kept (or already stored) chunk."""
+    seen, unique = list(seen_texts), []
     for chunk in tqdm(chunks, desc="🧹 Deduplicating"):
-        text = chunk.page_content.strip()
+        text = clean_text(chunk.page_content)
         if not any(is_similar(text, s) for s in seen):
             seen.append(text)
             unique.append(chunk)
     logger.info(f"✨ {len(unique)} unique chunks kept from {len(chunks)}")
     return unique
 
+def deduplicate_chunks_minhash(
+    chunks: List[Document],
+    threshold: float = SIMILARITY_THRESHOLD,
+    seen_texts: Sequence[str] = (),
+) -> List[Document]:
+    """MinHash/LSH candidates confirmed with the same is_similar test."""
+    dedup = MinHashLSHDeduplicator(threshold=threshold)
+    for text in seen_texts:
+        dedup.add_if_unique(text)
+    unique = [
+        chunk for chunk in tqdm(chunks, desc="🧹 Deduplicating (MinHash)")
+        if dedup.add_if_unique(clean_text(chunk.page_content))
+    ]
+    logger.info(
+        f"✨ {len(unique)} unique chunks kept from {len(chunks)} "
+        f"({dedup.candidate_checks} candidate comparisons)"
+    )
+    return unique
+
+def deduplicate_chunks(
+    chunks: List[Document],
+    method: str = DEDUP_METHOD,
+    seen_texts: Sequence[str] = (),
+) -> List[Document]:
+    """
+    Drops chunks similar to an earlier chunk or to seen_texts. Chunks are
+    compared as cleaned text, the form they are stored in, so an incremental
+    ingest can pass the chunks already in Chroma as seen_texts.
+    """
+    if method == "exhaustive":
+        return deduplicate_chunks_exhaustive(chunks, seen_texts)
+    return deduplicate_chunks_minhash(chunks, seen_texts=seen_texts)
+
 # Assign IDs
 def assign_chunk_ids(chunks: List[Document]) -> List[Document]:
     last_page_id = None
@@ -117,10 +187,55 @@ def clean_text(text: str) -> str:
     text = ' '.join(text.split())
     return text.strip()
 
-def save_to_chroma(chunks: List[Document]):
+def upsert_with_retry(collection, chunks: List[Document], vectors: List[List[float]], attempts: int = WRITE_ATTEMPTS) -> List[str]:
+    """
+    Writes precomputed vectors to a Chroma collection. Failed writes are
+    retried with the same vectors, then the batch is bisected to isolate bad
+    records, so nothing is re-embedded. Returns the IDs that could not be written.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            collection.upsert(
+                ids=[c.metadata["id"] for c in chunks],
+                embeddings=vectors,
+                documents=[c.page_content for c in chunks],
+                metadatas=[c.metadata for c in chunks]
+            )
+            # Cached retrieval results for this collection are now stale (see retrieval_cache.py)
+            bump_generation(collection.name)
+            return []
+        except Exception as e:
+            logger.warning(f"⚠️ Write of {len(chunks)} chunks failed (attempt {attempt}/{attempts}): {e}")
+            if attempt < attempts:
+                time.sleep(WRITE_BACKOFF_SECONDS * attempt)
+
+    if len(chunks) == 1:
+        logger.error(f"Failed to add document {chunks[0].metadata['id']}")
+        return [chunks[0].metadata["id"]]
+    mid = len(chunks) // 2
+    return (
+        upsert_with_retry(collection, chunks[:mid], vectors[:mid], attempts=1)
+        + upsert_with_retry(collection, chunks[mid:], vectors[mid:], attempts=1)
+    )
+
+def get_chroma():
+    from langchain_community.vectorstores import Chroma
+    from vectorstores import CORPUS_COLLECTION
+    return Chroma(
+        collection_name=CORPUS_COLLECTION,
+        persist_directory=str(CHROMA_DIR),
+        embedding_function=get_embeddings()
+    )
+
+def save_to_chroma(chunks: List[Document], chroma=None) -> List[str]:
+    """
+    Adds chunks that are not in Chroma yet. Returns the IDs of every
+    non-empty chunk, whether newly added or already stored.
+    """
     try:
         # Initialize Chroma
-        chroma = Chroma(persist_directory=str(CHROMA_DIR), embedding_function=get_embeddings())
+        if chroma is None:
+            chroma = get_chroma()
         
         # Assign IDs and clean text content
         chunks = assign_chunk_ids(chunks)
@@ -134,7 +249,7 @@ def save_to_chroma(chunks: List[Document]):
             existing_ids = set()
 
         # Process and validate chunks
-        valid_chunks = []
+        valid_chunks, stored_ids = [], []
         for chunk in chunks:
             try:
                 # Clean the text content
@@ -142,6 +257,7 @@ def save_to_chroma(chunks: List[Document]):
                 if not chunk.page_content:
                     logger.warning(f"Skipping empty chunk: {chunk.metadata.get('id', 'unknown')}")
                     continue
+                stored_ids.append(chunk.metadata["id"])
                 if chunk.metadata["id"] not in existing_ids:
                     valid_chunks.append(chunk)
             except Exception as e:
@@ -150,53 +266,121 @@ def save_to_chroma(chunks: List[Document]):
 
         if not valid_chunks:
             logger.info("✅ No new valid chunks to add")
-            return
+            return stored_ids
 
-        logger.info(f"💾 Adding {len(valid_chunks)} new chunks")
+        from embeddings import adaptive_batch_size
+        embeddings = get_embeddings()
+        batch_size = adaptive_batch_size()
+        logger.info(f"💾 Adding {len(valid_chunks)} new chunks (embedding batch size {batch_size})")
         
-        # Process in smaller batches
-        batch_size = 50  # Reduced batch size for better stability
+        failed_ids = set()
         for i in tqdm(range(0, len(valid_chunks), batch_size), desc="🔗 Saving"):
             batch = valid_chunks[i:i + batch_size]
-            try:
-                chroma.add_documents(
-                    documents=batch,
-                    ids=[c.metadata["id"] for c in batch]
-                )
-            except Exception as e:
-                logger.error(f"Error adding batch {i//batch_size + 1}: {e}")
-                # Try adding documents one by one to identify the problematic one
-                for doc in batch:
-                    try:
-                        chroma.add_documents(
-                            documents=[doc],
-                            ids=[doc.metadata["id"]]
-                        )
-                    except Exception as single_doc_error:
-                        logger.error(f"Failed to add document {doc.metadata['id']}: {single_doc_error}")
-                        continue
+            # Embed once; write failures are retried with the same vectors
+            vectors = embeddings.embed_documents([c.page_content for c in batch], batch_size=batch_size)
+            failed_ids.update(upsert_with_retry(chroma._collection, batch, vectors))
+        stored_ids = [chunk_id for chunk_id in stored_ids if chunk_id not in failed_ids]
         
         chroma.persist()
         logger.info("✅ Successfully persisted Chroma database")
+        logger.info(f"🧬 Embedding model report: {get_embeddings().load_report()}")
+        return stored_ids
         
     except Exception as e:
         logger.error(f"❌ Error in save_to_chroma: {e}", exc_info=True)
         raise
 
+# Remove chunks of changed / deleted files
+def remove_stale_chunks(chroma, manifest: IngestManifest, plan: IngestPlan) -> None:
+    """
+    Deletes the recorded chunk IDs of changed and removed files, plus any
+    chunk whose source is being re-ingested (covers stores built before the
+    manifest existed).
+    """
+    sources = [str(pdf) for pdf in plan.to_process] + plan.removed
+    for source in sources:
+        try:
+            ids = manifest.chunk_ids(source)
+            if ids:
+                chroma.delete(ids=ids)
+            chroma._collection.delete(where={"source": source})
+            bump_generation(chroma._collection.name)
+            logger.info(f"🗑️ Removed {len(ids)} recorded chunks for {Path(source).name}")
+        except Exception as e:
+            logger.error(f"❌ Could not remove chunks for {source}: {e}")
+            raise
+    for source in plan.removed:
+        manifest.forget(source)
+
+def stored_chunk_texts(chroma) -> List[str]:
+    """Texts of the chunks left in the corpus, i.e. those of files not being re-ingested."""
+    page = chroma._collection.get(include=["documents"])
+    return [text for text in page.get("documents") or [] if text]
+
 # Main
 def main():
+    started = time.perf_counter()
     if not load_environment():
         logger.warning("🚫 Environment setup incomplete, continuing anyway")
 
-    docs = load_pdfs()
-    if not docs:
-        logger.error("📭 No documents found. Exiting.")
+    manifest = IngestManifest.load()
+    plan = manifest.plan(Path(DATA_DIR).glob("*.pdf"))
+    logger.info(f"🗂️ Ingest plan: {plan.summary()}")
+    if not plan.has_work:
+        if manifest.dirty:
+            manifest.save()
+        logger.info(f"✅ Knowledge base is up to date ({time.perf_counter() - started:.2f}s)")
         return
 
-    chunks = split_docs(docs)
-    clean_chunks = deduplicate_chunks(chunks)
-    save_to_chroma(clean_chunks)
-    logger.info("🏁 Done!")
+    chroma = get_chroma()
+    remove_stale_chunks(chroma, manifest, plan)
+
+    # New chunks are deduplicated against what unchanged files already stored
+    seen_texts = stored_chunk_texts(chroma) if plan.to_process else []
+    if plan.to_process and STREAMING_INGEST:
+        from ingest_pipeline import run_ingest_pipeline
+        result = run_ingest_pipeline(plan.to_process, chroma, seen_texts=seen_texts)
+        ids_by_source = result.ids_by_source
+        complete_sources = result.parsed_sources - result.failed_sources
+    elif plan.to_process:
+        failed_sources = set()
+        docs = load_pdfs(pdf_files=plan.to_process, failed_sources=failed_sources)
+        if not docs:
+            logger.error("📭 No documents found. Exiting.")
+            manifest.save()
+            return
+
+        chunks = split_docs(docs)
+        clean_chunks = deduplicate_chunks(chunks, seen_texts=seen_texts)
+        stored_ids = set(save_to_chroma(clean_chunks, chroma=chroma))
+
+        ids_by_source = {}
+        for chunk in clean_chunks:
+            chunk_id = chunk.metadata.get("id")
+            if chunk_id in stored_ids:
+                ids_by_source.setdefault(chunk.metadata.get("source"), []).append(chunk_id)
+            elif chunk.page_content:  # empty chunks are skipped on purpose, others failed to write
+                failed_sources.add(chunk.metadata.get("source"))
+        complete_sources = {doc.metadata.get("source") for doc in docs} - failed_sources
+    if plan.to_process:
+        # Only files whose pages all parsed and whose chunks were all written are
+        # recorded; the rest are re-ingested (stale chunks removed) on the next run
+        for pdf in plan.to_process:
+            if str(pdf) in complete_sources:
+                manifest.record(pdf, ids_by_source.get(str(pdf), []))
+            else:
+                logger.warning(f"⚠️ {pdf.name} was not fully ingested; it will be retried on the next run")
+
+    manifest.save()
+    from vectorstores import RETRIEVAL_BACKEND, RETRIEVAL_MODE
+    if RETRIEVAL_BACKEND == "mmap":
+        # Keep the snapshot the agents search in step with the collection
+        from vector_index import export_index
+        export_index()
+    if RETRIEVAL_MODE == "hybrid":
+        from bm25_index import build_bm25_index
+        build_bm25_index()
+    logger.info(f"🏁 Done in {time.perf_counter() - started:.2f}s!")
 
 if __name__ == "__main__":
     main()
@@ -1,95 +1,124 @@
-from langchain.schema import Document
-from langchain_chroma import Chroma  # Updated import
-from langchain_huggingface import HuggingFaceEmbeddings
-from pathlib import Path
-import os
+from embeddings import get_embeddings
+from vectorstores import MEMORY_COLLECTION, MEMORY_SOURCE, get_memory_store
+from retrieval_cache import bump_generation, query_key, retrieval_cache
 import hashlib
 
 # ─────────────────────────────
 # 1. ChromaDB setup (shared)
 # ─────────────────────────────
-# Use relative path for deployment compatibility
-CHROMA_DIR = Path(os.getenv("CHROMA_DB_PATH", Path(__file__).parent / "chroma"))
+# Shared, lazily loaded embedding model (one copy per process)
+embedding_model = get_embeddings()
 
-embedding_model = HuggingFaceEmbeddings(
-    model_name="BAAI/bge-base-en-v1.5",
-    model_kwargs={"device": "cpu"},
-    encode_kwargs={"normalize_embeddings": True}
-)
-
-# Create directory if it doesn't exist
-CHROMA_DIR.mkdir(parents=True, exist_ok=True)
-
-vectorstore = Chroma(
-    persist_directory=str(CHROMA_DIR),
-    embedding_function=embedding_model
-)
+# Dedicated memory collection, so memory search never scans PDF chunks.
+# Opened on first use (get_memory_store caches it per process), not at import.
 
 # ─────────────────────────────
 # 2. Save conversation to memory
 # ─────────────────────────────
-def save_memory(query: str, response: str, memory_type: str = "qna") -> None:
+def save_memory(query: str, response: str, memory_type: str = "qna", query_embedding=None) -> None:
     """
     Saves a user-assistant interaction to Chroma vectorstore.
+    When the turn's query embedding is given, the memory is indexed by it
+    instead of re-embedding the combined text.
     """
+    from langchain_core.documents import Document
+
     memory_doc = Document(
         page_content=f"User: {query}\nAssistant: {response}",
         metadata={
-            "source": "chat_memory",
+            "source": MEMORY_SOURCE,
             "type": memory_type,
             "id": f"conv_{hashlib.sha256(query.encode()).hexdigest()}"
         }
     )
     try:
-        vectorstore.add_documents([memory_doc], ids=[memory_doc.metadata["id"]])
+        if query_embedding is not None:
+            # Chroma's wrapper has no add-by-vector API, so upsert on the collection directly
+            get_memory_store()._collection.upsert(
+                ids=[memory_doc.metadata["id"]],
+                embeddings=[list(query_embedding)],
+                documents=[memory_doc.page_content],
+                metadatas=[memory_doc.metadata]
+            )
+        else:
+            get_memory_store().add_documents([memory_doc], ids=[memory_doc.metadata["id"]])
+        # Only cached memory searches go stale; cached corpus results are kept
+        bump_generation(MEMORY_COLLECTION)
     except Exception as e:
         print(f"⚠️ Could not save to memory: {e}")
 
 # ─────────────────────────────
 # 3. Retrieve past memory chunks
 # ─────────────────────────────
-def retrieve_memory(query, k=5):
+def retrieve_memory(query, k=5, query_embedding=None):
     """
     Retrieves k most relevant past memories related to the query,
     with improved prioritization of recent and relevant memories.
+    Pass the turn's query_embedding to search by vector without re-embedding.
     """
     try:
-        # Try direct search first with increased k for better coverage
-        results = vectorstore.similarity_search_with_score(query, k=k+2)  # Get extra results to filter
-        memory_docs = []
-        
-        for doc, score in results:
-            # Only include documents from chat_memory
-            if doc.metadata.get("source") == "chat_memory":
-                # Store the document with its score and metadata for better filtering
-                memory_docs.append((doc, score))
-        
-        # Sort by relevance (score) first
-        memory_docs.sort(key=lambda x: x[1])
+        # The memory collection only holds chat turns, so no over-fetch or filtering is needed
+        if query_embedding is None:
+            query_embedding = embedding_model.embed_query(query)
+        memory_docs = _search_memory(query_embedding, k)
+        return _rank_memories(memory_docs, k)
         
-        # Extract the memory texts from the sorted documents
-        memory_texts = []
-        memory_types_count = {"qna": 0, "emotional": 0, "suggestion": 0}
+    except Exception as e:
+        print(f"⚠️ Could not retrieve memory: {e}")
+        return []
+
+def _search_memory(query_embedding, k):
+    """Memory collection search through the retrieval cache (invalidated by save_memory)."""
+    return retrieval_cache.get_or_search(
+        MEMORY_COLLECTION,
+        (query_key(query_embedding), k, None),
+        lambda: get_memory_store().similarity_search_by_vector_with_relevance_scores(query_embedding, k=k),
+    )
+
+def _rank_memories(memory_docs, k):
+    """Orders (doc, score) hits by relevance with a balanced mix of memory types."""
+    # Sort by relevance (score) first
+    memory_docs.sort(key=lambda x: x[1])
+    
+    # Extract the memory texts from the sorted documents
+    memory_texts = []
+    memory_types_count = {"qna": 0, "emotional": 0, "suggestion": 0}
+    
+    # First pass: prioritize diverse memory types
+    for doc, score in memory_docs:
+        memory_type = doc.metadata.get("type", "unknown")
         
-        # First pass: prioritize diverse memory types
-        for doc, score in memory_docs:
-            memory_type = doc.metadata.get("type", "unknown")
+        # Ensure we have a balanced mix of memory types
+        if memory_type in memory_types_count and memory_types_count[memory_type] < 2:
+            memory_texts.append(doc.page_content)
+            memory_types_count[memory_type] += 1
             
-            # Ensure we have a balanced mix of memory types
-            if memory_type in memory_types_count and memory_types_count[memory_type] < 2:
+    # Second pass: add remaining memories up to k
+    remaining_slots = k - len(memory_texts)
+    if remaining_slots > 0:
+        for doc, score in memory_docs:
+            if doc.page_content not in memory_texts and len(memory_texts) < k:
                 memory_texts.append(doc.page_content)
-                memory_types_count[memory_type] += 1
-                
-        # Second pass: add remaining memories up to k
-        remaining_slots = k - len(memory_texts)
-        if remaining_slots > 0:
-            for doc, score in memory_docs:
-                if doc.page_content not in memory_texts and len(memory_texts) < k:
-                    memory_texts.append(doc.page_content)
-                
-        print(f"🧠 Found {len(memory_texts)} relevant memories with improved diversity")
-        return memory_texts
-        
+            
+    print(f"🧠 Found {len(memory_texts)} relevant memories with improved diversity")
+    return memory_texts
+
+# ─────────────────────────────
+# 4. Async variants (Chroma's local client is blocking, so these run it in the executor)
+# ─────────────────────────────
+async def asave_memory(query: str, response: str, memory_type: str = "qna", query_embedding=None) -> None:
+    """Async save_memory for the async graph path."""
+    from langchain_core.runnables.config import run_in_executor
+    await run_in_executor(None, save_memory, query, response, memory_type, query_embedding)
+
+async def aretrieve_memory(query, k=5, query_embedding=None):
+    """Async retrieve_memory; embeds off the event loop when no vector is given."""
+    from langchain_core.runnables.config import run_in_executor
+    try:
+        if query_embedding is None:
+            query_embedding = await embedding_model.aembed_query(query)
+        memory_docs = await run_in_executor(None, _search_memory, query_embedding, k)
+        return _rank_memories(memory_docs, k)
     except Exception as e:
         print(f"⚠️ Could not retrieve memory: {e}")
-        return []
\ No newline at end of file
+        return []
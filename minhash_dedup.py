@@ -0,0 +1,102 @@
+"""
+Near-duplicate detection with shingling + MinHash + LSH banding.
+
+Replaces the all-pairs SequenceMatcher scan in loader.deduplicate_chunks.
+LSH only proposes candidate pairs; each candidate is still confirmed with the
+same SequenceMatcher ratio > threshold test, so a chunk is dropped exactly
+when it is "similar" to a kept chunk that LSH surfaces.
+"""
+
+import re
+import zlib
+from difflib import SequenceMatcher
+from typing import Dict, List
+
+import numpy as np
+
+# ─────────────────────────────
+# 1. MinHash settings
+# ─────────────────────────────
+SHINGLE_SIZE = 3        # words per shingle
+NUM_BANDS = 32
+ROWS_PER_BAND = 4       # 128 permutations; pairs with Jaccard ≈ 0.5 collide ~87% of the time
+_MERSENNE_PRIME = np.uint64(4294967311)  # smallest prime above 2**32
+_WORD_RE = re.compile(r"\w+")
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> List[str]:
+    """Lower-cased word n-grams; very short texts become a single shingle."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return [" ".join(words)] if words else [text]
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+class MinHashLSHDeduplicator:
+    """Incremental near-duplicate filter; add_if_unique keeps or rejects one text."""
+
+    def __init__(
+        self,
+        threshold: float,
+        num_bands: int = NUM_BANDS,
+        rows_per_band: int = ROWS_PER_BAND,
+        seed: int = 1,
+    ):
+        self.threshold = threshold
+        self.num_bands = num_bands
+        self.rows_per_band = rows_per_band
+        num_perm = num_bands * rows_per_band
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 2**32 - 1, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 2**32 - 1, size=num_perm, dtype=np.uint64)
+        self._bands: List[Dict[bytes, List[int]]] = [dict() for _ in range(num_bands)]
+        self._exact: Dict[str, int] = {}
+        self.kept: List[str] = []
+        self.candidate_checks = 0
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in set(shingles(text))),
+            dtype=np.uint64
+        )
+        # (a * x + b) mod p stays below 2**64 because a, b, x < 2**32
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _MERSENNE_PRIME
+        return permuted.min(axis=1)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        rows = self.rows_per_band
+        return [signature[i * rows:(i + 1) * rows].tobytes() for i in range(self.num_bands)]
+
+    def _is_similar(self, a: str, b: str) -> bool:
+        matcher = SequenceMatcher(None, a, b)
+        # Cheap upper bounds first; ratio() only when they can still pass
+        return (
+            matcher.real_quick_ratio() > self.threshold
+            and matcher.quick_ratio() > self.threshold
+            and matcher.ratio() > self.threshold
+        )
+
+    def add_if_unique(self, text: str) -> bool:
+        """Returns True (and indexes the text) when no kept text is similar to it."""
+        if text in self._exact:
+            return False
+
+        band_keys = self._band_keys(self.signature(text))
+        candidates = set()
+        for band, key in zip(self._bands, band_keys):
+            candidates.update(band.get(key, ()))
+
+        for index in sorted(candidates):
+            self.candidate_checks += 1
+            if self._is_similar(text, self.kept[index]):
+                return False
+
+        index = len(self.kept)
+        self.kept.append(text)
+        self._exact[text] = index
+        for band, key in zip(self._bands, band_keys):
+            band.setdefault(key, []).append(index)
+        return True
+
+
+__all__ = ["MinHashLSHDeduplicator", "shingles"]
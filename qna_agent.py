@@ -2,14 +2,15 @@ import warnings
 warnings.filterwarnings("ignore", message=".*encoder_attention_mask.*", category=FutureWarning)
 
 import os
-from pathlib import Path
+from typing import List
 from dotenv import load_dotenv
-from langchain.prompts import PromptTemplate
-from langchain_chroma import Chroma
-from langchain.schema import Document
-from memory_utils import retrieve_memory, save_memory
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_groq import ChatGroq
+from memory_utils import asave_memory, save_memory
+from retrieval import acorpus_results, amemory_results, corpus_results, memory_results
+from streaming import astream_llm, stream_llm
+from context_packer import pack_for_agent
+from embeddings import aquery_embedding_for, get_embeddings, query_embedding_for
+from agent_steps import arun_steps, run_steps, step
+from llm_client import lazy_chain
 
 # ───────────────────────
 # 1. ENV + EMBEDDINGS + VECTORSTORE
@@ -19,25 +20,13 @@ groq_api_key = os.getenv("GROQ_API_KEY")
 if not groq_api_key:
     raise EnvironmentError("❌ GROQ_API_KEY is missing.")
 
-embedding_model = HuggingFaceEmbeddings(
-    model_name="BAAI/bge-base-en-v1.5",
-    model_kwargs={"device": "cpu"},
-    encode_kwargs={"normalize_embeddings": True}
-)
-
-# Use relative path for deployment compatibility
-CHROMA_DIR = Path(os.getenv("CHROMA_DB_PATH", Path(__file__).parent / "chroma"))
-CHROMA_DIR.mkdir(parents=True, exist_ok=True)
-
-vectorstore = Chroma(persist_directory=str(CHROMA_DIR), embedding_function=embedding_model)
+# Shared, lazily loaded embedding model (one copy per process)
+embedding_model = get_embeddings()
 
 # GROQ LLM - RELIABLE AND FAST
-llm = ChatGroq(
-    groq_api_key=groq_api_key,
-    model_name="llama-3.3-70b-versatile",
-    temperature=0.3,
-    max_tokens=200  # Reduced for concise responses
-)
+# Shared pooled client (llm_client.py); only the call options are per agent
+# Built on first call, so importing the agent does not load langchain_groq
+QNA_LLM_OPTIONS = dict(temperature=0.3, max_tokens=200)  # Reduced for concise responses
 
 # ───────────────────────
 # 2. CONCISE PROMPT TEMPLATE
@@ -62,171 +51,198 @@ Format your response exactly like this:
 
 **Answer:**"""
 
-PROMPT = PromptTemplate(input_variables=["context", "question"], template=PROMPT_TEMPLATE)
-qna_chain = PROMPT | llm
+qna_chain = lazy_chain(PROMPT_TEMPLATE, **QNA_LLM_OPTIONS)
 
 # ───────────────────────
 # 3. QnA Agent Node
 # ───────────────────────
-def qna_node(state: dict) -> dict:
-    query = state.get("input", "")
-    print(f"🔍 QnA processing: {query}")
-    
-    # Retrieve chunks from vectorstore
-    try:
-        relevant_chunks = vectorstore.similarity_search_with_score(query, k=3)  # Reduced for focus
-        retrieved_texts = [doc.page_content for doc, _ in relevant_chunks]
-        print(f"✅ Retrieved {len(retrieved_texts)} chunks from vectorstore")
-    except Exception as e:
-        print(f"⚠️ Vectorstore search error: {e}")
-        retrieved_texts = []
-
-    # Retrieve memory using utility
-    try:
-        past_texts = retrieve_memory(query, k=2)  # Reduced for focus
-        print(f"✅ Retrieved {len(past_texts)} memories")
-    except Exception as e:
-        print(f"⚠️ Memory retrieval error: {e}")
-        past_texts = []
-
-    context = "\n\n---\n\n".join(retrieved_texts + past_texts)
-    print(f"📝 Context length: {len(context)} characters")
-    
-    if not context.strip():
-        state["response"] = """• Empty Nest Syndrome refers to feelings of sadness when children leave home.
+EMPTY_CONTEXT_RESPONSE = """• Empty Nest Syndrome refers to feelings of sadness when children leave home.
 
 • It's a normal part of parenting.
 
 • These feelings are temporary.
 
 What specific aspect of Empty Nest Syndrome would you like to know more about?"""
-        state["agent"] = "qna"
-        return state
 
-    # LLM INVOCATION WITH GROQ
-    print(f"🚀 About to call GROQ with context length: {len(context)}")
-    try:
-        limited_context = context[:4000]  # Increased context for more comprehensive responses
-        print(f"🔄 Calling GROQ with limited context: {len(limited_context)} chars")
-        
-        result = qna_chain.invoke({
-            "context": limited_context, 
-            "question": query
-        })
-        
-        print(f"✅ GROQ raw result type: {type(result)}")
-        
-        if hasattr(result, 'content'):
-            response = result.content.strip()
-        else:
-            response = str(result).strip()
-            
-        print(f"✅ Final response: {response[:100]}...")
+def _chain_inputs(query: str, texts: List[str]) -> dict:
+    # Whole chunks in rank order (corpus, then memory) up to the qna token budget
+    packed_context = pack_for_agent("qna", texts)
+    print(f"🔄 Calling GROQ with packed context: {len(packed_context)} chars")
+    return {"context": packed_context, "question": query}
+
+def _is_llm_answer(response: str) -> bool:
+    """True when the LLM text is long enough to keep instead of a keyword fallback."""
+    return bool(response) and len(response) >= 20
+
+def _checked_response(query: str, response: str) -> str:
+    """Validates the full LLM text, swapping in keyword fallbacks when it is unusable."""
+    print(f"✅ Final response: {response[:100]}...")
+    
+    # Validate response quality and format
+    if not _is_llm_answer(response):
+        # Create a more query-specific fallback based on keywords in the query
+        query_lower = query.lower()
         
-        # Validate response quality and format
-        if not response or len(response) < 20:
-            # Create a more query-specific fallback based on keywords in the query
-            query_lower = query.lower()
-            
-            if "symptom" in query_lower or "sign" in query_lower:
-                response = """• Empty Nest Syndrome causes feelings of sadness when children leave home.
+        if "symptom" in query_lower or "sign" in query_lower:
+            response = """• Empty Nest Syndrome causes feelings of sadness when children leave home.
 
 • Parents may have trouble sleeping or feel less hungry.
 
 • Some parents worry about their children or their own identity.
 
 What would you like to do next? Do you want to know more about empty nest? Do you want to tell me how you are feeling today? Shall I suggest activities to help you cope with this?"""
-            elif "cause" in query_lower or "why" in query_lower:
-                response = """• Empty Nest Syndrome happens when children leave home and parents' roles change.
+        elif "cause" in query_lower or "why" in query_lower:
+            response = """• Empty Nest Syndrome happens when children leave home and parents' roles change.
 
 • Parents may feel a void from fewer daily responsibilities.
 
 • Your identity as a parent may feel challenged.
 
 What would you like to do next? Do you want to know more about empty nest? Do you want to tell me how you are feeling today? Shall I suggest activities to help you cope with this?"""
-            elif "cope" in query_lower or "deal" in query_lower or "manage" in query_lower:
-                response = """• Try reconnecting with activities you enjoy.
+        elif "cope" in query_lower or "deal" in query_lower or "manage" in query_lower:
+            response = """• Try reconnecting with activities you enjoy.
 
 • Build new routines and keep in touch with your children.
 
 • Talk to friends or a counselor for support.
 
 What would you like to do next? Do you want to know more about empty nest? Do you want to tell me how you are feeling today? Shall I suggest activities to help you cope with this?"""
-            else:
-                response = """• Empty Nest Syndrome is the sadness parents feel when children leave home.
+        else:
+            response = """• Empty Nest Syndrome is the sadness parents feel when children leave home.
 
 • It's a normal feeling many parents experience.
 
 • These feelings will pass with time.
 
 What would you like to do next? Do you want to know more about empty nest? Do you want to tell me how you are feeling today? Shall I suggest activities to help you cope with this?"""
-        
-        # Ensure proper format if missing
-        if "•" not in response:
-            # Make the formatting more query-specific
-            query_lower = query.lower()
-            follow_up = "What would you like to do next? Do you want to know more about empty nest? Or do you want to tell me how you are feeling today? Or shall I suggest activities to help you cope with this?"
-                
-            response = f"• {response}\n\n{follow_up}"
-        
-    except Exception as e:
-        print(f"❌ GROQ error details: {e}")
-        
-        # Create a more query-specific error fallback based on keywords in the query
+    
+    # Ensure proper format if missing
+    if "•" not in response:
+        # Make the formatting more query-specific
         query_lower = query.lower()
-        
-        if "symptom" in query_lower or "sign" in query_lower:
-            response = """• Empty Nest Syndrome often causes feelings of sadness and loss.
+        follow_up = "What would you like to do next? Do you want to know more about empty nest? Or do you want to tell me how you are feeling today? Or shall I suggest activities to help you cope with this?"
+            
+        response = f"• {response}\n\n{follow_up}"
+    return response
+
+def _error_response(query: str) -> str:
+    """Keyword fallback when the GROQ call fails."""
+    # Create a more query-specific error fallback based on keywords in the query
+    query_lower = query.lower()
+    
+    if "symptom" in query_lower or "sign" in query_lower:
+        response = """• Empty Nest Syndrome often causes feelings of sadness and loss.
 
 • You might notice changes in your sleep or appetite.
 
 • Many parents worry about their children or their own identity.
 
 What would you like to do next? Do you want to know more about empty nest? Do you want to tell me how you are feeling today? Shall I suggest activities to help you cope with this?"""
-        elif "cause" in query_lower or "why" in query_lower:
-            response = """• Empty Nest Syndrome happens when children leave home.
+    elif "cause" in query_lower or "why" in query_lower:
+        response = """• Empty Nest Syndrome happens when children leave home.
 
 • Your daily routine changes without children at home.
 
 • Many parents question their purpose during this time.
 
 What would you like to do next? Do you want to know more about empty nest? Do you want to tell me how you are feeling today? Shall I suggest activities to help you cope with this?"""
-        elif "cope" in query_lower or "deal" in query_lower or "manage" in query_lower:
-            response = """• Try new hobbies or return to old interests you enjoy.
+    elif "cope" in query_lower or "deal" in query_lower or "manage" in query_lower:
+        response = """• Try new hobbies or return to old interests you enjoy.
 
 • Keep in touch with your children while respecting their independence.
 
 • Connect with other parents in similar situations.
 
 What would you like to do next? Do you want to know more about empty nest? Do you want to tell me how you are feeling today? Shall I suggest activities to help you cope with this?"""
-        elif "calm" in query_lower or "remed" in query_lower or "help" in query_lower:
-            response = """• Try mindfulness or meditation to manage your emotions.
+    elif "calm" in query_lower or "remed" in query_lower or "help" in query_lower:
+        response = """• Try mindfulness or meditation to manage your emotions.
 
 • Regular exercise can reduce stress and improve your mood.
 
 • Create new routines and set personal goals.
 
 What would you like to do next? Do you want to know more about empty nest? Do you want to tell me how you are feeling today? Shall I suggest activities to help you cope with this?"""
-        else:
-            response = """• Empty Nest Syndrome refers to feelings of sadness when children leave home.
+    else:
+        response = """• Empty Nest Syndrome refers to feelings of sadness when children leave home.
 
 • It's a natural part of parenting.
 
 • These feelings are temporary.
 
 What would you like to do next? Do you want to know more about empty nest? Do you want to tell me how you are feeling today? Shall I suggest activities to help you cope with this?"""
+    return response
 
+def _finish(state: dict, response: str) -> dict:
     # Clean response
-    response = response.replace("**Answer:**", "").strip()
+    state["response"] = response.replace("**Answer:**", "").strip()
+    state["agent"] = "qna"
+    return state
+
+def _qna_steps(state: dict):
+    """qna node body; run_steps / arun_steps make (or await) each yielded call."""
+    query = state.get("input", "")
+    print(f"🔍 QnA processing: {query}")
+    
+    # Embed the query once per turn; every search below reuses the vector
+    try:
+        query_embedding = yield step(query_embedding_for, aquery_embedding_for, state)
+    except Exception as e:
+        print(f"⚠️ Query embedding error: {e}")
+        query_embedding = None
+
+    # Retrieve chunks from vectorstore
+    try:
+        # Reduced for focus; prefetched in speculative mode
+        relevant_chunks = yield step(corpus_results, acorpus_results, state, query_embedding, k=3)
+        retrieved_texts = [doc.page_content for doc, _ in relevant_chunks]
+        print(f"✅ Retrieved {len(retrieved_texts)} chunks from vectorstore")
+    except Exception as e:
+        print(f"⚠️ Vectorstore search error: {e}")
+        retrieved_texts = []
+
+    # Retrieve memory using utility
+    try:
+        past_texts = yield step(memory_results, amemory_results, state, query_embedding, k=2)  # Reduced for focus
+        print(f"✅ Retrieved {len(past_texts)} memories")
+    except Exception as e:
+        print(f"⚠️ Memory retrieval error: {e}")
+        past_texts = []
+
+    context = "\n\n---\n\n".join(retrieved_texts + past_texts)
+    print(f"📝 Context length: {len(context)} characters")
+    
+    if not context.strip():
+        state["response"] = EMPTY_CONTEXT_RESPONSE
+        state["agent"] = "qna"
+        return state
+
+    # LLM INVOCATION WITH GROQ
+    try:
+        # Tokens stream to the UI as they arrive; the checks below run on the full text
+        inputs = _chain_inputs(query, retrieved_texts + past_texts)
+        response = (yield step(stream_llm, astream_llm, qna_chain, inputs, agent="qna")).strip()
+        # Keyword fallbacks must never reach the semantic cache
+        state["cacheable"] = _is_llm_answer(response)
+        response = _checked_response(query, response)
+    except Exception as e:
+        print(f"❌ GROQ error details: {e}")
+        response = _error_response(query)
+        state["cacheable"] = False
+
+    state = _finish(state, response)
 
     # Save memory using utility
     try:
-        save_memory(query, response, memory_type="qna")
+        yield step(save_memory, asave_memory, query, state["response"], memory_type="qna", query_embedding=query_embedding)
         print(f"✅ Saved to memory")
     except Exception as e:
         print(f"⚠️ Memory save error: {e}")
 
-    # Update state
-    state["response"] = response
-    state["agent"] = "qna"
-    return state
\ No newline at end of file
+    return state
+
+def qna_node(state: dict) -> dict:
+    return run_steps(_qna_steps(state))
+
+async def aqna_node(state: dict) -> dict:
+    """Async qna_node: awaits retrieval, the Groq stream and the memory write."""
+    return await arun_steps(_qna_steps(state))
@@ -0,0 +1,169 @@
+"""
+Process-wide resources, created once and reused across Streamlit reruns and sessions.
+
+Streamlit re-executes app2.py on every keystroke and click. Imported
+modules survive a rerun, but anything the script builds itself, such as the
+compiled LangGraph, used to be rebuilt every time. The registry builds each
+resource on first use and hands out the same object afterwards:
+
+    embeddings    shared embedding provider (the model itself loads on first embed)
+    corpus        corpus search backend (Chroma or the mmap index)
+    memory        memory collection
+    llm           shared ChatGroq with its pooled HTTP clients
+    graph         compiled Kotori graph
+
+It also records how long each build took, and how long every script run
+waited before it could render. `resource_report()` then shows that reruns no
+longer pay the graph-build cost.
+"""
+
+import time
+import threading
+from dataclasses import dataclass
+from statistics import mean
+from typing import Any, Callable, Dict, List, Optional
+
+# First import of this module, used as the process's startup reference
+PROCESS_STARTED = time.perf_counter()
+
+
+# ─────────────────────────────
+# 1. Factories (imported lazily, so importing this module stays cheap)
+# ─────────────────────────────
+def _embeddings():
+    from embeddings import get_embeddings
+    return get_embeddings()
+
+
+def _corpus():
+    from vectorstores import get_corpus_index
+    return get_corpus_index()
+
+
+def _memory():
+    from vectorstores import get_memory_store
+    return get_memory_store()
+
+
+def _llm():
+    from llm_client import get_chat_model
+    return get_chat_model()
+
+
+def _graph():
+    from kotori_graph import build_kotori_graph
+    return build_kotori_graph()
+
+
+FACTORIES: Dict[str, Callable[[], Any]] = {
+    "embeddings": _embeddings,
+    "corpus": _corpus,
+    "memory": _memory,
+    "llm": _llm,
+    "graph": _graph,
+}
+
+
+# ─────────────────────────────
+# 2. Registry
+# ─────────────────────────────
+@dataclass
+class ResourceInfo:
+    build_seconds: float
+    ready_after_start: float  # seconds from PROCESS_STARTED until the build finished
+    reuses: int = 0
+
+
+class ResourceRegistry:
+    def __init__(self, factories: Dict[str, Callable[[], Any]] = FACTORIES):
+        self.factories = dict(factories)
+        self._resources: Dict[str, Any] = {}
+        self.info: Dict[str, ResourceInfo] = {}
+        self._locks: Dict[str, threading.Lock] = {name: threading.Lock() for name in self.factories}
+        self.script_runs: List[float] = []  # seconds each script run took before it could render
+
+    def get(self, name: str):
+        """The resource, built on first call (one builder per name; other callers wait for it)."""
+        if name in self._resources:
+            self.info[name].reuses += 1
+            return self._resources[name]
+        with self._locks[name]:
+            if name not in self._resources:
+                started = time.perf_counter()
+                resource = self.factories[name]()
+                finished = time.perf_counter()
+                self.info[name] = ResourceInfo(finished - started, finished - PROCESS_STARTED)
+                self._resources[name] = resource
+                print(f"🧱 Built resource '{name}' in {(finished - started) * 1000:.0f} ms")
+            else:
+                self.info[name].reuses += 1
+        return self._resources[name]
+
+    def is_ready(self, name: str) -> bool:
+        return name in self._resources
+
+    def record_script_run(self, seconds: float) -> None:
+        self.script_runs.append(seconds)
+        kind = "first run" if len(self.script_runs) == 1 else f"rerun #{len(self.script_runs) - 1}"
+        print(f"🔁 Script {kind}: ready to render after {seconds * 1000:.1f} ms")
+
+    def report(self) -> dict:
+        runs = self.script_runs
+        reruns = runs[1:]
+        return {
+            "resources": {
+                name: {
+                    "build_ms": round(info.build_seconds * 1000, 1),
+                    "ready_after_start_ms": round(info.ready_after_start * 1000, 1),
+                    "reuses": info.reuses,
+                }
+                for name, info in self.info.items()
+            },
+            "first_run_ms": round(runs[0] * 1000, 1) if runs else None,
+            "reruns": len(reruns),
+            "rerun_mean_ms": round(mean(reruns) * 1000, 2) if reruns else None,
+            "rerun_max_ms": round(max(reruns) * 1000, 2) if reruns else None,
+        }
+
+
+registry = ResourceRegistry()
+
+
+# ─────────────────────────────
+# 3. Public accessors
+# ─────────────────────────────
+def get_resource(name: str):
+    return registry.get(name)
+
+
+def get_graph():
+    """The compiled graph, shared by every session of this process."""
+    return registry.get("graph")
+
+
+def resource_report() -> dict:
+    return registry.report()
+
+
+def format_resource_report(report: Optional[dict] = None) -> str:
+    report = report or resource_report()
+    lines = ["⏱️ Resources (build ms / ready after process start ms / reuses)"]
+    for name, info in report["resources"].items():
+        lines.append(f"   {name:<11} {info['build_ms']:9.1f} {info['ready_after_start_ms']:10.1f} {info['reuses']:6d}")
+    if report["first_run_ms"] is not None:
+        lines.append(f"   first script run waited {report['first_run_ms']:.1f} ms")
+    if report["reruns"]:
+        lines.append(f"   {report['reruns']} reruns waited {report['rerun_mean_ms']:.2f} ms on average "
+                     f"(max {report['rerun_max_ms']:.2f} ms)")
+    return "\n".join(lines)
+
+
+__all__ = [
+    "FACTORIES",
+    "ResourceRegistry",
+    "format_resource_report",
+    "get_graph",
+    "get_resource",
+    "registry",
+    "resource_report",
+]
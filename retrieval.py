@@ -0,0 +1,190 @@
+"""
+Per-turn retrieval shared by the agents.
+
+Every agent starts with a corpus search on the raw input, which does not
+depend on the route. In speculative graph mode `prefetch_context` runs that
+search (and the memory lookup) in parallel with routing and stores the
+results in the graph state; the agents then read them through
+`corpus_results` / `memory_results` and only search live when nothing was
+prefetched or they need more results than were fetched.
+
+With RETRIEVAL_MODE=hybrid every corpus search fuses the dense results with
+the BM25 index (bm25_index.py) by reciprocal rank fusion, so queries that
+hinge on specific terms still find the chunks that contain them.
+"""
+
+import os
+import asyncio
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+from memory_utils import aretrieve_memory, retrieve_memory
+from retrieval_cache import query_key, retrieval_cache
+from vectorstores import CORPUS_COLLECTION, RETRIEVAL_BACKEND, RETRIEVAL_MODE, get_corpus_index
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+# ─────────────────────────────
+# 1. Settings
+# ─────────────────────────────
+# Largest k any agent asks for, so one speculative search serves every route
+PREFETCH_CORPUS_K = int(os.getenv("PREFETCH_CORPUS_K", "3"))
+PREFETCH_MEMORY_K = int(os.getenv("PREFETCH_MEMORY_K", "2"))
+# Hybrid mode: candidates taken from each ranking before fusion, and the RRF constant
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+RRF_K = 60
+
+
+# ─────────────────────────────
+# 1b. Dense / hybrid corpus search
+# ─────────────────────────────
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = RRF_K) -> List[Tuple[str, float]]:
+    """Fuses ranked id lists: score(id) = sum over lists of 1 / (k + rank), best first."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def _chunk_id(doc: "Document") -> Optional[str]:
+    return doc.id or doc.metadata.get("id")
+
+
+_bm25_missing = False
+
+
+def hybrid_search(query: str, query_embedding: Optional[List[float]], k: int) -> List[Tuple["Document", float]]:
+    """
+    Top-k corpus chunks by RRF over the dense and BM25 rankings, with the
+    fused score (higher is better). Without a BM25 index the dense ranking
+    is fused alone, so the scores keep the same RRF convention.
+    """
+    global _bm25_missing
+    from bm25_index import get_bm25_index
+
+    index = get_corpus_index()
+    dense = index.similarity_search_by_vector_with_relevance_scores(query_embedding, k=HYBRID_CANDIDATES) if query_embedding else []
+    try:
+        sparse = get_bm25_index().search(query, HYBRID_CANDIDATES)
+    except FileNotFoundError:
+        if not _bm25_missing:
+            _bm25_missing = True
+            print("⚠️ No BM25 index built yet (python bm25_index.py), using dense retrieval only")
+        sparse = []
+
+    docs = {_chunk_id(doc): doc for doc, _ in dense}
+    rankings = [list(docs), [chunk_id for chunk_id, _ in sparse]] if sparse else [list(docs)]
+    fused = reciprocal_rank_fusion(rankings)[:k]
+    missing = [chunk_id for chunk_id, _ in fused if chunk_id not in docs]
+    if missing:
+        for doc in index.get_by_ids(missing):
+            docs[_chunk_id(doc)] = doc
+    return [(docs[chunk_id], score) for chunk_id, score in fused if chunk_id in docs]
+
+
+def _search_corpus(query: str, query_embedding: Optional[List[float]], k: int) -> List[Tuple["Document", float]]:
+    if RETRIEVAL_MODE == "hybrid":
+        return hybrid_search(query, query_embedding, k)
+    return get_corpus_index().similarity_search_by_vector_with_relevance_scores(query_embedding, k=k)
+
+
+def search_corpus(query: str, query_embedding: Optional[List[float]], k: int) -> List[Tuple["Document", float]]:
+    """
+    Top-k corpus chunks with scores, dense or hybrid per RETRIEVAL_MODE.
+    Served from the retrieval cache until the corpus generation changes.
+    """
+    # Dense results depend on the vector only; hybrid ones on the query text too
+    text = query if RETRIEVAL_MODE == "hybrid" or query_embedding is None else None
+    key = (RETRIEVAL_MODE, RETRIEVAL_BACKEND, query_key(query_embedding, text), k, None)
+    return retrieval_cache.get_or_search(
+        CORPUS_COLLECTION, key, lambda: _search_corpus(query, query_embedding, k)
+    )
+
+
+# ─────────────────────────────
+# 2. Speculative prefetch
+# ─────────────────────────────
+def prefetch_context(query: str, query_embedding: Optional[List[float]]) -> dict:
+    """Runs the corpus and memory searches for a turn before its route is known."""
+    prefetched = {}
+    try:
+        prefetched["corpus"] = search_corpus(query, query_embedding, PREFETCH_CORPUS_K)
+    except Exception as e:
+        print(f"⚠️ Prefetch corpus search error: {e}")
+    try:
+        prefetched["memory"] = retrieve_memory(query, k=PREFETCH_MEMORY_K, query_embedding=query_embedding)
+    except Exception as e:
+        print(f"⚠️ Prefetch memory search error: {e}")
+    return prefetched
+
+
+async def aprefetch_context(query: str, query_embedding: Optional[List[float]]) -> dict:
+    """Async prefetch_context; the corpus and memory searches run concurrently."""
+    from langchain_core.runnables.config import run_in_executor
+    corpus, memory = await asyncio.gather(
+        run_in_executor(None, search_corpus, query, query_embedding, PREFETCH_CORPUS_K),
+        aretrieve_memory(query, k=PREFETCH_MEMORY_K, query_embedding=query_embedding),
+        return_exceptions=True,
+    )
+    prefetched = {}
+    if isinstance(corpus, Exception):
+        print(f"⚠️ Prefetch corpus search error: {corpus}")
+    else:
+        prefetched["corpus"] = corpus
+    if isinstance(memory, Exception):
+        print(f"⚠️ Prefetch memory search error: {memory}")
+    else:
+        prefetched["memory"] = memory
+    return prefetched
+
+
+# ─────────────────────────────
+# 3. Agent-side accessors
+# ─────────────────────────────
+def corpus_results(state: dict, query_embedding: Optional[List[float]], k: int) -> List[Tuple["Document", float]]:
+    """Top-k corpus chunks with scores, from the prefetch when it covers k."""
+    prefetched = (state.get("prefetched") or {}).get("corpus")
+    if prefetched is not None and k <= PREFETCH_CORPUS_K:
+        return prefetched[:k]
+    return search_corpus(state.get("input", ""), query_embedding, k)
+
+
+def memory_results(state: dict, query_embedding: Optional[List[float]], k: int) -> List[str]:
+    """Past conversation turns, from the prefetch when it was fetched with the same k."""
+    prefetched = (state.get("prefetched") or {}).get("memory")
+    if prefetched is not None and k == PREFETCH_MEMORY_K:
+        return prefetched
+    return retrieve_memory(state.get("input", ""), k=k, query_embedding=query_embedding)
+
+
+async def acorpus_results(state: dict, query_embedding: Optional[List[float]], k: int) -> List[Tuple["Document", float]]:
+    """Async corpus_results; a live search runs in the executor."""
+    from langchain_core.runnables.config import run_in_executor
+    prefetched = (state.get("prefetched") or {}).get("corpus")
+    if prefetched is not None and k <= PREFETCH_CORPUS_K:
+        return prefetched[:k]
+    return await run_in_executor(None, search_corpus, state.get("input", ""), query_embedding, k)
+
+
+async def amemory_results(state: dict, query_embedding: Optional[List[float]], k: int) -> List[str]:
+    """Async memory_results."""
+    prefetched = (state.get("prefetched") or {}).get("memory")
+    if prefetched is not None and k == PREFETCH_MEMORY_K:
+        return prefetched
+    return await aretrieve_memory(state.get("input", ""), k=k, query_embedding=query_embedding)
+
+
+__all__ = [
+    "PREFETCH_CORPUS_K",
+    "PREFETCH_MEMORY_K",
+    "hybrid_search",
+    "reciprocal_rank_fusion",
+    "search_corpus",
+    "prefetch_context",
+    "corpus_results",
+    "memory_results",
+    "aprefetch_context",
+    "acorpus_results",
+    "amemory_results",
+]
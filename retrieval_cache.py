@@ -0,0 +1,183 @@
+"""
+Retrieval result cache, invalidated by index generation.
+
+The same searches run again and again: repeat questions, and the fixed
+follow-up prompts every agent ends its answer with. Each one used to repeat
+the vector search and the SQLite document fetch. Results are cached per
+(collection, query key, k, filter), where the query key is a hash of the
+query vector, plus the normalised query text when the search is lexical too.
+
+Every collection has a generation marker file next to the Chroma data.
+Writers bump it: loader.upsert_with_retry / remove_stale_chunks for the
+corpus, and save_memory for the memory collection. Before each lookup the
+cache compares the marker with the one its entries were stored under, and
+drops that collection's entries when it has moved. A chat turn's memory
+write therefore never evicts cached corpus results. Because the marker is a
+file, a re-ingest by loader.py in another process invalidates the app's
+cache as well.
+"""
+
+import os
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+# ─────────────────────────────
+# 1. Settings
+# ─────────────────────────────
+RETRIEVAL_CACHE_ENABLED = os.getenv("RETRIEVAL_CACHE", "true").lower() == "true"
+RETRIEVAL_CACHE_MAX_ENTRIES = int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES", "1024"))
+# Same directory as vectorstores.CHROMA_DIR; not imported so loader.py stays light
+GENERATION_DIR = Path(os.getenv("CHROMA_DB_PATH", Path(__file__).parent / "chroma"))
+
+
+# ─────────────────────────────
+# 2. Index generations
+# ─────────────────────────────
+def _generation_file(collection: str) -> Path:
+    return GENERATION_DIR / f".generation-{collection}"
+
+
+def current_generation(collection: str) -> Tuple[int, int]:
+    """Identity of the collection's generation marker ((0, 0) before the first bump)."""
+    try:
+        stat = os.stat(_generation_file(collection))
+    except FileNotFoundError:
+        return (0, 0)
+    return (stat.st_ino, stat.st_mtime_ns)
+
+
+def bump_generation(collection: str) -> None:
+    """Marks the collection as changed; cached results for it become stale."""
+    path = _generation_file(collection)
+    try:
+        count = int(path.read_text() or 0) + 1
+    except (FileNotFoundError, ValueError):
+        count = 1
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # A fresh file per bump, so its (inode, mtime) differs from every earlier marker
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(str(count))
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"⚠️ Could not bump {collection} generation: {e}")
+
+
+# ─────────────────────────────
+# 3. Cache
+# ─────────────────────────────
+def _normalise(text: str) -> str:
+    return re.sub(r"\s+", " ", (text or "").strip().lower())
+
+
+def query_key(query_embedding=None, query: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+    """Hash of the query vector (float32 bytes) and/or the normalised query text."""
+    vector_hash = None
+    if query_embedding is not None:
+        vector_hash = hashlib.blake2b(
+            np.asarray(query_embedding, dtype=np.float32).tobytes(), digest_size=16
+        ).hexdigest()
+    return (vector_hash, _normalise(query) if query is not None else None)
+
+
+class RetrievalCache:
+    """LRU of search results, one generation per collection."""
+
+    def __init__(self, max_entries: int = RETRIEVAL_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, Hashable], List]" = OrderedDict()
+        self._generations: Dict[str, Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self.invalidations: Dict[str, int] = {}
+        self.saved_seconds = 0.0
+        self._miss_seconds: Dict[str, float] = {}
+
+    def _sync_generation(self, collection: str) -> None:
+        generation = current_generation(collection)
+        if self._generations.get(collection, generation) != generation:
+            stale = [key for key in self._entries if key[0] == collection]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations[collection] = self.invalidations.get(collection, 0) + 1
+        self._generations[collection] = generation
+
+    def get_or_search(self, collection: str, key: Hashable, search: Callable[[], List]) -> List:
+        """Cached results for key, running search() (outside the lock) on a miss."""
+        if not RETRIEVAL_CACHE_ENABLED:
+            return search()
+        entry_key = (collection, key)
+        with self._lock:
+            self._sync_generation(collection)
+            generation = self._generations[collection]
+            results = self._entries.get(entry_key)
+            if results is not None:
+                self._entries.move_to_end(entry_key)
+                self.hits[collection] = self.hits.get(collection, 0) + 1
+                self.saved_seconds += self._miss_seconds.get(collection, 0.0)
+                return list(results)
+            self.misses[collection] = self.misses.get(collection, 0) + 1
+
+        started = time.perf_counter()
+        results = search()
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            # Average live-search time, used to estimate the time hits save
+            previous = self._miss_seconds.get(collection)
+            self._miss_seconds[collection] = elapsed if previous is None else 0.9 * previous + 0.1 * elapsed
+            # Skip storing if the collection changed while we searched
+            if current_generation(collection) == generation:
+                self._entries[entry_key] = list(results)
+                self._entries.move_to_end(entry_key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return results
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def report(self) -> dict:
+        collections = sorted(set(self.hits) | set(self.misses))
+        per_collection = {}
+        for collection in collections:
+            hits, misses = self.hits.get(collection, 0), self.misses.get(collection, 0)
+            per_collection[collection] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+                "invalidations": self.invalidations.get(collection, 0),
+            }
+        return {
+            "enabled": RETRIEVAL_CACHE_ENABLED,
+            "entries": len(self._entries),
+            "collections": per_collection,
+            "estimated_saved_ms": round(self.saved_seconds * 1000, 1),
+        }
+
+
+retrieval_cache = RetrievalCache()
+
+
+def retrieval_cache_report() -> dict:
+    return retrieval_cache.report()
+
+
+__all__ = [
+    "RETRIEVAL_CACHE_ENABLED",
+    "RetrievalCache",
+    "bump_generation",
+    "current_generation",
+    "query_key",
+    "retrieval_cache",
+    "retrieval_cache_report",
+]
@@ -3,29 +3,56 @@ warnings.filterwarnings("ignore")
 
 import os
 from dotenv import load_dotenv
-from langchain_groq import ChatGroq
+from llm_client import lazy_chain
+from llm_guard import aguarded_invoke, guarded_invoke
+from embeddings import get_embeddings
+from intent_classifier import ROUTER_CONFIDENCE_THRESHOLD, get_intent_classifier
 
 # Load API tokens
 load_dotenv()
 groq_api_key = os.getenv("GROQ_API_KEY")
+# hybrid: local classifier first, LLM below the confidence threshold
+# local: local classifier only; llm: always ask Groq
+ROUTER_MODE = os.getenv("ROUTER_MODE", "hybrid").lower()
 
 # Use Groq if available, otherwise provide fallback
 if groq_api_key:
     # Use Groq for fast, reliable routing
-    router_llm = ChatGroq(
-        groq_api_key=groq_api_key,
-        model_name="llama-3.3-70b-versatile",  # Fast and accurate for classification
-        temperature=0.1,  # Low temperature for consistent classification
-        max_tokens=20   # Very short response needed for routing
-    )
+    # Shared pooled client (llm_client.py); only the call options are per agent
+    # Built on first LLM fallback: a confident local route never loads langchain_groq
+    router_llm = lazy_chain(temperature=0.1, max_tokens=20)  # Consistent, one-word classification
 else:
     # Fallback: Use a simple rule-based router for deployment
     print("⚠️ GROQ_API_KEY not found, using fallback routing")
     router_llm = None  # Will be handled in the routing function
 
-def router_node(query: str) -> str:
-    """Classifies user intent into qna, emotional, or suggestion using Groq"""
-    
+# Enhanced routing prompt with clear examples
+ROUTING_PROMPT_TEMPLATE = """You are a classifier. Classify this user input into exactly ONE category: qna, emotional, or suggestion.
+
+Examples:
+- "What is Empty Nest Syndrome?" → qna
+- "How do I cope with ENS?" → qna  
+- "Tell me about empty nest syndrome" → qna
+- "I feel sad today" → emotional
+- "I'm lonely and depressed" → emotional
+- "I miss my children" → emotional
+- "Can you suggest activities?" → suggestion
+- "Give me ways to feel better" → suggestion
+- "What should I do now?" → suggestion
+
+User input: "{query}"
+
+Respond with only one word: qna, emotional, or suggestion"""
+
+def local_route(query: str, query_embedding=None):
+    """Classifies with the local embedding classifier. Returns (intent, confidence)."""
+    if query_embedding is None:
+        query_embedding = get_embeddings().embed_query(query)
+    intent, confidence, _ = get_intent_classifier().classify(query_embedding)
+    return intent, confidence
+
+def _shortcut_route(query: str):
+    """Greetings and structured follow-up selections; None when neither matches."""
     query_lower = query.lower()
     greeting_keywords = ["hi", "hello", "hey", "good morning", "good afternoon", "good evening"]
     # Check if query is a short greeting or contains only greeting words
@@ -33,144 +60,186 @@ def router_node(query: str) -> str:
        any(query_lower.strip().startswith(keyword + " ") for keyword in greeting_keywords) or \
        any(query_lower.strip().endswith(" " + keyword) for keyword in greeting_keywords) or \
        "hi kotori" in query_lower or "hello kotori" in query_lower or "hey kotori" in query_lower:
-        print(f"✅ Routing '{query}' \u2192 welcome (greeting detected)")
+        print(f"✅ Routing '{query}' → welcome (greeting detected)")
         return "welcome"
         
     # Check for structured follow-up responses
     if "know more about empty nest" in query_lower or "tell me about empty nest" in query_lower:
-        print(f"✅ Routing '{query}' \u2192 qna (follow-up selection)")
+        print(f"✅ Routing '{query}' → qna (follow-up selection)")
         return "qna"
     elif "tell me how you are feeling" in query_lower or "how i am feeling" in query_lower or "how i feel" in query_lower:
-        print(f"✅ Routing '{query}' \u2192 emotional (follow-up selection)")
+        print(f"✅ Routing '{query}' → emotional (follow-up selection)")
         return "emotional"
     elif "suggest activities" in query_lower or "activities to help" in query_lower or "help me cope" in query_lower:
-        print(f"✅ Routing '{query}' \u2192 suggestion (follow-up selection)")
+        print(f"✅ Routing '{query}' → suggestion (follow-up selection)")
         return "suggestion"
+    return None
 
-    # Enhanced routing prompt with clear examples
-    routing_prompt = f"""You are a classifier. Classify this user input into exactly ONE category: qna, emotional, or suggestion.
+def _local_decision(query: str, query_embedding=None):
+    """Local embedding classifier: no network round-trip when it is confident."""
+    if ROUTER_MODE not in ("hybrid", "local"):
+        return None
+    try:
+        intent, confidence = local_route(query, query_embedding)
+        if ROUTER_MODE == "local" or confidence >= ROUTER_CONFIDENCE_THRESHOLD:
+            print(f"✅ Routing '{query}' → {intent} (local, confidence {confidence:.2f})")
+            return intent
+        print(f"🤔 Local router unsure ({intent}, {confidence:.2f}), asking Groq")
+    except Exception as e:
+        print(f"⚠️ Local router error: {e}")
+    return None
 
-Examples:
-- "What is Empty Nest Syndrome?" → qna
-- "How do I cope with ENS?" → qna  
-- "Tell me about empty nest syndrome" → qna
-- "I feel sad today" → emotional
-- "I'm lonely and depressed" → emotional
-- "I miss my children" → emotional
-- "Can you suggest activities?" → suggestion
-- "Give me ways to feel better" → suggestion
-- "What should I do now?" → suggestion
+def _use_llm() -> bool:
+    return router_llm is not None and ROUTER_MODE != "local"
 
-User input: "{query}"
+def _intent_from_llm(result):
+    """Extracts qna/emotional/suggestion from the Groq reply; None if unclear."""
+    # Extract response from ChatGroq
+    if hasattr(result, 'content'):
+        response = result.content.strip().lower()
+    else:
+        response = str(result).strip().lower()
+    
+    print(f"🤖 Groq raw response: '{response}'")
+    
+    # Extract the classification from response
+    if "emotional" in response:
+        return "emotional"
+    elif "suggestion" in response:
+        return "suggestion"
+    elif "qna" in response:
+        return "qna"
+    return None  # Will use fallback
 
-Respond with only one word: qna, emotional, or suggestion"""
+def _keyword_route(query: str) -> str:
+    """Fallback logic when Groq is unavailable or unclear."""
+    # Enhanced fallback logic based on keywords
+    query_lower = query.lower()
+    
+    # Emotional keywords (expanded)
+    emotional_keywords = [
+        "feel", "feeling", "sad", "lonely", "depressed", "upset", "cry", "crying", 
+        "miss", "missing", "empty", "hurt", "hurting", "alone", "abandoned", 
+        "lost", "grief", "mourn", "devastated", "heartbroken", "anxious", 
+        "worried", "scared", "afraid", "overwhelmed", "helpless"
+    ]
+    
+    # Suggestion keywords (expanded)
+    suggestion_keywords = [
+        "suggest", "suggestion", "recommend", "recommendation", "help me", 
+        "what can i do", "what should i do", "how to", "ways to", "tips", 
+        "advice", "ideas", "activities", "hobbies", "cope", "coping", 
+        "deal with", "handle", "manage", "overcome"
+    ]
+    
+    # QnA keywords (expanded)
+    qna_keywords = [
+        "what is", "what are", "explain", "define", "tell me about", 
+        "how does", "why", "when", "where", "who", "definition", 
+        "meaning", "understand", "learn", "know about"
+    ]
+    
+    # Check emotional first (highest priority for support)
+    if any(keyword in query_lower for keyword in emotional_keywords):
+        return "emotional"
+    # Then check for suggestions
+    elif any(keyword in query_lower for keyword in suggestion_keywords):
+        return "suggestion"
+    # Then check for QnA
+    elif any(keyword in query_lower for keyword in qna_keywords):
+        return "qna"
+    else:
+        # Smart default based on query structure
+        if "?" in query and any(word in query_lower for word in ["what", "how", "why", "when", "where"]):
+            return "qna"
+        else:
+            return "qna"  # Safe default
+
+def _error_route(query: str) -> str:
+    """Robust keyword-based fallback after a Groq error."""
+    query_lower = query.lower()
+    
+    # Prioritize emotional support
+    if any(word in query_lower for word in ["feel", "sad", "lonely", "depressed", "upset", "miss", "hurt", "alone"]):
+        fallback_intent = "emotional"
+    elif any(word in query_lower for word in ["suggest", "recommend", "help me", "ways to", "tips", "advice", "what can i do"]):
+        fallback_intent = "suggestion"
+    else:
+        fallback_intent = "qna"
+    
+    print(f"🔄 Using fallback routing: {fallback_intent}")
+    return fallback_intent
+
+def router_node(query: str, query_embedding=None) -> str:
+    """
+    Classifies user intent into qna, emotional, or suggestion. The local
+    embedding classifier answers when confident; Groq handles the rest.
+    """
+    intent = _shortcut_route(query) or _local_decision(query, query_embedding)
+    if intent:
+        return intent
 
     try:
         print(f"🔀 Routing query: '{query[:50]}...' ")
         
         # Use Groq if available, otherwise use fallback logic
-        if router_llm is not None:
-            # Call Groq for classification
-            result = router_llm.invoke(routing_prompt)
-            
-            # Extract response from ChatGroq
-            if hasattr(result, 'content'):
-                response = result.content.strip().lower()
-            else:
-                response = str(result).strip().lower()
-            
-            print(f"🤖 Groq raw response: '{response}'")
-            
-            # Extract the classification from response
-            if "emotional" in response:
-                intent = "emotional"
-            elif "suggestion" in response:
-                intent = "suggestion"
-            elif "qna" in response:
-                intent = "qna"
-            else:
-                intent = None  # Will use fallback below
+        intent = None
+        if _use_llm():
+            # Budgeted + breaker-guarded; a timeout or open breaker lands in _error_route
+            intent = _intent_from_llm(guarded_invoke(router_llm, ROUTING_PROMPT_TEMPLATE.format(query=query), agent="router"))
         else:
             print("⚠️ Using fallback routing (no Groq API key)")
-            intent = None  # Use fallback logic
-        
-        # Fallback logic when Groq is unavailable or unclear
-        if intent is None:
-            # Enhanced fallback logic based on keywords
-            query_lower = query.lower()
-            
-            # Emotional keywords (expanded)
-            emotional_keywords = [
-                "feel", "feeling", "sad", "lonely", "depressed", "upset", "cry", "crying", 
-                "miss", "missing", "empty", "hurt", "hurting", "alone", "abandoned", 
-                "lost", "grief", "mourn", "devastated", "heartbroken", "anxious", 
-                "worried", "scared", "afraid", "overwhelmed", "helpless"
-            ]
-            
-            # Suggestion keywords (expanded)
-            suggestion_keywords = [
-                "suggest", "suggestion", "recommend", "recommendation", "help me", 
-                "what can i do", "what should i do", "how to", "ways to", "tips", 
-                "advice", "ideas", "activities", "hobbies", "cope", "coping", 
-                "deal with", "handle", "manage", "overcome"
-            ]
-            
-            # QnA keywords (expanded)
-            qna_keywords = [
-                "what is", "what are", "explain", "define", "tell me about", 
-                "how does", "why", "when", "where", "who", "definition", 
-                "meaning", "understand", "learn", "know about"
-            ]
-            
-            # Check emotional first (highest priority for support)
-            if any(keyword in query_lower for keyword in emotional_keywords):
-                intent = "emotional"
-            # Then check for suggestions
-            elif any(keyword in query_lower for keyword in suggestion_keywords):
-                intent = "suggestion"
-            # Then check for QnA
-            elif any(keyword in query_lower for keyword in qna_keywords):
-                intent = "qna"
-            else:
-                # Smart default based on query structure
-                if "?" in query and any(word in query_lower for word in ["what", "how", "why", "when", "where"]):
-                    intent = "qna"
-                else:
-                    intent = "qna"  # Safe default
         
+        intent = intent or _keyword_route(query)
         print(f"✅ Routing '{query}' → {intent}")
         return intent
     except Exception as e:
         print(f"❌ Groq routing error: {e}")
-        
-        # Robust keyword-based fallback
-        query_lower = query.lower()
-        
-        # Prioritize emotional support
-        if any(word in query_lower for word in ["feel", "sad", "lonely", "depressed", "upset", "miss", "hurt", "alone"]):
-            fallback_intent = "emotional"
-        elif any(word in query_lower for word in ["suggest", "recommend", "help me", "ways to", "tips", "advice", "what can i do"]):
-            fallback_intent = "suggestion"
+        return _error_route(query)
+
+async def arouter_node(query: str, query_embedding=None) -> str:
+    """Async router_node: same decisions, with the Groq call awaited instead of blocking."""
+    intent = _shortcut_route(query)
+    if intent:
+        return intent
+    if query_embedding is None and ROUTER_MODE in ("hybrid", "local"):
+        try:
+            query_embedding = await get_embeddings().aembed_query(query)
+        except Exception as e:
+            print(f"⚠️ Query embedding error: {e}")
+    intent = _local_decision(query, query_embedding)
+    if intent:
+        return intent
+
+    try:
+        print(f"🔀 Routing query: '{query[:50]}...' ")
+        intent = None
+        if _use_llm():
+            intent = _intent_from_llm(await aguarded_invoke(router_llm, ROUTING_PROMPT_TEMPLATE.format(query=query), agent="router"))
         else:
-            fallback_intent = "qna"
-        
-        print(f"🔄 Using fallback routing: {fallback_intent}")
-        return fallback_intent
+            print("⚠️ Using fallback routing (no Groq API key)")
+
+        intent = intent or _keyword_route(query)
+        print(f"✅ Routing '{query}' → {intent}")
+        return intent
+    except Exception as e:
+        print(f"❌ Groq routing error: {e}")
+        return _error_route(query)
 
 # Test function for debugging
+ROUTER_TEST_CASES = [
+    ("What is Empty Nest Syndrome?", "qna"),
+    ("I feel so sad and lonely", "emotional"),
+    ("Can you suggest some activities?", "suggestion"),
+    ("How do I cope with my children leaving?", "suggestion"),
+    ("I miss my kids so much", "emotional"),
+    ("Tell me about ENS symptoms", "qna")
+]
+
 def test_router():
     """Test the router with various inputs"""
-    test_cases = [
-        ("What is Empty Nest Syndrome?", "qna"),
-        ("I feel so sad and lonely", "emotional"),
-        ("Can you suggest some activities?", "suggestion"),
-        ("How do I cope with my children leaving?", "suggestion"),
-        ("I miss my kids so much", "emotional"),
-        ("Tell me about ENS symptoms", "qna")
-    ]
-    
-    print("🧪 Testing Groq Router...")
-    for query, expected in test_cases:
+    print(f"🧪 Testing Router (mode: {ROUTER_MODE})...")
+    for query, expected in ROUTER_TEST_CASES:
         try:
             result = router_node(query)
             status = "✅" if result == expected else "⚠️"
@@ -178,7 +247,7 @@ def test_router():
         except Exception as e:
             print(f"❌ Test failed for '{query}': {e}")
 
-__all__ = ["router_node", "test_router"]
+__all__ = ["ROUTER_TEST_CASES", "ROUTING_PROMPT_TEMPLATE", "local_route", "router_node", "arouter_node", "test_router"]
 
 if __name__ == "__main__":
     test_router()
\ No newline at end of file
@@ -0,0 +1,170 @@
+"""
+Semantic response cache in front of the agents.
+
+Many users ask the same questions ("What is Empty Nest Syndrome?", the quick
+query buttons), and each one used to pay for a router call and an agent LLM
+call. Once the turn's query embedding exists, the graph looks for a cached
+(query embedding, agent, response) entry whose cosine similarity passes that
+agent's threshold. On a hit it returns the cached response and skips routing,
+retrieval and generation. Only full LLM answers from opted-in agents are
+stored (SEMANTIC_CACHE_AGENTS). Entries expire after a TTL, and the least
+recently used entry is evicted when the cache is full. Emotional answers are
+more personal, so they have a stricter default threshold.
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# ─────────────────────────────
+# 1. Settings
+# ─────────────────────────────
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE", "true").lower() == "true"
+SEMANTIC_CACHE_AGENTS = [
+    agent.strip() for agent in os.getenv("SEMANTIC_CACHE_AGENTS", "qna,suggestion").split(",") if agent.strip()
+]
+_DEFAULT_THRESHOLDS = {"qna": 0.93, "suggestion": 0.93, "emotional": 0.97, "welcome": 0.95}
+SEMANTIC_CACHE_THRESHOLDS: Dict[str, float] = {
+    agent: float(os.getenv(f"SEMANTIC_CACHE_THRESHOLD_{agent.upper()}", default))
+    for agent, default in _DEFAULT_THRESHOLDS.items()
+}
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "3600"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "500"))
+
+
+@dataclass
+class CacheEntry:
+    query: str
+    agent: str
+    response: str
+    embedding: np.ndarray  # unit length
+    created_at: float
+    hits: int = 0
+
+
+def _unit(vector) -> Optional[np.ndarray]:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(array))
+    return array / norm if norm else None
+
+
+# ─────────────────────────────
+# 2. Cache
+# ─────────────────────────────
+class SemanticCache:
+    """In-process cosine-similarity cache with TTL expiry and LRU eviction."""
+
+    def __init__(
+        self,
+        agents: List[str] = SEMANTIC_CACHE_AGENTS,
+        thresholds: Dict[str, float] = SEMANTIC_CACHE_THRESHOLDS,
+        ttl: float = SEMANTIC_CACHE_TTL_SECONDS,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+    ):
+        self.agents = set(agents)
+        self.thresholds = dict(thresholds)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, CacheEntry]" = OrderedDict()  # oldest use first
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.agent_hits: Dict[str, int] = {}
+
+    def threshold(self, agent: str) -> float:
+        return self.thresholds.get(agent, 0.95)
+
+    def _expire(self, now: float) -> None:
+        expired = [key for key, entry in self._entries.items() if now - entry.created_at > self.ttl]
+        for key in expired:
+            del self._entries[key]
+        self.expirations += len(expired)
+
+    def lookup(self, embedding) -> Optional[dict]:
+        """
+        Best live entry whose similarity passes its agent's threshold, as
+        {"query", "agent", "response", "similarity"}; None on a miss.
+        """
+        query = _unit(embedding) if embedding is not None else None
+        with self._lock:
+            self.lookups += 1
+            self._expire(time.monotonic())
+            if query is None or not self._entries:
+                return None
+            keys = list(self._entries)
+            similarities = np.stack([self._entries[key].embedding for key in keys]) @ query
+            best_key, best_similarity = None, -1.0
+            for key, similarity in zip(keys, similarities):
+                entry = self._entries[key]
+                if similarity >= self.threshold(entry.agent) and similarity > best_similarity:
+                    best_key, best_similarity = key, float(similarity)
+            if best_key is None:
+                return None
+            entry = self._entries[best_key]
+            self._entries.move_to_end(best_key)
+            entry.hits += 1
+            self.hits += 1
+            self.agent_hits[entry.agent] = self.agent_hits.get(entry.agent, 0) + 1
+            return {"query": entry.query, "agent": entry.agent, "response": entry.response,
+                    "similarity": min(best_similarity, 1.0)}
+
+    def store(self, query: str, embedding, agent: str, response: str) -> bool:
+        """Adds a response for an opted-in agent; returns False when it was not cached."""
+        if agent not in self.agents or embedding is None or not response:
+            return False
+        vector = _unit(embedding)
+        if vector is None:
+            return False
+        with self._lock:
+            self._entries[self._next_id] = CacheEntry(query, agent, response, vector, time.monotonic())
+            self._next_id += 1
+            self.stores += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def report(self) -> dict:
+        return {
+            "enabled": SEMANTIC_CACHE_ENABLED,
+            "agents": sorted(self.agents),
+            "entries": len(self._entries),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "misses": self.lookups - self.hits,
+            "hit_rate": round(self.hits / self.lookups, 3) if self.lookups else 0.0,
+            "hits_by_agent": dict(self.agent_hits),
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+response_cache = SemanticCache()
+
+
+def cache_report() -> dict:
+    return response_cache.report()
+
+
+__all__ = [
+    "SEMANTIC_CACHE_AGENTS",
+    "SEMANTIC_CACHE_ENABLED",
+    "SEMANTIC_CACHE_THRESHOLDS",
+    "SemanticCache",
+    "cache_report",
+    "response_cache",
+]
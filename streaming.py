@@ -0,0 +1,145 @@
+"""
+Token streaming from the agents to the UI.
+
+Agents generate with `stream_llm`, which runs their chain with `.stream` and
+forwards every token to LangGraph's custom stream. `stream_turn` runs the
+graph in stream mode and yields those tokens as they arrive, followed by the
+final state, whose response has been through the agent's usual format and
+fallback checks. Time-to-first-token is measured on both sides: per LLM call
+inside the agent, and per turn from the caller's point of view.
+"""
+
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterator, Optional
+
+from llm_client import connection_stats
+from llm_guard import aguarded_stream, guarded_stream
+
+
+# ─────────────────────────────
+# 1. Agent side
+# ─────────────────────────────
+def _writer():
+    """LangGraph's custom stream writer, or None outside a graph run."""
+    try:
+        from langgraph.config import get_stream_writer
+        return get_stream_writer()
+    except Exception:
+        return None
+
+
+class _TokenSink:
+    """Collects streamed chunks, forwards them to the graph stream and times the first one."""
+
+    def __init__(self, agent: str):
+        self.agent = agent
+        self.writer = _writer()
+        self.started = time.perf_counter()
+        self.first_token_at = None
+        self.parts = []
+
+    def add(self, chunk) -> None:
+        text = chunk.content if hasattr(chunk, "content") else str(chunk)
+        if not text:
+            return
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.parts.append(text)
+        if self.writer:
+            self.writer({"type": "token", "agent": self.agent, "text": text})
+
+    def text(self) -> str:
+        if self.first_token_at is not None:
+            print(f"⚡ {self.agent} LLM first token after {(self.first_token_at - self.started) * 1000:.0f} ms, "
+                  f"done after {(time.perf_counter() - self.started) * 1000:.0f} ms")
+        return "".join(self.parts)
+
+
+def stream_llm(chain, inputs: dict, agent: str) -> str:
+    """
+    Runs chain.stream(inputs), emitting {"type": "token", "agent", "text"}
+    events to the graph stream, and returns the full generated text. The call
+    is subject to the agent's latency budget and the circuit breaker
+    (llm_guard.py); both raise, so the agent's fallback text takes over.
+    """
+    sink = _TokenSink(agent)
+    guarded_stream(chain, inputs, agent, sink.add)
+    return sink.text()
+
+
+async def astream_llm(chain, inputs: dict, agent: str) -> str:
+    """Async stream_llm built on chain.astream."""
+    sink = _TokenSink(agent)
+    await aguarded_stream(chain, inputs, agent, sink.add)
+    return sink.text()
+
+
+# ─────────────────────────────
+# 2. Caller side
+# ─────────────────────────────
+@dataclass
+class TurnMetrics:
+    """Caller-side latency of one streamed turn."""
+    ttft_ms: Optional[float] = None   # None when no token was streamed (e.g. canned fallback)
+    total_ms: float = 0.0
+    tokens: int = 0
+    llm_requests: int = 0      # Groq HTTP requests during the turn (all sessions, when concurrent)
+    new_connections: int = 0   # of which opened a fresh connection instead of reusing the pool
+
+
+class _TurnTracker:
+    """Turns raw graph stream items into token events plus a final event."""
+
+    def __init__(self, state: dict):
+        self.started = time.perf_counter()
+        self.metrics = TurnMetrics()
+        self.final_state = dict(state)
+        self.connections_before = connection_stats.snapshot()
+
+    def handle(self, mode, chunk) -> Optional[dict]:
+        if mode == "values":
+            self.final_state = chunk
+        elif isinstance(chunk, dict) and chunk.get("type") == "token":
+            if self.metrics.ttft_ms is None:
+                self.metrics.ttft_ms = (time.perf_counter() - self.started) * 1000
+            self.metrics.tokens += 1
+            return chunk
+        return None
+
+    def final(self) -> dict:
+        metrics = self.metrics
+        metrics.total_ms = (time.perf_counter() - self.started) * 1000
+        connections = connection_stats.snapshot().since(self.connections_before)
+        metrics.llm_requests, metrics.new_connections = connections.requests, connections.connections_opened
+        ttft = f"{metrics.ttft_ms:.0f} ms" if metrics.ttft_ms is not None else "n/a"
+        print(f"⚡ Turn TTFT {ttft}, total {metrics.total_ms:.0f} ms, {metrics.tokens} streamed chunks, "
+              f"{metrics.llm_requests} LLM requests / {metrics.new_connections} new connections")
+        return {"type": "final", "state": self.final_state, "metrics": metrics}
+
+
+def stream_turn(graph, state: dict) -> Iterator[dict]:
+    """
+    Streams one turn through the graph. Yields token events
+    ({"type": "token", "agent", "text"}) while the agent generates, then a
+    single {"type": "final", "state", "metrics"} event.
+    """
+    tracker = _TurnTracker(state)
+    for mode, chunk in graph.stream(state, stream_mode=["custom", "values"]):
+        event = tracker.handle(mode, chunk)
+        if event:
+            yield event
+    yield tracker.final()
+
+
+async def astream_turn(graph, state: dict) -> AsyncIterator[dict]:
+    """Async stream_turn over graph.astream; same events."""
+    tracker = _TurnTracker(state)
+    async for mode, chunk in graph.astream(state, stream_mode=["custom", "values"]):
+        event = tracker.handle(mode, chunk)
+        if event:
+            yield event
+    yield tracker.final()
+
+
+__all__ = ["TurnMetrics", "stream_llm", "astream_llm", "stream_turn", "astream_turn"]
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Checks that a half-open probe that never finishes cannot wedge the circuit breaker.
+
+The breaker is opened with one failing call. After the cool-down, the probe
+is cancelled (async) or fails outside the LLM call (sync). A later call must
+still reach the LLM, and its success must close the breaker again.
+"""
+
+import time
+import asyncio
+
+import llm_guard
+from llm_guard import CircuitBreaker, CircuitOpenError, aguarded_invoke, guarded_invoke
+
+COOLDOWN = 0.1
+
+
+class FakeChain:
+    def __init__(self, chunks=("hello",), fail=False, delay=0.0):
+        self.chunks = chunks
+        self.fail = fail
+        self.delay = delay
+
+    def stream(self, inputs):
+        time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("groq down")
+        yield from self.chunks
+
+    async def astream(self, inputs):
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("groq down")
+        for chunk in self.chunks:
+            yield chunk
+
+
+def _open_breaker():
+    llm_guard.breaker = CircuitBreaker(failure_threshold=1, cooldown=COOLDOWN)
+    try:
+        guarded_invoke(FakeChain(fail=True), "hi", "router")
+    except ConnectionError:
+        pass
+    assert llm_guard.breaker.state == "open", llm_guard.breaker.report()
+    time.sleep(COOLDOWN * 1.5)
+
+
+async def _cancelled_async_probe():
+    _open_breaker()
+    probe = asyncio.ensure_future(aguarded_invoke(FakeChain(delay=5), "hi", "router"))
+    await asyncio.sleep(0.05)
+    assert llm_guard.breaker.state == "half_open"
+    probe.cancel()
+    try:
+        await probe
+    except asyncio.CancelledError:
+        pass
+    return await aguarded_invoke(FakeChain(), "hi", "router")
+
+
+def _crashed_sync_probe():
+    _open_breaker()
+
+    def on_chunk(chunk):
+        raise KeyboardInterrupt  # e.g. the UI consumer going away mid-stream
+
+    try:
+        llm_guard.guarded_stream(FakeChain(), "hi", "router", on_chunk)
+    except KeyboardInterrupt:
+        pass
+    return guarded_invoke(FakeChain(), "hi", "router")
+
+
+print("🧪 Testing circuit breaker probe release...")
+
+for name, run in [("async cancelled probe", lambda: asyncio.run(_cancelled_async_probe())),
+                  ("sync interrupted probe", _crashed_sync_probe)]:
+    try:
+        reply = run()
+    except CircuitOpenError:
+        raise AssertionError(f"{name}: breaker stuck {llm_guard.breaker.report()}")
+    assert reply == "hello", reply
+    assert llm_guard.breaker.state == "closed", llm_guard.breaker.report()
+    print(f"✅ {name}: next call went through and closed the breaker")
+
+print("✅ Test completed successfully!")
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Checks that keyword fallbacks never reach the semantic cache.
+
+Each agent's sync and async node runs with a canned LLM reply, once too
+short (the agent swaps in a keyword fallback) and once a full answer. Only
+the full answer may be stored by cache_store_node. Retrieval, memory and the
+Groq stream are replaced in the agent modules, so no model or API is needed.
+"""
+
+import os
+import asyncio
+
+os.environ.setdefault("GROQ_API_KEY", "test-placeholder")  # the agents refuse to import without one
+os.environ["SEMANTIC_CACHE"] = "true"
+os.environ["SEMANTIC_CACHE_AGENTS"] = "qna,suggestion,emotional"
+
+import qna_agent
+import emotional_agent
+import suggestion_agent
+from kotori_graph import cache_store_node
+from semantic_cache import cache_report, response_cache
+
+SHORT_REPLY = "short"
+FULL_REPLY = "• Empty Nest Syndrome is the sadness many parents feel when their children leave home."
+
+AGENTS = [
+    (qna_agent, qna_agent.qna_node, qna_agent.aqna_node),
+    (emotional_agent, emotional_agent.emotional_checkin_node, emotional_agent.aemotional_checkin_node),
+    (suggestion_agent, suggestion_agent.suggestion_node, suggestion_agent.asuggestion_node),
+]
+
+
+class _Doc:
+    page_content = "Empty Nest Syndrome is a feeling of grief parents may feel when their children leave home."
+
+
+def _offline(module, reply: str) -> None:
+    """Points the agent module's retrieval, memory and LLM stream at canned values."""
+    async def areturn(value):
+        return value
+
+    module.corpus_results = lambda *args, **kwargs: [(_Doc(), 0.9)]
+    module.acorpus_results = lambda *args, **kwargs: areturn([(_Doc(), 0.9)])
+    module.memory_results = lambda *args, **kwargs: []
+    module.amemory_results = lambda *args, **kwargs: areturn([])
+    module.save_memory = lambda *args, **kwargs: None
+    module.asave_memory = lambda *args, **kwargs: areturn(None)
+    module.stream_llm = lambda *args, **kwargs: reply
+    module.astream_llm = lambda *args, **kwargs: areturn(reply)
+
+
+def _stores_after(node, module, reply: str, is_async: bool) -> int:
+    _offline(module, reply)
+    before = cache_report()["stores"]
+    state = {"input": "What is empty nest syndrome?", "query_embedding": [1.0, 0.0, 0.0], "cache_hit": None}
+    state = asyncio.run(node(state)) if is_async else node(state)
+    cache_store_node(state)
+    response_cache.clear()
+    return cache_report()["stores"] - before
+
+
+print("🧪 Testing semantic cache stores...")
+
+failures = 0
+for module, sync_node, async_node in AGENTS:
+    for node, is_async in ((sync_node, False), (async_node, True)):
+        name = node.__name__
+        short_stores = _stores_after(node, module, SHORT_REPLY, is_async)
+        full_stores = _stores_after(node, module, FULL_REPLY, is_async)
+        if short_stores == 0 and full_stores == 1:
+            print(f"✅ {name}: keyword fallback not cached, full answer cached")
+        else:
+            failures += 1
+            print(f"❌ {name}: stores after short reply {short_stores}, after full reply {full_stores}")
+
+assert failures == 0, f"{failures} node(s) cached a keyword fallback or skipped a full answer"
+print("✅ Test completed successfully!")
@@ -0,0 +1,242 @@
+"""
+In-process corpus index served from a memory-mapped snapshot.
+
+`export_index` copies the corpus collection (vectors, ids, chunk texts and
+metadata) out of Chroma into a new snapshot directory of flat files
+(index/vectors-<ns>/, published atomically; see index_snapshots.py):
+
+    vectors.npy        float32 [n, dim], unit-length rows
+    texts.bin          UTF-8 chunk texts, back to back
+    text_offsets.npy   int64 [n + 1] byte offsets into texts.bin
+    meta.json          ids, metadatas, model name, dimension
+    faiss.index        IndexFlatIP (only with VECTOR_INDEX_KIND=faiss)
+
+`MmapIndex` opens the snapshot read-only with mmap. Pages live in the OS page
+cache, so every worker process that opens the same snapshot shares them
+zero-copy instead of each loading its own Chroma client. Search is an exact
+inner product over the mapped vectors (FAISS when requested and installed),
+which is the same flat scan a small corpus gets from Chroma, minus SQLite.
+`get_mmap_index` reopens the index when a newer snapshot is published.
+
+Enable it with RETRIEVAL_BACKEND=mmap (see vectorstores.get_corpus_index).
+"""
+
+import os
+import json
+import mmap
+import time
+import threading
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from index_snapshots import current_snapshot, new_snapshot_dir, publish_snapshot, snapshot_version
+
+# ─────────────────────────────
+# 1. Settings
+# ─────────────────────────────
+VECTOR_INDEX_DIR = Path(os.getenv("VECTOR_INDEX_DIR", Path(__file__).parent / "index"))
+VECTOR_INDEX_KIND = os.getenv("VECTOR_INDEX_KIND", "numpy").lower()  # numpy | faiss
+EXPORT_BATCH_SIZE = 1000
+
+_VECTORS = "vectors.npy"
+_TEXTS = "texts.bin"
+_OFFSETS = "text_offsets.npy"
+_META = "meta.json"
+_FAISS = "faiss.index"
+SNAPSHOT_KIND = "vectors"
+
+
+# ─────────────────────────────
+# 2. Export from Chroma
+# ─────────────────────────────
+def export_index(out_dir: Path = VECTOR_INDEX_DIR, kind: str = VECTOR_INDEX_KIND) -> int:
+    """Writes the corpus collection to a memory-mappable snapshot and publishes it; returns the chunk count."""
+    from vectorstores import CORPUS_COLLECTION, get_corpus_store
+    from embeddings import EMBEDDING_MODEL_NAME
+    from retrieval_cache import bump_generation
+
+    started = time.perf_counter()
+    out_dir = Path(out_dir)
+    snapshot = new_snapshot_dir(out_dir, SNAPSHOT_KIND)
+    collection = get_corpus_store()._collection
+
+    ids, metadatas, texts, vectors = [], [], [], []
+    offset = 0
+    while True:
+        page = collection.get(
+            include=["embeddings", "documents", "metadatas"], limit=EXPORT_BATCH_SIZE, offset=offset
+        )
+        page_ids = page.get("ids") or []
+        if not page_ids:
+            break
+        ids.extend(page_ids)
+        metadatas.extend(page.get("metadatas") or [{}] * len(page_ids))
+        texts.extend(text or "" for text in page["documents"])
+        vectors.extend(page["embeddings"])
+        offset += len(page_ids)
+
+    matrix = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1) if ids else np.zeros((0, 0), np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True) if len(matrix) else None
+    if norms is not None:
+        matrix = matrix / np.where(norms == 0, 1, norms)
+
+    encoded = [text.encode("utf-8") for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    if encoded:
+        offsets[1:] = np.cumsum([len(blob) for blob in encoded])
+
+    np.save(snapshot / _VECTORS, matrix)
+    with open(snapshot / _TEXTS, "wb") as handle:
+        for blob in encoded:
+            handle.write(blob)
+    np.save(snapshot / _OFFSETS, offsets)
+
+    if kind == "faiss":
+        import faiss
+        index = faiss.IndexFlatIP(matrix.shape[1] if len(matrix) else 1)
+        if len(matrix):
+            index.add(matrix)
+        faiss.write_index(index, str(snapshot / _FAISS))
+
+    meta = {
+        "collection": CORPUS_COLLECTION,
+        "model_name": EMBEDDING_MODEL_NAME,
+        "count": len(ids),
+        "dim": int(matrix.shape[1]) if len(matrix) else 0,
+        "kind": kind,
+        "created_at": time.time(),
+        "ids": ids,
+        "metadatas": metadatas,
+    }
+    with open(snapshot / _META, "w", encoding="utf-8") as handle:
+        json.dump(meta, handle)
+
+    publish_snapshot(out_dir, SNAPSHOT_KIND, snapshot)
+    # Bumped after the publish, so cached results are never refilled from the old snapshot
+    bump_generation(CORPUS_COLLECTION)
+
+    print(f"🗜️ Exported {len(ids)} corpus chunks to {snapshot} ({kind}) in {time.perf_counter() - started:.2f}s")
+    return len(ids)
+
+
+# ─────────────────────────────
+# 3. Memory-mapped index
+# ─────────────────────────────
+class MmapIndex:
+    """
+    Read-only corpus index over a snapshot from export_index. Exposes the
+    subset of the Chroma store API the agents use, with the same scores
+    (squared L2 distance between unit vectors, lower is closer).
+    """
+
+    def __init__(self, index_dir: Optional[Path] = None):
+        index_dir = Path(index_dir) if index_dir else current_snapshot(VECTOR_INDEX_DIR, SNAPSHOT_KIND)
+        self.index_dir = index_dir
+        with open(index_dir / _META, encoding="utf-8") as handle:
+            self.meta = json.load(handle)
+        self.ids: List[str] = self.meta["ids"]
+        self.metadatas: List[dict] = self.meta["metadatas"]
+        self._rows_by_id = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+        self.vectors = np.load(index_dir / _VECTORS, mmap_mode="r")
+        self.offsets = np.load(index_dir / _OFFSETS, mmap_mode="r")
+        self._texts_file = open(index_dir / _TEXTS, "rb")
+        self._texts = (
+            mmap.mmap(self._texts_file.fileno(), 0, access=mmap.ACCESS_READ) if self.offsets[-1] else b""
+        )
+        self.faiss_index = None
+        if self.meta.get("kind") == "faiss" and (index_dir / _FAISS).exists():
+            self.faiss_index = self._load_faiss(index_dir / _FAISS)
+
+        from embeddings import EMBEDDING_MODEL_NAME
+        if self.meta.get("model_name") != EMBEDDING_MODEL_NAME:
+            print(f"⚠️ Index {index_dir} was built with {self.meta.get('model_name')}, "
+                  f"queries use {EMBEDDING_MODEL_NAME}; re-run the export")
+
+    @staticmethod
+    def _load_faiss(path: Path):
+        try:
+            import faiss
+            return faiss.read_index(str(path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except Exception as e:
+            print(f"⚠️ Could not mmap FAISS index ({e}), using the NumPy scan")
+            return None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def text(self, position: int) -> str:
+        start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+        return self._texts[start:end].decode("utf-8")
+
+    def search(self, query_embedding, k: int = 4) -> List[Tuple[int, float]]:
+        """(row, cosine similarity) of the k nearest chunks, best first."""
+        if not len(self.ids) or query_embedding is None:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        k = min(k, len(self.ids))
+        if self.faiss_index is not None:
+            scores, rows = self.faiss_index.search(query.reshape(1, -1), k)
+            return [(int(row), float(score)) for row, score in zip(rows[0], scores[0]) if row >= 0]
+        scores = self.vectors @ query
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(row), float(scores[row])) for row in top]
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k: int = 4) -> List[Tuple[Document, float]]:
+        results = []
+        for row, similarity in self.search(embedding, k):
+            metadata = dict(self.metadatas[row] or {})
+            metadata.setdefault("id", self.ids[row])
+            results.append((Document(id=self.ids[row], page_content=self.text(row), metadata=metadata), 2.0 - 2.0 * similarity))
+        return results
+
+    def get_by_ids(self, ids: List[str]) -> List[Document]:
+        docs = []
+        for chunk_id in ids:
+            row = self._rows_by_id.get(chunk_id)
+            if row is not None:
+                docs.append(Document(id=chunk_id, page_content=self.text(row), metadata=dict(self.metadatas[row] or {})))
+        return docs
+
+    def similarity_search_by_vector(self, embedding, k: int = 4) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_relevance_scores(embedding, k)]
+
+
+_index: Optional[MmapIndex] = None
+_index_version = None
+_lock = threading.Lock()
+
+
+def get_mmap_index() -> MmapIndex:
+    """The process-wide snapshot index, opened on first use and reopened after each new export."""
+    global _index, _index_version
+    version = snapshot_version(VECTOR_INDEX_DIR, SNAPSHOT_KIND)
+    if _index is None or version != _index_version:
+        with _lock:
+            if _index is None or version != _index_version:
+                # Searches already holding the old index finish on its mapping
+                _index = MmapIndex()
+                _index_version = version
+                print(f"🗺️ Mapped corpus index {_index.index_dir} ({len(_index)} chunks)")
+    return _index
+
+
+__all__ = [
+    "VECTOR_INDEX_DIR",
+    "VECTOR_INDEX_KIND",
+    "MmapIndex",
+    "export_index",
+    "get_mmap_index",
+]
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Export the Chroma corpus to a memory-mapped index")
+    parser.add_argument("--out", default=str(VECTOR_INDEX_DIR))
+    parser.add_argument("--kind", choices=["numpy", "faiss"], default=VECTOR_INDEX_KIND)
+    args = parser.parse_args()
+    export_index(Path(args.out), args.kind)
@@ -0,0 +1,124 @@
+"""
+Chroma collections for Kotori.ai.
+
+The PDF corpus and conversational memory live in separate collections of the
+same persistent Chroma directory, so corpus searches never scan chat turns
+and a growing memory collection does not slow down document retrieval.
+"""
+
+import os
+import threading
+from pathlib import Path
+
+from embeddings import get_embeddings
+
+# ─────────────────────────────
+# 1. Settings
+# ─────────────────────────────
+CHROMA_DIR = Path(os.getenv("CHROMA_DB_PATH", Path(__file__).parent / "chroma"))
+# "langchain" is the default collection name the loader has always written to
+CORPUS_COLLECTION = os.getenv("CORPUS_COLLECTION", "langchain")
+MEMORY_COLLECTION = os.getenv("MEMORY_COLLECTION", "kotori_memory")
+MEMORY_SOURCE = "chat_memory"
+# Corpus searches: "chroma" (live collection) or "mmap" (snapshot from vector_index.export_index)
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "chroma").lower()
+# "dense" (vectors only) or "hybrid" (vectors fused with the BM25 index, see retrieval.py)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "dense").lower()
+
+_stores = {}
+_lock = threading.Lock()
+
+
+def _get_store(collection_name: str):
+    store = _stores.get(collection_name)
+    if store is None:
+        with _lock:
+            store = _stores.get(collection_name)
+            if store is None:
+                from langchain_chroma import Chroma
+                CHROMA_DIR.mkdir(parents=True, exist_ok=True)
+                store = Chroma(
+                    collection_name=collection_name,
+                    persist_directory=str(CHROMA_DIR),
+                    embedding_function=get_embeddings()
+                )
+                _stores[collection_name] = store
+    return store
+
+
+# ─────────────────────────────
+# 2. Public accessors
+# ─────────────────────────────
+def get_corpus_store():
+    """Vector store holding the PDF chunks written by loader.py."""
+    return _get_store(CORPUS_COLLECTION)
+
+
+def get_corpus_index():
+    """
+    What agents search the corpus with: the memory-mapped snapshot when
+    RETRIEVAL_BACKEND=mmap and one has been exported, else the Chroma store.
+    Both provide similarity_search_by_vector_with_relevance_scores.
+    """
+    if RETRIEVAL_BACKEND == "mmap":
+        try:
+            from vector_index import get_mmap_index
+            return get_mmap_index()
+        except FileNotFoundError:
+            print("⚠️ No corpus index exported yet (python vector_index.py), searching Chroma")
+    return get_corpus_store()
+
+
+def get_memory_store():
+    """Vector store holding saved conversation turns."""
+    store = _get_store(MEMORY_COLLECTION)
+    migrate_legacy_memory()
+    return store
+
+
+_migrated = False
+
+
+def migrate_legacy_memory() -> int:
+    """
+    Moves chat turns saved into the corpus collection by older versions into
+    the memory collection, keeping their stored vectors. Runs once per process.
+    """
+    global _migrated
+    if _migrated:
+        return 0
+    _migrated = True
+    try:
+        corpus = get_corpus_store()._collection
+        legacy = corpus.get(where={"source": MEMORY_SOURCE}, include=["embeddings", "documents", "metadatas"])
+        ids = legacy.get("ids") or []
+        if not ids:
+            return 0
+        _get_store(MEMORY_COLLECTION)._collection.upsert(
+            ids=ids,
+            embeddings=legacy["embeddings"],
+            documents=legacy["documents"],
+            metadatas=legacy["metadatas"]
+        )
+        corpus.delete(ids=ids)
+        from retrieval_cache import bump_generation
+        bump_generation(CORPUS_COLLECTION)
+        bump_generation(MEMORY_COLLECTION)
+        print(f"🧠 Moved {len(ids)} chat memories out of the corpus collection")
+        return len(ids)
+    except Exception as e:
+        print(f"⚠️ Could not migrate legacy memories: {e}")
+        return 0
+
+
+__all__ = [
+    "CORPUS_COLLECTION",
+    "MEMORY_COLLECTION",
+    "MEMORY_SOURCE",
+    "RETRIEVAL_BACKEND",
+    "RETRIEVAL_MODE",
+    "get_corpus_index",
+    "get_corpus_store",
+    "get_memory_store",
+    "migrate_legacy_memory",
+]
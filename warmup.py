@@ -0,0 +1,166 @@
+"""
+Background warm-up, so the UI can render before the models are loaded.
+
+Importing kotori_graph pulls in every agent module. The first query then
+loads the BGE model, opens the Chroma collections and builds the router
+centroids and the Groq client. When app2.py did all of that up front, the
+first page load showed nothing until it was finished.
+
+`start_warmup()` runs those steps on a daemon thread through the resource
+registry (resources.py). Each step also exercises the lazy path once, with
+a dummy embed and searches, so the first real query does not pay
+initialisation costs either. The app draws immediately, shows
+`warmup_status()` while the thread works, and holds any question asked in
+the meantime until `wait_until_ready()` returns.
+"""
+
+import os
+import time
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from resources import PROCESS_STARTED, get_resource
+
+# ─────────────────────────────
+# 1. Settings
+# ─────────────────────────────
+WARMUP_ENABLED = os.getenv("KOTORI_WARMUP", "true").lower() == "true"
+WARMUP_QUERY = "What is empty nest syndrome?"
+
+
+# ─────────────────────────────
+# 2. Steps
+# ─────────────────────────────
+def _warm_graph() -> None:
+    get_resource("graph")  # imports every agent module and compiles the graph
+
+
+def _warm_embeddings() -> None:
+    get_resource("embeddings").embed_query(WARMUP_QUERY)
+
+
+def _warm_router() -> None:
+    from intent_classifier import get_intent_classifier
+    get_intent_classifier().centroids  # embeds the labelled examples once
+
+
+def _warm_indexes() -> None:
+    from vectorstores import RETRIEVAL_MODE
+    vector = get_resource("embeddings").embed_query(WARMUP_QUERY)  # embedding cache hit by now
+    # Straight to the stores, so the retrieval cache never holds the dummy query
+    get_resource("corpus").similarity_search_by_vector_with_relevance_scores(vector, k=1)
+    get_resource("memory").similarity_search_by_vector_with_relevance_scores(vector, k=1)
+    if RETRIEVAL_MODE == "hybrid":
+        from bm25_index import get_bm25_index
+        try:
+            get_bm25_index().search(WARMUP_QUERY, 1)
+        except FileNotFoundError:
+            pass  # hybrid_search reports the missing index on first use
+
+
+def _warm_llm() -> None:
+    get_resource("llm")
+
+
+def _warm_tokenizer() -> None:
+    from context_packer import CONTEXT_TOKENIZER, load_tokenizer
+    if load_tokenizer() is None:
+        raise RuntimeError(f"tokenizer {CONTEXT_TOKENIZER} not loaded; token counts are estimated until a retry succeeds")
+
+
+# Graph first: it is what a queued question needs before anything else can run
+STEPS: List[Tuple[str, Callable[[], None]]] = [
+    ("graph", _warm_graph),
+    ("embeddings", _warm_embeddings),
+    ("router", _warm_router),
+    ("indexes", _warm_indexes),
+    ("llm", _warm_llm),
+    ("tokenizer", _warm_tokenizer),
+]
+
+
+# ─────────────────────────────
+# 3. Runner
+# ─────────────────────────────
+@dataclass
+class StepResult:
+    status: str = "pending"  # pending | running | done | failed
+    seconds: Optional[float] = None
+    error: Optional[str] = None
+
+
+_results: Dict[str, StepResult] = {name: StepResult() for name, _ in STEPS}
+_ready = threading.Event()
+_thread: Optional[threading.Thread] = None
+_lock = threading.Lock()
+_finished_after: Optional[float] = None
+
+
+def _run() -> None:
+    global _finished_after
+    for name, step in STEPS:
+        result = _results[name]
+        result.status = "running"
+        started = time.perf_counter()
+        try:
+            step()
+            result.status = "done"
+        except Exception as e:
+            # A failed step is not fatal: the same work happens lazily on the first query
+            result.status, result.error = "failed", str(e)
+            print(f"⚠️ Warm-up step '{name}' failed: {e}")
+        result.seconds = time.perf_counter() - started
+    _finished_after = time.perf_counter() - PROCESS_STARTED
+    _ready.set()
+    print(f"🔥 Warm-up finished {_finished_after:.2f}s after start: "
+          + ", ".join(f"{name} {r.seconds * 1000:.0f} ms" for name, r in _results.items()))
+
+
+def start_warmup(enabled: bool = WARMUP_ENABLED) -> None:
+    """Starts the warm-up thread once per process (marks ready at once when disabled)."""
+    global _thread
+    if _thread is not None or _ready.is_set():
+        return
+    with _lock:
+        if _thread is not None or _ready.is_set():
+            return
+        if not enabled:
+            _ready.set()
+            return
+        _thread = threading.Thread(target=_run, name="kotori-warmup", daemon=True)
+        _thread.start()
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+def wait_until_ready(timeout: Optional[float] = None) -> bool:
+    return _ready.wait(timeout)
+
+
+def warmup_status() -> dict:
+    """Per-step status plus overall progress, for the readiness display."""
+    done = sum(1 for r in _results.values() if r.status in ("done", "failed"))
+    current = next((name for name, r in _results.items() if r.status == "running"), None)
+    return {
+        "ready": _ready.is_set(),
+        "progress": done / len(_results),
+        "current": current,
+        "finished_after_s": round(_finished_after, 2) if _finished_after is not None else None,
+        "steps": {
+            name: {"status": r.status, "ms": round(r.seconds * 1000) if r.seconds is not None else None, "error": r.error}
+            for name, r in _results.items()
+        },
+    }
+
+
+__all__ = [
+    "STEPS",
+    "WARMUP_ENABLED",
+    "is_ready",
+    "start_warmup",
+    "wait_until_ready",
+    "warmup_status",
+]
@@ -1,7 +1,7 @@
 import os
 from dotenv import load_dotenv
-from langchain.prompts import PromptTemplate
-from langchain_groq import ChatGroq
+from llm_client import lazy_chain
+from streaming import astream_llm, stream_llm
 
 # Load API tokens
 load_dotenv()
@@ -10,12 +10,9 @@ if not groq_api_key:
     raise EnvironmentError("❌ GROQ_API_KEY is missing in .env")
 
 # Initialize Groq LLM for welcome messages
-llm = ChatGroq(
-    groq_api_key=groq_api_key,
-    model_name="llama-3.3-70b-versatile",
-    temperature=0.7, # A bit higher for more varied greetings
-    max_tokens=50
-)
+# Shared pooled client (llm_client.py); only the call options are per agent
+# Built on first call, so importing the agent does not load langchain_groq
+WELCOME_LLM_OPTIONS = dict(temperature=0.7, max_tokens=50)  # A bit higher for more varied greetings
 
 # Prompt template for welcome messages
 WELCOME_PROMPT_TEMPLATE = """You are Kotori, a friendly and caring companion for navigating Empty Nest Syndrome. Your purpose is to greet the user warmly and offer clear options for how you can help them today.
@@ -30,33 +27,36 @@ User's Message: {query}
 
 Your Greeting:"""
 
-WELCOME_PROMPT = PromptTemplate(input_variables=["query"], template=WELCOME_PROMPT_TEMPLATE)
-welcome_chain = WELCOME_PROMPT | llm
+welcome_chain = lazy_chain(WELCOME_PROMPT_TEMPLATE, **WELCOME_LLM_OPTIONS)
+
+FALLBACK_GREETING = "Hello! I'm Kotori, your companion for navigating Empty Nest Syndrome. What would you like to do next? Do you want to know more about empty nest? Or do you want to tell me how you are feeling today? Or shall I suggest activities to help you cope with this?"
 
 def welcome_agent_node(query: str) -> str:
     """Handles welcome messages and provides a friendly greeting."""
     try:
         print(f"👋 Invoking welcome agent for query: '{query}'")
-        response = welcome_chain.invoke({"query": query})
-        print(f"👋 Welcome agent raw response: {response}")
-        if hasattr(response, 'content'):
-            content = response.content.strip()
-            print(f"👋 Welcome agent content: {content}")
-            if content:
-                return content
-            else:
-                print("👋 Empty content from welcome agent, using fallback greeting")
-                return "Hello! I'm Kotori, your companion for navigating Empty Nest Syndrome. What would you like to do next? Do you want to know more about empty nest? Or do you want to tell me how you are feeling today? Or shall I suggest activities to help you cope with this?"
+        content = stream_llm(welcome_chain, {"query": query}, agent="welcome").strip()
+        print(f"👋 Welcome agent content: {content}")
+        if content:
+            return content
         else:
-            content = str(response).strip()
-            print(f"👋 Welcome agent string response: {content}")
-            if content:
-                return content
-            else:
-                print("👋 Empty string response from welcome agent, using fallback greeting")
-                return "Hello! I'm Kotori, your companion for navigating Empty Nest Syndrome. What would you like to do next? Do you want to know more about empty nest? Or do you want to tell me how you are feeling today? Or shall I suggest activities to help you cope with this?"
+            print("👋 Empty content from welcome agent, using fallback greeting")
+            return FALLBACK_GREETING
+    except Exception as e:
+        print(f"❌ Error in welcome agent: {e}")
+        return FALLBACK_GREETING # Fallback greeting
+
+async def awelcome_agent_node(query: str) -> str:
+    """Async welcome_agent_node built on the streamed Groq call."""
+    try:
+        print(f"👋 Invoking welcome agent for query: '{query}'")
+        content = (await astream_llm(welcome_chain, {"query": query}, agent="welcome")).strip()
+        if content:
+            return content
+        print("👋 Empty content from welcome agent, using fallback greeting")
+        return FALLBACK_GREETING
     except Exception as e:
         print(f"❌ Error in welcome agent: {e}")
-        return "Hello! I'm Kotori, your companion for navigating Empty Nest Syndrome. What would you like to do next? Do you want to know more about empty nest? Or do you want to tell me how you are feeling today? Or shall I suggest activities to help you cope with this?" # Fallback greeting
+        return FALLBACK_GREETING
 
-__all__ = ["welcome_agent_node"]
\ No newline at end of file
+__all__ = ["FALLBACK_GREETING", "welcome_agent_node", "awelcome_agent_node"]
\ No newline at end of file